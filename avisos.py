@@ -9,18 +9,40 @@ Sus responsabilidades incluyen:
 - Programar y cancelar las tareas recurrentes, como el resumen diario.
 """
 
+import asyncio
 from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Optional
 import pytz
+import apscheduler
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.events import (
+    EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES
+)
 from telegram.ext import Application
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 # Importaciones módulos locales
 import bot_state # Módulo de estado global para acceder a la instancia de la app
+import cola_envios
+import despachador
+import metricas
+import recurrencia
 from personalidad import get_text
-from db import get_connection
-from config import SUPABASE_DB_URL
+from db_async import (
+    actualizar_aviso_previo, fijar_aviso_en, reclamar_entrega, completar_entrega, purgar_entregas,
+    avanzar_a_aviso_principal, registrar_latido, get_ultimo_latido, get_recordatorios_para_disparo,
+    get_avisos_perdidos, reclamar_avisos_perdidos, completar_avisos_perdidos, mover_a_ocurrencia,
+    fijar_aviso_principal_bulk, purgar_resumenes, en_hilo_de_datos, get_ids_con_aviso_en
+)
+from db import url_jobstore
+from utils import construir_mensaje_lista_completa
+from config import (
+    SUPABASE_DB_URL, AVISOS_MODO, AVISOS_PLAZO_RECLAMACION, INSTANCIA_ID,
+    AVISOS_RECUPERAR_MAX_HORAS, COLA_ENVIOS_POR_SEGUNDO, AVISOS_SLO_SEGUNDOS, AVISOS_AGRUPAR_SEGUNDOS
+)
 
 
 # --- CONFIGURACIÓN DEL SCHEDULER ---
@@ -30,14 +52,103 @@ from config import SUPABASE_DB_URL
 # y evitar que las conexiones se cierren inesperadamente.
 SCHEDULER_DB_URL = f"{SUPABASE_DB_URL}?options=-c%20pool_pre_ping=true"
 
+# Los jobs se guardan en el mismo motor que los datos (Supabase o el fichero SQLite local).
+# Con SQLite en memoria no hay dónde persistirlos, así que se quedan en un jobstore en memoria.
+_URL_JOBSTORE = url_jobstore()
+_JOBSTORE = SQLAlchemyJobStore(url=_URL_JOBSTORE) if _URL_JOBSTORE else MemoryJobStore()
+
+# cancelar_avisos_bulk borra los jobs con un DELETE directo sobre la tabla del SQLAlchemyJobStore, sin pasar
+# por remove_job(). Eso depende de cómo guarda APScheduler los jobs (tabla 'jobs_t', con el ID del job como
+# clave), y además no se emite EVENT_JOB_REMOVED (_escuchar_jobs no lo escucha). Por eso solo se usa con la
+# versión fijada en requirements.txt: con cualquier otra se vuelve a remove_job() job a job.
+_DELETE_DIRECTO_JOBS = isinstance(_JOBSTORE, SQLAlchemyJobStore) and apscheduler.version_info[:2] == (3, 11)
+
+# Segundos de margen para enviar un aviso que llega tarde (igual que 'misfire_grace_time' en los jobs).
+GRACIA_AVISOS = 60
+
+# Cada cuántos segundos se anota en la DB que el bot sigue vivo (marca el inicio de la recuperación al arrancar).
+LATIDO_SEGUNDOS = 30
+
 # Todas las fechas se manejan internamente en UTC para evitar ambigüedades.
 scheduler = AsyncIOScheduler(
-    jobstores={'default': SQLAlchemyJobStore(url=SUPABASE_DB_URL)},
+    jobstores={'default': _JOBSTORE},
     timezone=pytz.utc
 )
 
 
 
+# =============================================================================
+# MEDICIÓN DEL RETRASO DE LOS AVISOS
+# =============================================================================
+
+# Para cada tipo de notificación ('principal', 'previo', 'resumen') se miden dos retrasos respecto a su hora:
+# - 'retraso.<tipo>.disparo': hasta que empieza a procesarse (el scheduler o el despachador la sacan).
+# - 'retraso.<tipo>.entrega': hasta que Telegram confirma el envío (incluye la espera en la cola de envíos).
+#   Solo para 'principal' y 'previo': un tramo de resúmenes son muchos envíos.
+# Los contadores 'slo.<tipo>.*' dicen cuántas entregas llegaron dentro de AVISOS_SLO_SEGUNDOS.
+
+def _ms_desde(programado_en: datetime, instante: datetime) -> float:
+    return max(0.0, (instante - programado_en).total_seconds() * 1000)
+
+def registrar_disparo(tipo: str, programado_en: datetime, disparado_en: datetime):
+    metricas.observar(f"retraso.{tipo}.disparo", _ms_desde(programado_en, disparado_en))
+
+def registrar_entrega(tipo: str, programado_en: datetime, entregado_en: datetime):
+    retraso_ms = _ms_desde(programado_en, entregado_en)
+    metricas.observar(f"retraso.{tipo}.entrega", retraso_ms)
+    metricas.incrementar(f"slo.{tipo}.total")
+    if retraso_ms <= AVISOS_SLO_SEGUNDOS * 1000:
+        metricas.incrementar(f"slo.{tipo}.dentro")
+
+def _tipo_de_job(job_id: str) -> str:
+    if job_id.startswith("recordatorio_"):
+        return "principal"
+    if job_id.startswith("aviso_"):
+        return "previo"
+    if job_id.startswith("resumen_"):
+        return "resumen"
+    return "otros"
+
+# Jobs enviados al ejecutor y todavía sin terminar: (job_id, hora programada) -> instante del envío.
+# APScheduler también "envía" los jobs que llegan tarde (el ejecutor es quien los da por perdidos),
+# así que el retraso de disparo se anota al saber cómo acabaron.
+_jobs_en_curso: dict[tuple[str, datetime], datetime] = {}
+
+def _escuchar_jobs(evento):
+    """
+    Listener de APScheduler (modo 'jobs' y tareas recurrentes): los eventos traen la hora programada,
+    así que el retraso de disparo se mide sin tocar las funciones de los jobs. También cuenta los jobs
+    perdidos (misfire: llegaron fuera de 'misfire_grace_time' y no se ejecutan), descartados y fallidos.
+    La entrega la anota quien envía, que sabe si de verdad ha salido un mensaje.
+    """
+    tipo = _tipo_de_job(evento.job_id)
+    ahora = datetime.now(pytz.utc)
+    if evento.code == EVENT_JOB_SUBMITTED:
+        for programado_en in evento.scheduled_run_times:
+            _jobs_en_curso[(evento.job_id, programado_en)] = ahora
+        return
+    if evento.code == EVENT_JOB_MAX_INSTANCES:
+        # La ejecución anterior del mismo job seguía en marcha: esta se descarta sin llegar al ejecutor.
+        metricas.incrementar(f"scheduler.descartados.{tipo}")
+        return
+
+    enviado_en = _jobs_en_curso.pop((evento.job_id, evento.scheduled_run_time), None)
+    if evento.code == EVENT_JOB_MISSED:
+        metricas.incrementar(f"scheduler.perdidos.{tipo}")
+        print(f"⏭️ Job '{evento.job_id}' perdido: debía ejecutarse a las {evento.scheduled_run_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        return
+    if tipo != "otros" and enviado_en is not None:
+        registrar_disparo(tipo, evento.scheduled_run_time, enviado_en)
+    if evento.code == EVENT_JOB_ERROR:
+        metricas.incrementar(f"scheduler.errores.{tipo}")
+
+scheduler.add_listener(
+    _escuchar_jobs,
+    EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES
+)
+
+
+
 # =============================================================================
 # FUNCIONES DE CONTROL PRINCIPAL DEL SCHEDULER
 # =============================================================================
@@ -51,18 +162,156 @@ async def iniciar_scheduler(app: Application):
     if not scheduler.running:
         scheduler.start()
         print("⏰ Scheduler iniciado.")
+    cola_envios.iniciar()
+
+    # La recuperación reclama sus avisos ANTES de arrancar el despachador, para que este no los dé por caducados.
+    await _recuperar_al_arrancar()
+    scheduler.add_job(latido, 'interval', seconds=LATIDO_SEGUNDOS, id="latido", replace_existing=True)
+    scheduler.add_job(
+        purgar_entregas_antiguas, 'interval', hours=6, id="purgar_entregas", replace_existing=True
+    )
+
+    if AVISOS_MODO == "dispatcher":
+        await _retirar_jobs_legados()
+        despachador.iniciar(disparar_aviso)
+
+async def _retirar_jobs_legados():
+    """
+    Al pasar al modo 'dispatcher', quita los jobs del modo clásico que se enviarían dos veces: los de
+    recordatorios que ya tienen 'aviso_en' (esos los lleva el despachador). Los demás se dejan
+    disparar como jobs; si no, esas notificaciones no llegarían nunca.
+    """
+    legados = {
+        job.id: int(job.id.rsplit("_", 1)[1]) for job in scheduler.get_jobs()
+        if job.id.startswith(("recordatorio_", "aviso_")) and job.id.rsplit("_", 1)[1].isdigit()
+    }
+    if not legados:
+        return
+    con_aviso_en = set(await get_ids_con_aviso_en(list(set(legados.values()))))
+    retirados = 0
+    for job_id, rid in legados.items():
+        if rid in con_aviso_en:
+            scheduler.remove_job(job_id)
+            retirados += 1
+    print(f"🧹 Jobs del modo clásico: {retirados} retirado(s) (los lleva el despachador), {len(legados) - retirados} conservado(s).")
 
 def detener_scheduler():
     """Detiene el scheduler de forma segura al apagar el bot."""
     if scheduler.running:
         scheduler.shutdown()
 
+async def detener_avisos(app: Application):
+    """Se llama al apagar el bot: detiene el despachador (si está activo) y la cola, esperando a los envíos en curso."""
+    await despachador.detener()
+    await cola_envios.detener()
+    if _tarea_recuperacion is not None:
+        await asyncio.gather(_tarea_recuperacion, return_exceptions=True)
+
+
+
+# =============================================================================
+# LATIDO Y RECUPERACIÓN DE AVISOS PERDIDOS
+# =============================================================================
+
+# Envío en curso de los resúmenes de recuperación (se espera al apagar).
+_tarea_recuperacion: Optional[asyncio.Task] = None
+
+
+async def latido():
+    """Tarea periódica: deja constancia en la DB de que el bot sigue vivo."""
+    await registrar_latido(datetime.now(pytz.utc))
+
+async def _recuperar_al_arrancar():
+    """Lee el último latido (antes de escribir el nuestro) y recupera lo que venció desde entonces."""
+    try:
+        ultimo_latido = await get_ultimo_latido()
+        ahora = datetime.now(pytz.utc)
+        await registrar_latido(ahora)
+        if ultimo_latido is not None:
+            await recuperar_avisos_perdidos(ultimo_latido, ahora)
+    except Exception as e:
+        print(f"🚨 Error al recuperar los avisos perdidos: {e}")
+
+async def recuperar_avisos_perdidos(desde: datetime, ahora: datetime):
+    """
+    Busca las notificaciones que vencieron mientras el bot estaba caído (entre el último latido y
+    'ahora' menos el margen de GRACIA_AVISOS, que aún envía el mecanismo normal), las reclama y
+    manda UN mensaje por chat con todas ellas en lugar de un aviso por recordatorio.
+    """
+    global _tarea_recuperacion
+    hasta = ahora - timedelta(seconds=GRACIA_AVISOS)
+    desde = max(desde, ahora - timedelta(hours=AVISOS_RECUPERAR_MAX_HORAS))
+    if desde >= hasta:
+        return
+    filas = await get_avisos_perdidos(desde, hasta)
+    if not filas:
+        return
+
+    # El plazo de la reclamación cubre lo que tardará la cola en enviar todos los mensajes.
+    plazo = AVISOS_PLAZO_RECLAMACION + len(filas) / COLA_ENVIOS_POR_SEGUNDO
+    nuestros = set(await reclamar_avisos_perdidos(
+        [(fila[0], fila[-1]) for fila in filas], INSTANCIA_ID, ahora + timedelta(seconds=plazo), ahora
+    ))
+    recordatorios = [fila[:-1] for fila in filas if fila[0] in nuestros]
+    if not recordatorios:
+        return
+    print(f"💤 Recuperando {len(recordatorios)} aviso(s) perdido(s) desde {desde.strftime('%Y-%m-%d %H:%M:%S')} (UTC)")
+    _tarea_recuperacion = asyncio.get_running_loop().create_task(_enviar_avisos_perdidos(recordatorios, hasta))
+
+async def _enviar_avisos_perdidos(recordatorios: list, hasta: datetime):
+    """Envía un resumen "mientras estaba fuera" por chat y da por entregadas sus notificaciones."""
+    introduccion = get_text("avisos_mientras_fuera")
+    # Las filas llegan ordenadas por chat; cada recordatorio trae su zona horaria (columna 'timezone').
+    grupos = [(chat_id, list(filas_chat)) for chat_id, filas_chat in groupby(recordatorios, key=lambda fila: fila[2])]
+    futuros = [
+        cola_envios.encolar(
+            chat_id, introduccion + "\n\n" + construir_mensaje_lista_completa(chat_id, filas_chat, filas_chat[0][7] or 'UTC'),
+            cola_envios.PRIORIDAD_RECORDATORIO, parse_mode="Markdown"
+        )
+        for chat_id, filas_chat in grupos
+    ]
+    resultados = await asyncio.gather(*futuros, return_exceptions=True)
+    for (chat_id, _), resultado in zip(grupos, resultados):
+        if isinstance(resultado, BaseException):
+            print(f"🚨 No se pudo enviar la recuperación de avisos al chat {chat_id}: {resultado}")
+    metricas.incrementar("recuperacion.avisos", len(recordatorios))
+
+    # Se completan también los fallidos (p. ej., bot bloqueado): reintentarlos en cada arranque no tendría fin.
+    await completar_avisos_perdidos([fila[0] for fila in recordatorios], INSTANCIA_ID, hasta, datetime.now(pytz.utc))
+    # Los recurrentes cuya repetición ya ha pasado siguen con la próxima que aún esté por llegar.
+    ahora = datetime.now(pytz.utc)
+    for rid, user_id, chat_id, texto, fecha, _, aviso_previo, tz, regla in recordatorios:
+        if regla and fecha is not None and fecha <= hasta:
+            await programar_siguiente_ocurrencia(rid, chat_id, user_id, texto, fecha, aviso_previo, tz, regla, ahora)
+    print(f"💤 Recuperación enviada a {len(grupos)} chat(s).")
+
 
 
 # =============================================================================
 # GESTIÓN DE RECORDATORIOS INDIVIDUALES
 # =============================================================================
 
+def _primer_aviso_en(fecha: datetime, aviso_previo_min: Optional[int], ahora: datetime) -> datetime:
+    """La primera notificación de una fecha: su aviso previo si aún llega a tiempo, si no la propia fecha."""
+    if aviso_previo_min and aviso_previo_min > 0 and fecha - timedelta(minutes=aviso_previo_min) > ahora:
+        return fecha - timedelta(minutes=aviso_previo_min)
+    return fecha
+
+async def programar_siguiente_ocurrencia(
+    rid, chat_id: int, user_id: int, texto: str, fecha: datetime, aviso_previo: Optional[int],
+    tz: Optional[str], regla: str, despues_de: datetime
+) -> Optional[datetime]:
+    """
+    Pasa un recordatorio recurrente de su ocurrencia 'fecha' a la siguiente posterior a 'despues_de'
+    y le programa los avisos (con la misma antelación). Devuelve la nueva fecha, o None si ya lo había movido otro.
+    """
+    siguiente = recurrencia.siguiente_ocurrencia(regla, fecha, tz, despues_de)
+    if not await mover_a_ocurrencia(rid, fecha, siguiente):
+        return None
+    await programar_avisos(chat_id, str(rid), user_id, texto, siguiente, aviso_previo or 0, es_pospuesto=True)
+    print(f"🔁 Recordatorio '{rid}' repetido: próxima vez el {siguiente.strftime('%Y-%m-%d %H:%M:%S')} (UTC)")
+    return siguiente
+
 async def programar_avisos(chat_id: int, rid: str, user_id: int, texto: str, fecha: datetime, aviso_previo_min: int, es_pospuesto: bool = False) -> bool:
     """
     Programa el aviso principal y, si corresponde, el aviso previo para un recordatorio.
@@ -80,11 +329,21 @@ async def programar_avisos(chat_id: int, rid: str, user_id: int, texto: str, fec
     if not fecha:
         return aviso_previo_programado
 
+    # La próxima notificación (aviso previo si aún llega a tiempo, si no el principal) se guarda en la fila.
+    # En modo 'dispatcher' es lo único que hace falta; en modo 'jobs' además se crean los jobs.
+    aviso_en = _primer_aviso_en(fecha, aviso_previo_min, datetime.now(pytz.utc))
+    await fijar_aviso_en(rid, aviso_en)
+    usar_jobs = AVISOS_MODO != "dispatcher"
+    if not usar_jobs:
+        despachador.notificar(rid, aviso_en)
+
     # 1. Programar el aviso principal (a la hora del recordatorio)
-    scheduler.add_job(
-        enviar_recordatorio, 'date', run_date=fecha, id=f"recordatorio_{rid}",
-        args=[chat_id, user_id, texto, rid], misfire_grace_time=60, replace_existing=True
-    )
+    if usar_jobs:
+        # El job solo lleva el ID y el tipo: el texto y el estado se leen de la DB al dispararse.
+        scheduler.add_job(
+            disparar_notificacion, 'date', run_date=fecha, id=f"recordatorio_{rid}",
+            args=[int(rid), "principal"], misfire_grace_time=GRACIA_AVISOS, replace_existing=True
+        )
     
     if not es_pospuesto:
         print(f"✅ Recordatorio programado: '{rid}' para las {fecha.strftime('%Y-%m-%d %H:%M:%S')} (UTC)")
@@ -93,11 +352,11 @@ async def programar_avisos(chat_id: int, rid: str, user_id: int, texto: str, fec
     if aviso_previo_min > 0:
         aviso_time = fecha - timedelta(minutes=aviso_previo_min)
         if aviso_time > datetime.now(pytz.utc):
-            scheduler.add_job(
-                enviar_aviso_previo, 'date', run_date=aviso_time, id=f"aviso_{rid}",
-                args=[chat_id, user_id, texto, aviso_previo_min, rid],
-                misfire_grace_time=60, replace_existing=True
-            )
+            if usar_jobs:
+                scheduler.add_job(
+                    disparar_notificacion, 'date', run_date=aviso_time, id=f"aviso_{rid}",
+                    args=[int(rid), "previo"], misfire_grace_time=GRACIA_AVISOS, replace_existing=True
+                )
             horas, mins = divmod(aviso_previo_min, 60)
             tiempo_str = f"{horas}h" if mins == 0 else f"{horas}h {mins}m" if horas > 0 else f"{mins}m"
             if es_pospuesto:
@@ -111,23 +370,254 @@ async def programar_avisos(chat_id: int, rid: str, user_id: int, texto: str, fec
     
     return aviso_previo_programado
 
+def _anadir_jobs_principales(recordatorios: list[tuple[int, datetime]]):
+    for rid, fecha in recordatorios:
+        scheduler.add_job(
+            disparar_notificacion, 'date', run_date=fecha, id=f"recordatorio_{rid}",
+            args=[rid, "principal"], misfire_grace_time=GRACIA_AVISOS, replace_existing=True
+        )
+
+async def programar_avisos_bulk(recordatorios: list[tuple[int, datetime]]):
+    """
+    Programa de golpe el aviso principal (sin aviso previo) de muchos recordatorios (ID global, fecha UTC),
+    p. ej. los de una lista pegada en /recordar. Un solo UPDATE de 'aviso_en' y, en modo 'jobs', todos los
+    add_job() seguidos en un hilo de la capa de datos: con el jobstore de SQLAlchemy cada uno escribe en la DB.
+    """
+    recordatorios = [(int(rid), fecha) for rid, fecha in recordatorios if fecha]
+    if not recordatorios:
+        return
+    await fijar_aviso_principal_bulk([rid for rid, _ in recordatorios])
+    if AVISOS_MODO == "dispatcher":
+        for rid, fecha in recordatorios:
+            despachador.notificar(rid, fecha)
+    else:
+        await en_hilo_de_datos(_anadir_jobs_principales, recordatorios)
+    print(f"✅ {len(recordatorios)} recordatorio(s) programado(s) de golpe.")
+
+async def disparar_aviso(rid: int, aviso_en: datetime):
+    """
+    Función ejecutada por el despachador cuando vence una notificación.
+
+    1. Reclama la notificación en 'entregas' (con plazo): si la tiene otra instancia, se vuelve a mirar al vencer su plazo.
+    2. La envía (o la omite si llega demasiado tarde).
+    3. La da por entregada y avanza el recordatorio a su siguiente notificación.
+    Si la instancia se cae entre 1 y 3, el plazo vence y otra la reintenta: ninguna notificación se pierde ni se duplica.
+    """
+    ahora = datetime.now(pytz.utc)
+    reclamada_hasta = ahora + timedelta(seconds=AVISOS_PLAZO_RECLAMACION)
+    datos, ocupada_hasta = await reclamar_entrega(rid, aviso_en, INSTANCIA_ID, reclamada_hasta, ahora)
+    if datos is None:
+        if ocupada_hasta is not None:
+            despachador.reintentar(rid, aviso_en, ocupada_hasta)
+        return  # Entregada ya, o el recordatorio se ha borrado, completado o reprogramado.
+
+    chat_id, user_id, texto, fecha, aviso_previo, tz, regla = datos
+    # Vence antes que el recordatorio: es el aviso previo.
+    tipo = "previo" if fecha is not None and aviso_en < fecha else "principal"
+    registrar_disparo(tipo, aviso_en, ahora)
+    retraso = (ahora - aviso_en).total_seconds()
+    try:
+        if retraso > GRACIA_AVISOS:
+            print(f"⏭️ Aviso de '{rid}' omitido: llegaba {retraso:.0f} s tarde.")
+            metricas.incrementar(f"avisos.omitidos.{tipo}")
+        elif tipo == "previo":
+            # La antelación se deduce de la propia notificación (así también vale para las pospuestas).
+            minutos = round((fecha - aviso_en).total_seconds() / 60)
+            await enviar_aviso_previo(chat_id, user_id, texto, minutos, rid)
+            registrar_entrega(tipo, aviso_en, datetime.now(pytz.utc))
+        else:
+            await _mandar_recordatorio(chat_id, user_id, texto, rid)
+            registrar_entrega(tipo, aviso_en, datetime.now(pytz.utc))
+    except Exception:
+        # No se ha entregado: se reintenta al vencer nuestra reclamación (mientras siga dentro del margen).
+        metricas.incrementar(f"avisos.errores.{tipo}")
+        despachador.reintentar(rid, aviso_en, reclamada_hasta)
+        raise
+
+    # Tras el principal, un recurrente pasa a su siguiente ocurrencia en la misma transacción que cierra la entrega.
+    siguiente_fecha = siguiente_aviso_en = None
+    ahora = datetime.now(pytz.utc)
+    if regla and tipo == "principal" and fecha is not None:
+        siguiente_fecha = recurrencia.siguiente_ocurrencia(regla, fecha, tz, ahora)
+        siguiente_aviso_en = _primer_aviso_en(siguiente_fecha, aviso_previo, ahora)
+    siguiente_aviso_en = await completar_entrega(rid, aviso_en, ahora, siguiente_fecha, siguiente_aviso_en)
+    despachador.notificar(rid, siguiente_aviso_en)
+
+async def purgar_entregas_antiguas():
+    """Tarea periódica: olvida el registro de entregas y de resúmenes diarios de hace más de dos días."""
+    hace_dos_dias = datetime.now(pytz.utc) - timedelta(days=2)
+    borradas = await purgar_entregas(hace_dos_dias)
+    if borradas:
+        print(f"🧹 {borradas} entregas antiguas purgadas.")
+    borrados = await purgar_resumenes(hace_dos_dias.date().isoformat())
+    if borrados:
+        print(f"🧹 {borrados} registros de resúmenes diarios antiguos purgados.")
+
+# --- Carga por lotes al disparar (modo 'jobs') ---
+# Los jobs que vencen en el mismo instante arrancan en la misma vuelta del event loop: sus
+# peticiones se juntan aquí y se resuelven con una sola consulta en la vuelta siguiente.
+_cargas_pendientes: dict[int, list[asyncio.Future]] = {}
+# El event loop solo guarda una referencia débil a sus tareas: sin esta, la carga podría desaparecer a medias
+# y los jobs que esperan sus resultados se quedarían colgados.
+_cargas_en_curso: set[asyncio.Task] = set()
+
+def _lanzar_carga_lote():
+    tarea = asyncio.get_running_loop().create_task(_cargar_lote())
+    _cargas_en_curso.add(tarea)
+    tarea.add_done_callback(_cargas_en_curso.discard)
+
+async def _cargar_para_disparo(rid: int) -> Optional[tuple]:
+    """Devuelve la fila (COLUMNAS_RECORDATORIO + aviso_en) del recordatorio, o None si ya no existe."""
+    loop = asyncio.get_running_loop()
+    if not _cargas_pendientes:
+        loop.call_soon(_lanzar_carga_lote)
+    futuro = loop.create_future()
+    _cargas_pendientes.setdefault(rid, []).append(futuro)
+    return await futuro
+
+async def _cargar_lote():
+    lote = dict(_cargas_pendientes)
+    _cargas_pendientes.clear()
+    try:
+        filas = {fila[0]: fila for fila in await get_recordatorios_para_disparo(list(lote))}
+    except Exception as e:
+        for futuros in lote.values():
+            for futuro in futuros:
+                if not futuro.done():
+                    futuro.set_exception(e)
+        return
+    metricas.incrementar("disparo.lotes")
+    metricas.incrementar("disparo.recordatorios", len(lote))
+    for rid, futuros in lote.items():
+        for futuro in futuros:
+            if not futuro.done():
+                futuro.set_result(filas.get(rid))
+
+async def disparar_notificacion(rid: int, tipo: str):
+    """
+    Función ejecutada por el scheduler (modo 'jobs') para una notificación 'principal' o 'previo'.
+    El job solo guarda el ID: el texto y el estado se leen ahora, y si el recordatorio se ha
+    borrado o completado mientras tanto no se envía nada.
+    """
+    if not bot_state.telegram_app:
+        return
+    fila = await _cargar_para_disparo(rid)
+    if fila is None or fila[5] != 0:
+        metricas.incrementar(f"avisos.descartados.{tipo}")
+        return
+    _, user_id, chat_id, texto, fecha, _, aviso_previo, tz, regla, aviso_en = fila
+
+    if tipo == "previo":
+        # 'aviso_en' es la hora de este aviso previo; si ya no va antes que la fecha, se ha anulado.
+        if fecha is None or aviso_en is None or aviso_en >= fecha:
+            metricas.incrementar(f"avisos.descartados.{tipo}")
+            return
+        minutos = round((fecha - aviso_en).total_seconds() / 60)
+        await enviar_aviso_previo(chat_id, user_id, texto, minutos, rid)
+        registrar_entrega(tipo, aviso_en, datetime.now(pytz.utc))
+    else:
+        if regla and fecha is not None:
+            # Se programa la siguiente repetición antes de enviar: si el envío falla, la serie no se corta.
+            await programar_siguiente_ocurrencia(rid, chat_id, user_id, texto, fecha, aviso_previo, tz, regla, datetime.now(pytz.utc))
+        else:
+            await actualizar_aviso_previo(rid, 0)
+        await _mandar_recordatorio(chat_id, user_id, texto, rid)
+        if fecha is not None:
+            registrar_entrega(tipo, fecha, datetime.now(pytz.utc))
+
 async def enviar_recordatorio(chat_id: int, user_id: int, texto: str, rid: str):
-    """Función ejecutada por el scheduler para enviar la notificación principal."""
+    """
+    Función ejecutada por el scheduler para enviar la notificación principal.
+    Se mantiene para los jobs creados antes de disparar_notificacion(), que llevan los datos en sus argumentos.
+    """
     if bot_state.telegram_app:
         # --- CAMBIO: Limpiamos el aviso_previo al llegar la hora final ---
-        with get_connection() as conn:
-            conn.execute("UPDATE recordatorios SET aviso_previo = 0 WHERE id = ?", (rid,))
-            conn.commit()
+        await actualizar_aviso_previo(rid, 0)
+        await _mandar_recordatorio(chat_id, user_id, texto, rid)
+
+async def _mandar_recordatorio(chat_id: int, user_id: int, texto: str, rid):
+    """
+    Envía la notificación principal. Si en los próximos AVISOS_AGRUPAR_SEGUNDOS vencen otras del
+    mismo chat, salen todas juntas en un solo mensaje (ver _agrupar_recordatorio).
+    """
+    if not bot_state.telegram_app:
+        return
+    if AVISOS_AGRUPAR_SEGUNDOS <= 0:
+        await _enviar_recordatorios(chat_id, [(user_id, texto, rid)])
+    else:
+        await _agrupar_recordatorio(chat_id, user_id, texto, rid)
 
+async def _enviar_recordatorios(chat_id: int, recordatorios: list[tuple]):
+    """
+    Manda uno o varios avisos principales (user_id, texto, rid) de un chat en un único mensaje.
+    Uno solo lleva sus botones de siempre; varios, una fila de botones por recordatorio.
+    """
+    if len(recordatorios) == 1:
+        user_id, texto, rid = recordatorios[0]
         mensaje = get_text("aviso_principal", id=user_id, texto=texto)
         keyboard = [[
             InlineKeyboardButton("👌 OK", callback_data=f"ok:{rid}"),
             InlineKeyboardButton("✅ Hecho", callback_data=f"mark_done:{rid}")
         ]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await bot_state.telegram_app.bot.send_message(
-            chat_id=chat_id, text=mensaje, parse_mode="Markdown", reply_markup=reply_markup
-        )
+    else:
+        lineas = [f"⏰ `#{user_id}` - *{texto}*" for user_id, texto, _ in recordatorios]
+        mensaje = get_text("avisos_agrupados", n=len(recordatorios)) + "\n\n" + "\n".join(lineas)
+        keyboard = [
+            [
+                InlineKeyboardButton(f"👌 OK #{user_id}", callback_data=f"ok:{rid}"),
+                InlineKeyboardButton(f"✅ Hecho #{user_id}", callback_data=f"mark_done:{rid}")
+            ]
+            for user_id, _, rid in recordatorios
+        ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    await cola_envios.enviar(
+        chat_id, mensaje, cola_envios.PRIORIDAD_RECORDATORIO, parse_mode="Markdown", reply_markup=reply_markup
+    )
+
+# --- Agrupación de los avisos principales por chat ---
+# Quien crea cinco tareas para las 09:00 recibe un mensaje con las cinco en lugar de cinco mensajes:
+# menos llamadas a la API y menos presión sobre el límite de Telegram en los minutos punta.
+# El primer aviso de un chat abre una ventana de AVISOS_AGRUPAR_SEGUNDOS; los que llegan dentro se suman a él.
+_MAX_POR_MENSAJE = 20          # Con 2 botones por fila, lejos del máximo de Telegram (100) y aún legible.
+_agrupando: dict[int, list[tuple]] = {}   # chat_id -> [(user_id, texto, rid, futuro)] del grupo abierto
+_envios_agrupados: set[asyncio.Task] = set()
+
+async def _agrupar_recordatorio(chat_id: int, user_id: int, texto: str, rid):
+    """Suma el aviso al grupo abierto del chat (o abre uno) y espera a que el grupo se envíe."""
+    loop = asyncio.get_running_loop()
+    futuro = loop.create_future()
+    grupo = _agrupando.get(chat_id)
+    if grupo is None:
+        grupo = _agrupando[chat_id] = []
+        loop.call_later(AVISOS_AGRUPAR_SEGUNDOS, _cerrar_grupo, chat_id, grupo)
+    grupo.append((user_id, texto, rid, futuro))
+    if len(grupo) >= _MAX_POR_MENSAJE:
+        _cerrar_grupo(chat_id, grupo)
+    await futuro
+
+def _cerrar_grupo(chat_id: int, grupo: list[tuple]):
+    """Cierra la ventana del chat y lanza el envío del grupo (una sola vez, aunque lo cierren el temporizador y el tope)."""
+    if _agrupando.get(chat_id) is not grupo:
+        return
+    del _agrupando[chat_id]
+    tarea = asyncio.get_running_loop().create_task(_enviar_grupo(chat_id, grupo))
+    _envios_agrupados.add(tarea)
+    tarea.add_done_callback(_envios_agrupados.discard)
+
+async def _enviar_grupo(chat_id: int, grupo: list[tuple]):
+    try:
+        await _enviar_recordatorios(chat_id, [(user_id, texto, rid) for user_id, texto, rid, _ in grupo])
+    except Exception as e:
+        for *_, futuro in grupo:
+            if not futuro.done():
+                futuro.set_exception(e)
+        return
+    if len(grupo) > 1:
+        metricas.incrementar("avisos.agrupados", len(grupo))
+        metricas.incrementar("avisos.mensajes_ahorrados", len(grupo) - 1)
+    for *_, futuro in grupo:
+        if not futuro.done():
+            futuro.set_result(None)
 
 async def enviar_aviso_previo(chat_id: int, user_id: int, texto: str, minutos: int, rid: str):
     """Función ejecutada por el scheduler para enviar el aviso previo."""
@@ -146,9 +636,12 @@ async def enviar_aviso_previo(chat_id: int, user_id: int, texto: str, minutos: i
             keyboard_buttons.insert(1, InlineKeyboardButton("⏰ +10 min", callback_data=f"posponer:10:{rid}"))
 
         reply_markup = InlineKeyboardMarkup([keyboard_buttons])
-        await bot_state.telegram_app.bot.send_message(
-            chat_id=chat_id, text=mensaje, parse_mode="Markdown", reply_markup=reply_markup
+        await cola_envios.enviar(
+            chat_id, mensaje, cola_envios.PRIORIDAD_AVISO, parse_mode="Markdown", reply_markup=reply_markup
         )
+        if AVISOS_MODO != "dispatcher":
+            # En modo 'jobs' nadie más avanza 'aviso_en': así la recuperación al arrancar no repite este aviso.
+            await avanzar_a_aviso_principal(rid)
 
 def cancelar_avisos(rid: str):
     """
@@ -156,12 +649,38 @@ def cancelar_avisos(rid: str):
     Utiliza un try-except genérico porque el error más común (JobLookupError)
     simplemente significa que el job ya no existía, lo cual no es un problema.
     """
+    if AVISOS_MODO == "dispatcher":
+        # No hay jobs: lo que ha anulado el aviso (borrar, completar, editar...) ya lo ha hecho en la fila.
+        return
     for job_id in [f"recordatorio_{rid}", f"aviso_{rid}"]:
         try:
             scheduler.remove_job(job_id)
         except Exception:
             pass
 
+def _quitar_jobs_bulk(rids):
+    """Parte bloqueante de cancelar_avisos_bulk (se ejecuta en un hilo de la capa de datos)."""
+    if not _DELETE_DIRECTO_JOBS or not scheduler.running:
+        # En memoria, con otra versión de APScheduler o con los jobs aún pendientes de arrancar: uno a uno.
+        for rid in rids:
+            cancelar_avisos(rid)
+        return
+    job_ids = [f"{prefijo}{rid}" for rid in rids for prefijo in ("recordatorio_", "aviso_")]
+    with _JOBSTORE.engine.begin() as conn:
+        conn.execute(_JOBSTORE.jobs_t.delete().where(_JOBSTORE.jobs_t.c.id.in_(job_ids)))
+    # El scheduler pudo calcular su próxima espera con alguno de estos jobs: que la recalcule.
+    scheduler.wakeup()
+
+async def cancelar_avisos_bulk(rids):
+    """
+    Cancela de golpe los jobs (principal y previo) de muchos recordatorios, p. ej. al borrar o completar en bloque.
+    Con el jobstore de SQLAlchemy es un único DELETE ... WHERE id IN (...) en lugar de dos por recordatorio.
+    Se hace en un hilo de la capa de datos para no bloquear el event loop.
+    """
+    if AVISOS_MODO == "dispatcher" or not rids:
+        return
+    await en_hilo_de_datos(_quitar_jobs_bulk, rids)
+
 def cancelar_todos_los_avisos():
     """Función de emergencia o reseteo: elimina TODOS los jobs del scheduler."""
     if scheduler.running:
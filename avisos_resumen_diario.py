@@ -3,44 +3,140 @@
 Módulo para la gestión integral del Resumen Diario Proactivo.
 
 Este archivo contiene toda la lógica relacionada con el resumen diario:
-- La función que envía el resumen a un usuario.
-- Las funciones para programar y cancelar la tarea recurrente en el scheduler.
+- La función que envía los resúmenes de un tramo horario.
+- Las funciones para programar y cancelar las tareas recurrentes en el scheduler.
+
+En lugar de un job 'cron' por usuario hay UN job por tramo (zona horaria, 'HH:MM'):
+todos los chats que quieren su resumen a la misma hora local comparten job, y al
+dispararse se leen las tareas de hoy de todos ellos con una sola consulta. Los
+mensajes salen por la cola de envíos (cola_envios.py) con la prioridad más baja.
+Los ajustes de cada chat (activado, hora, zona) se leen de la DB en ese momento,
+así que cambiarlos en /ajustes solo tiene que asegurar que el job de su tramo existe.
+
+Para no mandar miles de mensajes en el mismo segundo (todo el mundo empieza con
+las 08:00), cada chat tiene un desfase fijo dentro de RESUMEN_REPARTO_SEGUNDOS,
+derivado de su chat_id: siempre le llega a la misma hora, y el tramo se reparte.
+
+Con varias instancias del bot compartiendo el jobstore, cada una dispara el job
+del tramo: el envío de cada (tramo, día local) se reclama con plazo en la tabla
+'resumenes_tramo' (igual que las notificaciones en 'entregas') y solo lo hace
+la instancia que lo consigue. Si esa instancia se cae a mitad, otra lo retoma
+cuando vence el plazo.
 """
 
+import asyncio
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Optional
+
+import pytz
 from telegram.error import Forbidden
-import bot_state
-from db import get_recordatorios
+
+import cola_envios
+import metricas
+from config import RESUMEN_REPARTO_SEGUNDOS, AVISOS_PLAZO_RECLAMACION, COLA_ENVIOS_POR_SEGUNDO, INSTANCIA_ID
+from db_async import get_recordatorios_resumen, get_tramos_resumen, reclamar_resumen, completar_resumen
 from utils import construir_mensaje_lista_completa
 from personalidad import get_text
 
 from avisos import scheduler   # Necesitamos acceso directo al scheduler para gestionar los jobs.
 
+# Un tramo con miles de chats tarda minutos en enviarse: si el bot estaba parado a la hora, aún se manda con este margen.
+GRACIA_RESUMEN = 15 * 60
+
+_PREFIJO_TRAMO = "resumen_tramo_"
+_PREFIJO_LEGADO = "resumen_diario_"   # Jobs antiguos de un resumen por usuario
+_PREFIJO_REINTENTO = "reintento_resumen_"   # Reintento de un tramo que tenía reclamado otra instancia
+
+
+def _id_tramo(tz_str: str, hora_str: str) -> str:
+    return f"{_PREFIJO_TRAMO}{tz_str}_{hora_str.replace(':', '')}"
+
+def desfase_resumen(chat_id: int) -> float:
+    """Segundos tras la hora del tramo a los que le toca el resumen a este chat (fijos para cada chat_id)."""
+    if RESUMEN_REPARTO_SEGUNDOS <= 0:
+        return 0.0
+    # Hash multiplicativo de Knuth: chats consecutivos quedan bien repartidos por la ventana.
+    return (chat_id * 2654435761 % 2**32) / 2**32 * RESUMEN_REPARTO_SEGUNDOS
+
 
 
 # =============================================================================
 # FUNCIÓN PRINCIPAL DE ENVÍO
 # =============================================================================
 
-async def enviar_resumen_para_usuario(chat_id: int):
+async def _enviar_resumenes(mensajes: list[tuple[int, str]], inicio_tramo: datetime):
+    """
+    Mete todos los resúmenes en la cola de envíos (la menos prioritaria), cada uno diferido hasta
+    su desfase desde 'inicio_tramo', y espera a que salgan.
+    """
+    ahora = datetime.now(pytz.utc)
+    futuros = [
+        cola_envios.encolar(
+            chat_id, texto, cola_envios.PRIORIDAD_RESUMEN, parse_mode="Markdown",
+            diferir=desfase_resumen(chat_id) - (ahora - inicio_tramo).total_seconds()
+        )
+        for chat_id, texto in mensajes
+    ]
+    resultados = await asyncio.gather(*futuros, return_exceptions=True)
+    for (chat_id, _), resultado in zip(mensajes, resultados):
+        if isinstance(resultado, Forbidden):
+            print(f"⚠️ No se pudo enviar resumen al chat {chat_id}, el usuario ha bloqueado el bot.")
+            metricas.incrementar("resumen.bloqueados")
+        elif isinstance(resultado, BaseException):
+            print(f"🚨 Error enviando resumen al chat {chat_id}: {resultado}")
+            metricas.incrementar("resumen.errores")
+
+async def enviar_resumenes_tramo(tz_str: str, hora_str: str, dia: Optional[str] = None):
     """
-    Función ejecutada por el scheduler para enviar el resumen diario a un usuario específico.
+    Función ejecutada por el scheduler para enviar el resumen diario a todos los chats de un tramo.
+    'dia' ('AAAA-MM-DD' local) solo lo pasa el reintento: por defecto es el día local de hoy.
     """
-    print(f"🌞 Ejecutando resumen diario para el chat_id: {chat_id}")
+    print(f"🌞 Ejecutando resumen diario del tramo {hora_str} ({tz_str})")
     try:
-        recordatorios_hoy, total = get_recordatorios(chat_id, filtro="hoy")
-        if recordatorios_hoy:
-            introduccion = get_text("resumen_diario_con_tareas")
-            cuerpo_lista = construir_mensaje_lista_completa(chat_id, recordatorios_hoy)
-            mensaje_final = introduccion + "\n\n" + cuerpo_lista
-
-            await bot_state.telegram_app.bot.send_message(
-                chat_id=chat_id, text=mensaje_final, parse_mode="Markdown"
-            )
-            print(f"  ✅ Resumen enviado al chat {chat_id}")
-    except Forbidden:
-        print(f"⚠️ No se pudo enviar resumen al chat {chat_id}, el usuario ha bloqueado el bot.")
+        # "Hoy" es el día local del tramo, que es el mismo para todos sus chats.
+        user_tz = pytz.timezone(tz_str)
+        now_local = datetime.now(pytz.utc).astimezone(user_tz)
+        base = datetime.strptime(dia, "%Y-%m-%d") if dia else now_local.replace(tzinfo=None)
+        dia = base.strftime("%Y-%m-%d")
+        inicio_dia = user_tz.localize(base.replace(hour=0, minute=0, second=0, microsecond=0))
+        fin_dia = user_tz.localize(base.replace(hour=23, minute=59, second=59, microsecond=999999))
+        hora, minuto = map(int, hora_str.split(':'))
+        # Si el job arranca tarde pasada la medianoche, el tramo "de hoy" aún no ha llegado: se reparte desde ya.
+        inicio_tramo = min(now_local, user_tz.localize(base.replace(hour=hora, minute=minuto, second=0, microsecond=0)))
+
+        filas = await get_recordatorios_resumen(tz_str, hora_str, inicio_dia.astimezone(pytz.utc), fin_dia.astimezone(pytz.utc))
+        introduccion = get_text("resumen_diario_con_tareas")
+        # Las filas llegan ordenadas por chat: cada grupo es la lista de hoy de un usuario (solo los que tienen tareas).
+        mensajes = [
+            (chat_id, introduccion + "\n\n" + construir_mensaje_lista_completa(chat_id, list(recordatorios_hoy), tz_str))
+            for chat_id, recordatorios_hoy in groupby(filas, key=lambda fila: fila[2])
+        ]
+
+        # Solo una instancia envía el tramo de cada día. El plazo cubre el reparto y lo que tarda la cola en vaciarse.
+        ahora = datetime.now(pytz.utc)
+        plazo = AVISOS_PLAZO_RECLAMACION + RESUMEN_REPARTO_SEGUNDOS + len(mensajes) / COLA_ENVIOS_POR_SEGUNDO
+        tramo = _id_tramo(tz_str, hora_str)
+        es_nuestro, ocupado_hasta = await reclamar_resumen(tramo, dia, INSTANCIA_ID, ahora + timedelta(seconds=plazo), ahora)
     except Exception as e:
-        print(f"🚨 Error enviando resumen al chat {chat_id}: {e}")
+        print(f"🚨 Error preparando los resúmenes del tramo {hora_str} ({tz_str}): {e}")
+        return
+
+    if not es_nuestro:
+        if ocupado_hasta is None:
+            print(f"  ⏭️ El resumen del tramo {hora_str} ({tz_str}) del {dia} ya se había enviado.")
+            return
+        # Lo está enviando otra instancia: si cuando venza su plazo no lo ha terminado, lo retomamos.
+        scheduler.add_job(
+            enviar_resumenes_tramo, 'date', run_date=ocupado_hasta, id=f"{_PREFIJO_REINTENTO}{tramo}",
+            args=[tz_str, hora_str, dia], replace_existing=True, misfire_grace_time=GRACIA_RESUMEN
+        )
+        print(f"  ⏭️ El resumen del tramo {hora_str} ({tz_str}) del {dia} lo está enviando otra instancia.")
+        return
+
+    await _enviar_resumenes(mensajes, inicio_tramo)
+    await completar_resumen(tramo, dia, datetime.now(pytz.utc))
+    print(f"  ✅ Resumen enviado a {len(mensajes)} chat(s) del tramo {hora_str} ({tz_str})")
 
 
 
@@ -48,27 +144,68 @@ async def enviar_resumen_para_usuario(chat_id: int):
 # FUNCIONES DE GESTIÓN DEL SCHEDULER
 # =============================================================================
 
+def _asegurar_tramo(tz_str: str, hora_str: str):
+    """Crea el job del tramo si todavía no existe (varios usuarios comparten el mismo)."""
+    job_id = _id_tramo(tz_str, hora_str)
+    if scheduler.get_job(job_id):
+        return
+    hora, minuto = map(int, hora_str.split(':'))
+    scheduler.add_job(
+        enviar_resumenes_tramo, trigger='cron', hour=hora, minute=minuto,
+        timezone=tz_str, id=job_id, args=[tz_str, hora_str],
+        replace_existing=True, coalesce=True, misfire_grace_time=GRACIA_RESUMEN
+    )
+    print(f"🗓️  Tramo de resumen diario creado: {hora_str} ({tz_str})")
+
+def _cancelar_job_legado(chat_id: int):
+    """Quita el job individual que pudiera quedar del sistema anterior (un resumen por usuario)."""
+    job_id = f'{_PREFIJO_LEGADO}{chat_id}'
+    if scheduler.get_job(job_id):
+        scheduler.remove_job(job_id)
+
 def programar_resumen_diario_usuario(chat_id: int, hora_str: str, tz_str: str):
     """
-    Programa o actualiza el job recurrente (cron) para el resumen diario de un usuario.
+    Programa o actualiza el resumen diario de un usuario.
+    La hora y la zona ya están guardadas en su configuración: basta con que exista el job de su tramo.
     """
     try:
-        hora, minuto = map(int, hora_str.split(':'))
-        scheduler.add_job(
-            enviar_resumen_para_usuario, trigger='cron', hour=hora, minute=minuto,
-            timezone=tz_str, id=f'resumen_diario_{chat_id}', args=[chat_id],
-            replace_existing=True
-        )
+        _cancelar_job_legado(chat_id)
+        _asegurar_tramo(tz_str, hora_str)
         print(f"🗓️  Resumen diario (re)programado para el usuario {chat_id} a las {hora_str} ({tz_str})")
     except Exception as e:
         print(f"🚨  Error al programar el resumen para {chat_id}: {e}")
 
 def cancelar_resumen_diario_usuario(chat_id: int):
-    """Cancela el job recurrente del resumen diario para un usuario."""
-    job_id = f'resumen_diario_{chat_id}'
+    """
+    Cancela el resumen diario de un usuario.
+    Con 'resumen_diario_activado' a '0' su tramo ya no lo incluye; el job del tramo se queda para los demás.
+    """
+    try:
+        _cancelar_job_legado(chat_id)
+        print(f"🗓️ Resumen diario cancelado para el usuario {chat_id}")
+    except Exception as e:
+        print(f"🚨 Error al cancelar el resumen para {chat_id}: {e}")
+
+async def sincronizar_resumenes():
+    """
+    Se llama al arrancar el bot: deja exactamente un job por cada tramo con suscriptores,
+    borra los tramos que se han quedado vacíos y los jobs antiguos de un resumen por usuario.
+    """
     try:
-        if scheduler.get_job(job_id):
-            scheduler.remove_job(job_id)
-            print(f"🗓️ Resumen diario cancelado para el usuario {chat_id}")
+        tramos = await get_tramos_resumen()
+        vigentes = set()
+        for tz_str, hora_str in tramos:
+            try:
+                _asegurar_tramo(tz_str, hora_str)
+                vigentes.add(_id_tramo(tz_str, hora_str))
+            except Exception as e:
+                print(f"🚨 Tramo de resumen no válido {hora_str} ({tz_str}): {e}")
+
+        retirados = 0
+        for job in scheduler.get_jobs():
+            if job.id.startswith(_PREFIJO_LEGADO) or (job.id.startswith(_PREFIJO_TRAMO) and job.id not in vigentes):
+                job.remove()
+                retirados += 1
+        print(f"🗓️  Resúmenes diarios sincronizados: {len(vigentes)} tramo(s), {retirados} job(s) obsoleto(s) retirado(s).")
     except Exception as e:
-        print(f"🚨 Error al cancelar el resumen para {chat_id}: {e}")
\ No newline at end of file
+        print(f"🚨 Error al sincronizar los resúmenes diarios: {e}")
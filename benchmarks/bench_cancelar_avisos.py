@@ -0,0 +1,90 @@
+# benchmarks/bench_cancelar_avisos.py
+"""
+Benchmark de la cancelación de avisos en bloque (AVISOS_MODO=jobs).
+
+Simula el "borrar todos los pasados" de /lista: programa N recordatorios
+(cada uno con su job principal y su aviso previo) y los cancela de dos formas:
+
+- 'bucle': `avisos.cancelar_avisos(rid)` para cada uno, como se hacía antes
+  (dos DELETE en el jobstore por recordatorio).
+- 'bulk': la parte bloqueante de `avisos.cancelar_avisos_bulk(rids)` (un DELETE),
+  sin el salto al hilo de la capa de datos, igual que el bucle.
+
+Necesita un jobstore de SQLAlchemy, así que con SQLite hay que usar un fichero:
+    DB_BACKEND=sqlite SQLITE_DB_PATH=/tmp/bench_cancelar.sqlite python benchmarks/bench_cancelar_avisos.py
+    python benchmarks/bench_cancelar_avisos.py --recordatorios 500   # contra SUPABASE_DB_URL
+
+¡Ojo! Con PostgreSQL la prueba crea y borra jobs en el jobstore real (con IDs
+negativos a partir de --rid-base, que no chocan con recordatorios reales).
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["AVISOS_MODO"] = "jobs"
+
+import pytz
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+
+import avisos
+from migraciones import aplicar_migraciones
+
+
+def _programar(rids: list[int]) -> None:
+    """Crea los dos jobs de cada recordatorio dentro de un año (no llegan a dispararse)."""
+    fecha = datetime.now(pytz.utc) + timedelta(days=365)
+    for rid in rids:
+        avisos.scheduler.add_job(
+            avisos.disparar_notificacion, 'date', run_date=fecha, args=[rid, "principal"],
+            id=f"recordatorio_{rid}", replace_existing=True
+        )
+        avisos.scheduler.add_job(
+            avisos.disparar_notificacion, 'date', run_date=fecha - timedelta(minutes=10), args=[rid, "previo"],
+            id=f"aviso_{rid}", replace_existing=True
+        )
+
+def _restantes(rids: list[int]) -> int:
+    ids = {f"{prefijo}{rid}" for rid in rids for prefijo in ("recordatorio_", "aviso_")}
+    return sum(1 for job in avisos.scheduler.get_jobs() if job.id in ids)
+
+async def main(num: int, rondas: int, rid_base: int) -> int:
+    aplicar_migraciones()
+    if not isinstance(avisos._JOBSTORE, SQLAlchemyJobStore):
+        print("🚨 El jobstore está en memoria (¿SQLITE_DB_PATH=:memory:?): usa un fichero o PostgreSQL.")
+        return 1
+    avisos.scheduler.start(paused=True)
+    rids = [rid_base - i for i in range(num)]
+
+    ok = True
+    for modo in ("bucle", "bulk"):
+        tiempos = []
+        for _ in range(rondas):
+            _programar(rids)
+            inicio = time.perf_counter()
+            if modo == "bucle":
+                for rid in rids:
+                    avisos.cancelar_avisos(str(rid))
+            else:
+                avisos._quitar_jobs_bulk(rids)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            ok = ok and _restantes(rids) == 0
+        mejor, media = min(tiempos), sum(tiempos) / len(tiempos)
+        print(f"{modo:>5} | recordatorios={num} jobs={2 * num} | mejor={mejor:9.1f} ms  media={media:9.1f} ms")
+
+    avisos.scheduler.shutdown(wait=False)
+    print("🎉 No queda ningún job de los cancelados." if ok else "🚨 Han quedado jobs sin cancelar.")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recordatorios", type=int, default=500, help="Nº de recordatorios a cancelar de golpe.")
+    parser.add_argument("--rondas", type=int, default=3, help="Nº de repeticiones de cada modo.")
+    parser.add_argument("--rid-base", type=int, default=-920_000_000, help="Primer ID simulado (negativo para no pisar recordatorios reales).")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.recordatorios, args.rondas, args.rid_base)))
@@ -0,0 +1,83 @@
+# benchmarks/bench_db_async.py
+"""
+Benchmark de la capa de datos: acceso síncrono vs asíncrono (db.py vs db_async.py).
+
+Simula N chats que escriben a la vez y ejecutan la secuencia de consultas de un
+/lista típico (zona horaria + página de recordatorios). Se mide, para cada chat,
+el tiempo desde que "llega" su mensaje hasta que termina de atenderse, y se
+informa de p50/p99 y del rendimiento total.
+
+- Modo 'sync': las funciones de db.py se llaman directamente dentro del event loop
+  (como hacían los handlers antes), así que cada consulta bloquea a todos los demás.
+- Modo 'async': se usan las funciones de db_async.py, que delegan en el pool de hilos.
+
+Uso (desde la raíz del proyecto, con las variables de entorno del bot definidas):
+    python benchmarks/bench_db_async.py --chats 100 --rondas 5
+
+Para tener una referencia sin red, se puede lanzar contra SQLite en memoria:
+    DB_BACKEND=sqlite SQLITE_DB_PATH=:memory: python benchmarks/bench_db_async.py
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import db_async
+from migraciones import aplicar_migraciones
+
+
+def percentil(valores: list[float], p: float) -> float:
+    """Percentil por el método del rango más cercano (suficiente para un benchmark)."""
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+async def _chat_sync(chat_id: int) -> None:
+    db.get_config(chat_id, "user_timezone")
+    db.get_recordatorios(chat_id, filtro="futuro", page=1, items_per_page=10)
+
+async def _chat_async(chat_id: int) -> None:
+    await db_async.get_config(chat_id, "user_timezone")
+    await db_async.get_recordatorios(chat_id, filtro="futuro", page=1, items_per_page=10)
+
+async def _ronda(modo: str, num_chats: int, chat_base: int) -> list[float]:
+    """Lanza todos los chats a la vez y devuelve la latencia (ms) de cada uno."""
+    atender = _chat_sync if modo == "sync" else _chat_async
+    inicio = time.perf_counter()
+
+    async def medir(chat_id: int) -> float:
+        await atender(chat_id)
+        return (time.perf_counter() - inicio) * 1000
+
+    return await asyncio.gather(*(medir(chat_base + i) for i in range(num_chats)))
+
+async def main(num_chats: int, rondas: int, chat_base: int) -> None:
+    aplicar_migraciones()  # Imprescindible con una base de datos nueva (SQLite en memoria); inocuo en las demás.
+    print(f"Motor: {db.DIALECTO}")
+    for modo in ("sync", "async"):
+        latencias: list[float] = []
+        inicio = time.perf_counter()
+        for _ in range(rondas):
+            latencias.extend(await _ronda(modo, num_chats, chat_base))
+        duracion = time.perf_counter() - inicio
+        print(
+            f"{modo:>5} | chats={num_chats} rondas={rondas} | "
+            f"p50={percentil(latencias, 50):8.1f} ms  p99={percentil(latencias, 99):8.1f} ms  "
+            f"media={statistics.mean(latencias):8.1f} ms | {len(latencias) / duracion:7.1f} chats/s"
+        )
+    db.cerrar_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=100, help="Nº de chats simultáneos simulados.")
+    parser.add_argument("--rondas", type=int, default=5, help="Nº de ráfagas de mensajes a simular.")
+    parser.add_argument("--chat-base", type=int, default=-900_000_000, help="Primer chat_id simulado (negativo para no pisar chats reales).")
+    args = parser.parse_args()
+    asyncio.run(main(args.chats, args.rondas, args.chat_base))
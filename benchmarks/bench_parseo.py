@@ -0,0 +1,234 @@
+# benchmarks/bench_parseo.py
+"""
+Benchmark (y prueba de regresión) del parseo de la entrada de los usuarios.
+
+Pasa un corpus de miles de recordatorios en español, realistas ("mañana a las 9
+* llamar a mamá", "cada lunes a las 8 * gimnasio", "25/12 a las 10 * ..."), por
+`parsear_recordatorio` con fechas de referencia fijas en varias zonas horarias
+(incluidos los cambios de hora de Europe/Madrid), y mide también
+`normalizar_hora`, `limpiar_texto_sin_fecha` y `parsear_tiempo_a_minutos`.
+
+- Exactitud: cada resultado (texto, fecha UTC, regla, error) se compara con el
+  esperado, guardado en benchmarks/corpus_parseo.jsonl.
+- Latencia: p50/p95/p99/máx de cada función, por llamada.
+- Memoria: pico de memoria reservada durante cada llamada (tracemalloc), en una
+  pasada aparte para que su sobrecoste no ensucie los tiempos.
+
+Termina con error si hay alguna discrepancia o se pasa de los umbrales, así que
+sirve para que un cambio en el parseo no empeore sin que nadie se entere.
+
+Uso (desde la raíz del proyecto, con las variables de entorno del bot definidas):
+    python benchmarks/bench_parseo.py
+    python benchmarks/bench_parseo.py --max-p95-ms 15 --max-kib 128
+    python benchmarks/bench_parseo.py --regenerar   # reescribe lo esperado con el parser actual (¡revisa el diff!)
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytz
+
+import metricas
+import utils
+from utils import limpiar_texto_sin_fecha, normalizar_hora, parsear_recordatorio, parsear_tiempo_a_minutos
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus_parseo.jsonl")
+SEMILLA = 2026
+ENTRADAS_POR_REFERENCIA = 300
+
+# Umbrales por defecto de parsear_recordatorio (holgados: la vía rápida y la caché los dejan muy por debajo).
+MAX_P95_MS = 10.0
+MAX_KIB = 64.0
+
+# (zona, momento de referencia local): un día normal, las vísperas y los propios cambios de hora de Madrid
+# (la 02:30 del 28/03/2027 no existe y la del 25/10/2026 ocurre dos veces) y otras zonas a ambos lados de UTC.
+REFERENCIAS = [
+    ("Europe/Madrid", datetime(2026, 10, 19, 9, 41, 7, 250000)),
+    ("Europe/Madrid", datetime(2026, 10, 24, 22, 15, 31, 500000)),
+    ("Europe/Madrid", datetime(2026, 10, 25, 1, 50, 12, 125000)),
+    ("Europe/Madrid", datetime(2027, 3, 27, 23, 5, 44, 750000)),
+    ("Europe/Madrid", datetime(2027, 3, 28, 1, 59, 0, 375000)),
+    ("America/New_York", datetime(2026, 12, 31, 20, 30, 9, 625000)),
+    ("America/Mexico_City", datetime(2026, 7, 14, 7, 12, 55, 875000)),
+    ("America/Argentina/Buenos_Aires", datetime(2027, 2, 26, 18, 0, 2, 100000)),
+    ("Asia/Tokyo", datetime(2027, 1, 1, 0, 30, 17, 900000)),
+    ("UTC", datetime(2028, 2, 28, 23, 47, 23, 400000)),
+]
+
+_TAREAS = [
+    "llamar a mamá", "comprar pan", "reunión con Ana", "pagar el alquiler", "sacar al perro",
+    "tomar la pastilla", "cita con el dentista", "regar las plantas", "enviar el informe a Luis",
+    "cumpleaños de la abuela", "renovar el DNI", "recoger a los niños", "poner la lavadora",
+    "revisar el correo", "entrenamiento", "llamar al fontanero", "pedir cita en el médico",
+    "devolver el libro a la biblioteca", "felicitar a Marta", "sacar la basura",
+]
+_DIAS = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+_MESES = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto",
+          "septiembre", "octubre", "noviembre", "diciembre"]
+_FORMAS = [
+    "mañana a las {h}", "mañana a las {h}:{mi}", "hoy a las {h}:{mi}", "hoy {h}:{mi}", "manana a las {h}",
+    "el {dia} a las {h}", "{dia} a las {h}:{mi}", "el {dia}", "{d}/{mo} a las {h}", "el {d}/{mo}/2027 a las {h}:{mi}",
+    "en {n} minutos", "en {n} horas", "en {n} días", "en una hora", "pasado mañana a las {h}",
+    "el {d} de {mes} a las {h}", "{d} de {mes}", "el próximo {dia} a las {h}", "mañana por la tarde",
+    "cada {dia} a las {h}", "todos los días a las {h}:{mi}", "de lunes a viernes a las {h}",
+    "cada fin de semana a las {h}", "cada mes a las {h}", "cada {dia} y {dia2} a las {h}",
+    "a las {h}", "dentro de {n} horas", "el finde", "ayer a las {h}",
+]
+_TIEMPOS = {"0": 0, "30m": 30, "45M": 45, "2h": 120, " 1H ": 60, "1d": 1440, "3d": 4320, "90": None,
+            "h": None, "dos horas": None, "": None, "1.5h": None}
+
+
+# =============================================================================
+# CORPUS
+# =============================================================================
+
+def _entradas(aleatorio: random.Random) -> list[str]:
+    entradas = []
+    for _ in range(ENTRADAS_POR_REFERENCIA):
+        forma = aleatorio.choice(_FORMAS)
+        dia, dia2 = aleatorio.sample(_DIAS, 2)
+        fecha = forma.format(
+            h=aleatorio.randrange(24), mi=aleatorio.choice(["00", "15", "30", "45", "05"]), dia=dia, dia2=dia2,
+            d=aleatorio.randrange(13, 29), mo=aleatorio.randrange(1, 13), mes=aleatorio.choice(_MESES),
+            n=aleatorio.choice([1, 2, 5, 10, 15, 30, 45, 90]),
+        )
+        tarea = aleatorio.choice(_TAREAS)
+        # De vez en cuando, errores típicos: sin asterisco, sin fecha o sin texto.
+        rareza = aleatorio.random()
+        if rareza < 0.03:
+            entradas.append(f"{fecha} {tarea}")
+        elif rareza < 0.05:
+            entradas.append(f"* {tarea}")
+        elif rareza < 0.07:
+            entradas.append(f"{fecha} *")
+        else:
+            entradas.append(f"{fecha} * {tarea}")
+    return entradas
+
+def _resultado(entrada: str, tz_str: str, ahora: datetime) -> dict:
+    texto, fecha, regla, error = parsear_recordatorio(entrada, tz_str, ahora=ahora)
+    return {"texto": texto, "fecha_utc": fecha.isoformat() if fecha else None, "regla": regla, "error": error is not None}
+
+def regenerar():
+    aleatorio = random.Random(SEMILLA)
+    with open(CORPUS, "w", encoding="utf-8") as f:
+        for tz_str, local in REFERENCIAS:
+            ahora = pytz.timezone(tz_str).localize(local).astimezone(pytz.utc)
+            for entrada in _entradas(aleatorio):
+                caso = {"entrada": entrada, "tz": tz_str, "ahora": ahora.isoformat(), **_resultado(entrada, tz_str, ahora)}
+                f.write(json.dumps(caso, ensure_ascii=False) + "\n")
+    print(f"📝 Corpus regenerado: {len(REFERENCIAS) * ENTRADAS_POR_REFERENCIA} entradas en {CORPUS}")
+
+def cargar() -> list[dict]:
+    with open(CORPUS, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f]
+
+
+# =============================================================================
+# MEDICIÓN
+# =============================================================================
+
+def _percentiles(valores: list[float]) -> tuple[float, float, float, float]:
+    ordenados = sorted(valores)
+    p = lambda q: ordenados[min(len(ordenados) - 1, int(q / 100 * len(ordenados)))]
+    return p(50), p(95), p(99), ordenados[-1]
+
+def _llamadas(casos: list[dict]) -> dict[str, list]:
+    """Las llamadas a medir de cada función, como (función, argumentos)."""
+    fragmentos = [caso["entrada"].split("*", 1)[0].strip() for caso in casos]
+    return {
+        "parsear_recordatorio": [
+            (parsear_recordatorio, (caso["entrada"], caso["tz"], datetime.fromisoformat(caso["ahora"]))) for caso in casos
+        ],
+        "normalizar_hora": [(normalizar_hora, (fragmento,)) for fragmento in fragmentos],
+        "limpiar_texto_sin_fecha": [(limpiar_texto_sin_fecha, (caso["entrada"], fragmento)) for caso, fragmento in zip(casos, fragmentos)],
+        "parsear_tiempo_a_minutos": [(parsear_tiempo_a_minutos, (valor,)) for valor in _TIEMPOS] * (len(casos) // len(_TIEMPOS)),
+    }
+
+def _medir(llamadas: list) -> tuple[list[float], list[float]]:
+    """Devuelve los milisegundos de cada llamada y, en otra pasada con tracemalloc, los KiB de pico de cada una."""
+    utils._cache_fechas.clear()
+    tiempos = []
+    for funcion, argumentos in llamadas:
+        inicio = time.perf_counter()
+        funcion(*argumentos)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    utils._cache_fechas.clear()
+    memoria = []
+    tracemalloc.start()
+    for funcion, argumentos in llamadas:
+        tracemalloc.reset_peak()
+        antes = tracemalloc.get_traced_memory()[0]
+        funcion(*argumentos)
+        memoria.append((tracemalloc.get_traced_memory()[1] - antes) / 1024)
+    tracemalloc.stop()
+    return tiempos, memoria
+
+def _comprobar(casos: list[dict], mostrar: int) -> int:
+    fallos = 0
+    for caso in casos:
+        obtenido = _resultado(caso["entrada"], caso["tz"], datetime.fromisoformat(caso["ahora"]))
+        esperado = {clave: caso[clave] for clave in obtenido}
+        if obtenido != esperado:
+            fallos += 1
+            if fallos <= mostrar:
+                print(f"  ✗ [{caso['tz']} {caso['ahora']}] {caso['entrada']!r}\n      esperado={esperado}\n      obtenido={obtenido}")
+    fallos_tiempo = [valor for valor, minutos in _TIEMPOS.items() if parsear_tiempo_a_minutos(valor) != minutos]
+    for valor in fallos_tiempo[:mostrar]:
+        print(f"  ✗ parsear_tiempo_a_minutos({valor!r}) = {parsear_tiempo_a_minutos(valor)}, esperado {_TIEMPOS[valor]}")
+    return fallos + len(fallos_tiempo)
+
+def main(max_p95_ms: float, max_kib: float, mostrar: int) -> int:
+    casos = cargar()
+    print(f"Corpus: {len(casos)} entradas, {len(REFERENCIAS)} referencias")
+
+    # Una pasada de calentamiento: la primera llamada a dateparser carga los datos del idioma.
+    parsear_recordatorio("mañana a las 9 * calentar", "Europe/Madrid")
+    fallos = _comprobar(casos, mostrar)
+    print(f"Exactitud: {len(casos) + len(_TIEMPOS) - fallos}/{len(casos) + len(_TIEMPOS)} correctas")
+
+    metricas.reiniciar()
+    ok = fallos == 0
+    print(f"\n{'función':<26} {'llamadas':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'máx ms':>8} | {'p95 KiB':>8} {'máx KiB':>8}")
+    for nombre, llamadas in _llamadas(casos).items():
+        tiempos, memoria = _medir(llamadas)
+        p50, p95, p99, maximo = _percentiles(tiempos)
+        _, kib_p95, _, kib_max = _percentiles(memoria)
+        print(f"{nombre:<26} {len(llamadas):>8} {p50:>8.3f} {p95:>8.3f} {p99:>8.3f} {maximo:>8.2f} | {kib_p95:>8.1f} {kib_max:>8.1f}")
+        if nombre == "parsear_recordatorio":
+            if p95 > max_p95_ms:
+                print(f"  🚨 p95 de {p95:.2f} ms por encima del umbral ({max_p95_ms:g} ms)")
+                ok = False
+            if kib_p95 > max_kib:
+                print(f"  🚨 p95 de memoria de {kib_p95:.1f} KiB por encima del umbral ({max_kib:g} KiB)")
+                ok = False
+
+    parseos = metricas.contadores("parseo.")
+    total = parseos.get("parseo.rapido", 0) + parseos.get("parseo.cache.aciertos", 0) + parseos.get("parseo.dateparser", 0)
+    if total:
+        print(f"\nVía rápida {parseos.get('parseo.rapido', 0) / total:.1%} · caché {parseos.get('parseo.cache.aciertos', 0) / total:.1%}"
+              f" · dateparser {parseos.get('parseo.dateparser', 0) / total:.1%} (dos pasadas: tiempos y memoria)")
+    print("🎉 Parseo correcto y dentro de los umbrales." if ok else "🚨 El parseo ha empeorado.")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--regenerar", action="store_true", help="Reescribe los resultados esperados con el parser actual.")
+    parser.add_argument("--max-p95-ms", type=float, default=MAX_P95_MS, help="Umbral del p95 de parsear_recordatorio (ms).")
+    parser.add_argument("--max-kib", type=float, default=MAX_KIB, help="Umbral del p95 del pico de memoria de parsear_recordatorio (KiB).")
+    parser.add_argument("--mostrar", type=int, default=10, help="Nº máximo de discrepancias a enseñar.")
+    args = parser.parse_args()
+    if args.regenerar:
+        regenerar()
+        sys.exit(0)
+    sys.exit(main(args.max_p95_ms, args.max_kib, args.mostrar))
@@ -0,0 +1,160 @@
+# benchmarks/dos_instancias.py
+"""
+Prueba de entrega sin duplicados con varias instancias del bot (AVISOS_MODO=dispatcher).
+
+Siembra N recordatorios cuyo aviso vence en los próximos segundos y lanza
+varios procesos independientes con el scheduler y el despachador en marcha
+(como `iniciar_scheduler` al arrancar el bot), compitiendo por las mismas
+notificaciones. Además siembra un tramo de resumen diario con M chats suscritos
+y todas las instancias disparan a la vez su job, como harían los schedulers que
+comparten el jobstore. Cada proceso usa un bot falso que, en vez de llamar a
+Telegram, anota cada envío en un fichero. Al terminar se comprueba que cada
+notificación y cada resumen se han enviado exactamente una vez.
+
+Uso (desde la raíz del proyecto, con las variables de entorno del bot definidas):
+    DB_BACKEND=sqlite SQLITE_DB_PATH=/tmp/dos_instancias.sqlite python benchmarks/dos_instancias.py
+    python benchmarks/dos_instancias.py --recordatorios 500 --procesos 3   # contra SUPABASE_DB_URL
+
+¡Ojo! Con PostgreSQL la prueba escribe en la base de datos configurada (chats
+negativos a partir de --chat-base) y borra lo que ha sembrado al terminar.
+"""
+
+import argparse
+import asyncio
+import collections
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["AVISOS_MODO"] = "dispatcher"
+
+import pytz
+
+import avisos
+import avisos_resumen_diario
+import db
+from migraciones import aplicar_migraciones
+
+# Tramo de resumen de la prueba: una zona que no usa nadie, para no juntarse con chats reales.
+_TZ_RESUMEN = "Etc/GMT+12"
+
+
+class _BotFalso:
+    """Sustituye al bot de Telegram: anota cada envío como una línea 'chat_id<TAB>texto'."""
+
+    def __init__(self, fichero: str):
+        self.fichero = fichero
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        await asyncio.sleep(0.01)  # Latencia simulada de la API de Telegram.
+        with open(self.fichero, "a", encoding="utf-8") as f:
+            f.write(f"{chat_id}\t{text.replace(chr(10), ' ')}\n")
+
+
+class _AppFalsa:
+    def __init__(self, fichero: str):
+        self.bot = _BotFalso(fichero)
+
+
+async def _instancia(fichero: str, segundos: float, hora_resumen: str):
+    """Cuerpo de cada proceso hijo: el scheduler y el despachador funcionando durante 'segundos'."""
+    app = _AppFalsa(fichero)
+    await avisos.iniciar_scheduler(app)
+    # El job del tramo, disparado en todas las instancias a la vez.
+    await avisos_resumen_diario.enviar_resumenes_tramo(_TZ_RESUMEN, hora_resumen)
+    await asyncio.sleep(segundos)
+    await avisos.detener_avisos(app)
+    avisos.detener_scheduler()
+
+async def _preparar_jobstore():
+    """Crea la tabla del jobstore antes de lanzar los hijos: si arrancan a la vez sobre una DB nueva, compiten por crearla."""
+    avisos.scheduler.start(paused=True)
+    avisos.scheduler.shutdown(wait=False)
+
+def _sembrar(num: int, chat_base: int, retraso: float) -> list[int]:
+    """Crea 'num' recordatorios repartidos en 'retraso' segundos, con su aviso principal ya fijado."""
+    ahora = datetime.now(pytz.utc)
+    rids = []
+    for i in range(num):
+        fecha = ahora + timedelta(seconds=retraso * (i + 1) / num)
+        rid, _ = db.insertar_recordatorio(chat_base - i, f"Prueba {i}", fecha, "UTC")
+        db.fijar_aviso_en(rid, fecha)
+        rids.append(rid)
+    return rids
+
+def _sembrar_resumen(num: int, chat_base: int) -> str:
+    """Suscribe 'num' chats al resumen de un mismo tramo, cada uno con una tarea para hoy. Devuelve la hora del tramo."""
+    ahora_local = datetime.now(pytz.timezone(_TZ_RESUMEN))
+    hora = ahora_local.strftime("%H:%M")
+    for i in range(num):
+        chat_id = chat_base - i
+        db.set_config_many(chat_id, {"resumen_diario_activado": "1", "resumen_diario_hora": hora, "user_timezone": _TZ_RESUMEN})
+        db.insertar_recordatorio(chat_id, f"Resumen {i}", ahora_local.astimezone(pytz.utc), _TZ_RESUMEN)
+    return hora
+
+def main(num: int, procesos: int, chat_base: int, resumenes: int) -> int:
+    aplicar_migraciones()
+    asyncio.run(_preparar_jobstore())
+    retraso = 5.0
+    _sembrar(num, chat_base, retraso)
+    base_resumen = chat_base - num
+    hora_resumen = _sembrar_resumen(resumenes, base_resumen)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ficheros = [os.path.join(carpeta, f"instancia_{i}.txt") for i in range(procesos)]
+        hijos = [
+            subprocess.Popen(
+                [sys.executable, __file__, "--hijo", fichero, "--segundos", str(retraso + 5), "--hora-resumen", hora_resumen],
+                # Sin reparto: los resúmenes salen enseguida y la prueba no se alarga.
+                env={**os.environ, "INSTANCIA_ID": f"prueba-{i}", "RESUMEN_REPARTO_SEGUNDOS": "0"},
+            )
+            for i, fichero in enumerate(ficheros)
+        ]
+        codigos = [hijo.wait() for hijo in hijos]
+
+        envios = collections.Counter()
+        por_instancia = []
+        for fichero in ficheros:
+            lineas = open(fichero, encoding="utf-8").read().splitlines() if os.path.exists(fichero) else []
+            por_instancia.append(len(lineas))
+            envios.update(int(linea.split("\t")[0]) for linea in lineas)
+
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            ultimo = base_resumen - resumenes
+            cursor.execute("DELETE FROM recordatorios WHERE chat_id <= %s AND chat_id > %s", (chat_base, ultimo))
+            cursor.execute("DELETE FROM configuracion WHERE chat_id <= %s AND chat_id > %s", (base_resumen, ultimo))
+            cursor.execute("DELETE FROM resumenes_tramo WHERE tramo LIKE %s", (f"%{_TZ_RESUMEN}%",))
+
+    esperados = {chat_base - i for i in range(num + resumenes)}
+    duplicados = [chat for chat, veces in envios.items() if veces > 1]
+    perdidos = esperados - set(envios)
+    print(f"Envíos por instancia: {por_instancia} (total {sum(por_instancia)} de {num} avisos + {resumenes} resúmenes)")
+    print(f"Duplicados: {len(duplicados)} · Perdidos: {len(perdidos)} · Códigos de salida: {codigos}")
+    ok = not duplicados and not perdidos and not any(codigos)
+    print("🎉 Cada aviso y cada resumen se han entregado exactamente una vez." if ok else "🚨 La entrega NO ha sido exactamente una vez.")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recordatorios", type=int, default=200, help="Nº de avisos a repartir.")
+    parser.add_argument("--procesos", type=int, default=2, help="Nº de instancias compitiendo.")
+    parser.add_argument("--resumenes", type=int, default=50, help="Nº de chats suscritos al tramo de resumen de la prueba.")
+    parser.add_argument("--chat-base", type=int, default=-910_000_000, help="Primer chat_id simulado (negativo para no pisar chats reales).")
+    parser.add_argument("--hijo", help=argparse.SUPPRESS)
+    parser.add_argument("--segundos", type=float, default=10, help=argparse.SUPPRESS)
+    parser.add_argument("--hora-resumen", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        asyncio.run(_instancia(args.hijo, args.segundos, args.hora_resumen))
+        sys.exit(0)
+    inicio = time.perf_counter()
+    codigo = main(args.recordatorios, args.procesos, args.chat_base, args.resumenes)
+    print(f"Duración: {time.perf_counter() - inicio:.1f} s")
+    sys.exit(codigo)
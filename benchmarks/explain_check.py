@@ -0,0 +1,190 @@
+# benchmarks/explain_check.py
+"""
+Comprobación de planes de consulta (EXPLAIN) sobre una tabla grande.
+
+Crea un esquema temporal en la base de datos, aplica todas las migraciones,
+lo rellena con ~1M de recordatorios repartidos entre 10.000 chats y pide a
+PostgreSQL el plan de las consultas principales del bot. Si alguna hace un
+recorrido secuencial (Seq Scan) sobre 'recordatorios' o 'configuracion', el
+script termina con error: falta un índice para esa forma de consulta.
+
+Las sentencias se capturan llamando a las propias funciones de db.py (y las
+páginas de /lista salen del mismo constructor que usa db.get_recordatorios),
+así que son exactamente las que lanza el bot.
+
+Uso (desde la raíz del proyecto, con las variables de entorno del bot definidas):
+    python benchmarks/explain_check.py [--filas 1000000] [--dsn postgresql://...] [--conservar]
+"""
+
+import argparse
+import json
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import psycopg2
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from config import SUPABASE_DB_URL
+from migraciones import aplicar_migraciones_en
+
+ESQUEMA = "explain_check"
+FILAS_POR_CHAT = 100
+TABLAS_VIGILADAS = {"recordatorios", "configuracion"}
+
+
+# Sentencias de db.py (nombre de _ejecutar) que se comprueban: si alguna deja de lanzarse, el script falla.
+SENTENCIAS_VIGILADAS = {
+    "config.cargar", "recordatorio.por_id", "recordatorio.por_user_id", "recordatorio.por_user_ids",
+    "disparo.cargar", "lista.borrar_por_filtro", "borrar.por_user_ids", "cambiar.alternar_estado",
+    "avisos.ventana", "entregas.leer_recordatorio", "avisos.avanzar", "avisos.avanzar_principal",
+    "recuperacion.buscar", "resumen.tramos", "resumen.recordatorios",
+}
+
+
+def _capturar_sentencias(conn, llamadas: list[tuple]) -> list[tuple[str, str, tuple]]:
+    """
+    Llama de verdad a las funciones de db.py sobre el esquema temporal (deshaciendo después lo que
+    cambien) y devuelve (nombre, sql, params) de cada sentencia que pasan a _ejecutar(). Así se
+    comprueba el mismo SQL que lanza el bot, no una copia que se pueda quedar atrás.
+    """
+    capturadas = []
+    ejecutar_original, conexion_original = db._ejecutar, db.get_connection
+
+    def _ejecutar_y_anotar(cursor, nombre, sql, params=None):
+        capturadas.append((f"{nombre}[{etiqueta}]" if etiqueta else nombre, sql, params))
+        return ejecutar_original(cursor, nombre, sql, params)
+
+    @contextmanager
+    def _conexion_del_esquema():
+        yield conn
+
+    db._ejecutar, db.get_connection = _ejecutar_y_anotar, _conexion_del_esquema
+    try:
+        for etiqueta, funcion, *args in llamadas:
+            try:
+                funcion(*args)
+            finally:
+                conn.rollback()
+    finally:
+        db._ejecutar, db.get_connection = ejecutar_original, conexion_original
+    return capturadas
+
+def _consultas_principales(conn, chat_id: int) -> list[tuple[str, str, tuple]]:
+    """Devuelve (nombre, sql, params) de las consultas que el bot lanza en los caminos calientes."""
+    ahora = datetime.now(pytz.utc)
+    consultas = []
+
+    # Las páginas de /lista salen del mismo constructor que usa db.get_recordatorios.
+    for filtro in ("futuro", "pasado", "hechos", "pendientes", "hoy"):
+        sql, params, _ = db._construir_consulta_lista(chat_id, filtro, 10, None, 0, ahora, "Europe/Madrid")
+        consultas.append((f"lista.{filtro}.pagina1", sql, tuple(params)))
+        for direccion in ("n", "p"):
+            cursor = (direccion, ahora + timedelta(days=3), 123)
+            sql, params, _ = db._construir_consulta_lista(chat_id, filtro, 10, cursor, 0, ahora, "Europe/Madrid")
+            consultas.append((f"lista.{filtro}.cursor_{direccion}", sql, tuple(params)))
+
+    rid = chat_id * FILAS_POR_CHAT
+    user_ids = [3, 7, 42]
+    db.invalidar_cache_config(chat_id)
+    consultas += _capturar_sentencias(conn, [
+        (None, db.get_all_config, chat_id),
+        (None, db.get_recordatorio_por_id, rid),
+        (None, db.get_recordatorio_por_user_id, chat_id, 7),
+        (None, db.get_recordatorios_por_user_ids, chat_id, user_ids),
+        (None, db.get_recordatorios_para_disparo, [rid, rid + 1, rid + 2]),
+        ("pasados", db.borrar_recordatorios_por_filtro, chat_id, "pasados"),
+        ("hechos", db.borrar_recordatorios_por_filtro, chat_id, "hechos"),
+        (None, db.borrar_recordatorios_por_user_ids, chat_id, user_ids),
+        (None, db.cambiar_estado_recordatorios, chat_id, user_ids),
+        (None, db.get_avisos_en_ventana, ahora + timedelta(minutes=10), 5000),
+        (None, db.reclamar_entrega, rid, ahora, "explain_check", ahora + timedelta(seconds=30), ahora),
+        (None, db.completar_entrega, rid, ahora, ahora),
+        (None, db.avanzar_a_aviso_principal, rid),
+        (None, db.get_avisos_perdidos, ahora - timedelta(minutes=10), ahora),
+        (None, db.get_tramos_resumen),
+        (None, db.get_recordatorios_resumen, "Europe/Madrid", "08:00", ahora, ahora + timedelta(days=1)),
+    ])
+    return consultas
+
+def _nodos_seq_scan(plan: dict) -> list[str]:
+    """Recorre el árbol del plan y devuelve las tablas vigiladas que se leen con Seq Scan."""
+    encontrados = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in TABLAS_VIGILADAS:
+        encontrados.append(plan["Relation Name"])
+    for hijo in plan.get("Plans", []):
+        encontrados += _nodos_seq_scan(hijo)
+    return encontrados
+
+def _sembrar(conn, filas: int) -> None:
+    """Rellena el esquema temporal con datos sintéticos y actualiza las estadísticas del planificador."""
+    with conn.cursor() as cursor:
+        print(f"🌱 Sembrando {filas} recordatorios...")
+        cursor.execute("""
+            INSERT INTO recordatorios (user_id, chat_id, texto, fecha_hora, estado, aviso_previo, timezone)
+            SELECT (g %% %s) + 1, g / %s, 'Recordatorio ' || g,
+                   now() + ((g %% 2000) - 1000) * interval '1 hour', (g %% 3 = 0)::int, 0, 'Europe/Madrid'
+            FROM generate_series(0, %s - 1) AS g
+        """, (FILAS_POR_CHAT, FILAS_POR_CHAT, filas))
+        cursor.execute("""
+            INSERT INTO configuracion (chat_id, clave, valor)
+            SELECT c, k, 'valor' FROM generate_series(0, %s) AS c,
+                   unnest(ARRAY['user_timezone', 'modo_seguro', 'resumen_diario_activado', 'resumen_diario_hora']) AS k
+        """, (filas // FILAS_POR_CHAT,))
+        cursor.execute("ANALYZE recordatorios")
+        cursor.execute("ANALYZE configuracion")
+    conn.commit()
+
+def main(dsn: str, filas: int, conservar: bool) -> int:
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE")
+            cursor.execute(f"CREATE SCHEMA {ESQUEMA}")
+            cursor.execute(f"SET search_path TO {ESQUEMA}")
+        conn.commit()
+
+        aplicar_migraciones_en(conn)
+        _sembrar(conn, filas)
+
+        fallos = 0
+        chat_id = (filas // FILAS_POR_CHAT) // 2
+        consultas = _consultas_principales(conn, chat_id)
+        for nombre in sorted(SENTENCIAS_VIGILADAS - {nombre.split("[")[0] for nombre, _, _ in consultas}):
+            fallos += 1
+            print(f"❌ {nombre}: db.py ya no la lanza (¿se ha renombrado?); revisa las llamadas de este script.")
+        for nombre, sql, params in consultas:
+            with conn.cursor() as cursor:
+                cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+            tablas = _nodos_seq_scan(plan[0]["Plan"])
+            if tablas:
+                fallos += 1
+                print(f"❌ {nombre}: Seq Scan sobre {', '.join(sorted(set(tablas)))}")
+            else:
+                print(f"✅ {nombre}")
+        conn.rollback()
+
+        print(f"\n{'🚨' if fallos else '🎉'} {fallos} consulta(s) con recorrido secuencial.")
+        return 1 if fallos else 0
+    finally:
+        if not conservar:
+            with conn.cursor() as cursor:
+                cursor.execute(f"DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE")
+            conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=SUPABASE_DB_URL, help="Cadena de conexión (por defecto, SUPABASE_DB_URL).")
+    parser.add_argument("--filas", type=int, default=1_000_000, help="Nº de recordatorios a sembrar.")
+    parser.add_argument("--conservar", action="store_true", help="No borrar el esquema temporal al terminar.")
+    args = parser.parse_args()
+    sys.exit(main(args.dsn, args.filas, args.conservar))
@@ -0,0 +1,105 @@
+# benchmarks/parseo_equivalencia.py
+"""
+Equivalencia de la vía rápida de parseo de fechas (parseo_rapido.py) con dateparser.
+
+Genera un corpus con las formas que reconoce la vía rápida ("mañana a las 9",
+"el lunes a las 9", "25/12 a las 10", "en 2 horas"...) y otras que no, y lo
+parsea con varias fechas base y zonas horarias (incluidos los cambios de hora
+de Europe/Madrid y los fines de año). Para cada entrada que reconoce la vía
+rápida se comprueba que devuelve el mismo texto de fecha y el mismo instante
+que `search_dates` con los ajustes de `utils.parsear_recordatorio`.
+
+Uso (desde la raíz del proyecto, con las variables de entorno del bot definidas):
+    python benchmarks/parseo_equivalencia.py
+    python benchmarks/parseo_equivalencia.py --mostrar 50   # enseña más discrepancias
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytz
+from dateparser.search import search_dates
+
+import parseo_rapido
+from utils import ajustes_dateparser, normalizar_hora
+
+# (zona, fecha base local): días normales, los dos cambios de hora de Madrid y fines de año a ambos lados de UTC.
+BASES = [
+    ("Europe/Madrid", datetime(2026, 10, 19, 8, 0)),
+    ("Europe/Madrid", datetime(2026, 10, 19, 20, 37, 12, 345678)),
+    ("Europe/Madrid", datetime(2026, 10, 24, 12, 0)),
+    ("Europe/Madrid", datetime(2026, 10, 25, 1, 30)),
+    ("Europe/Madrid", datetime(2027, 3, 27, 2, 30)),
+    ("Europe/Madrid", datetime(2027, 3, 28, 1, 30)),
+    ("Europe/Madrid", datetime(2026, 12, 31, 23, 59, 59)),
+    ("America/New_York", datetime(2026, 10, 19, 20, 0)),
+    ("America/New_York", datetime(2026, 12, 31, 20, 0)),
+    ("America/Argentina/Buenos_Aires", datetime(2026, 6, 15, 22, 45)),
+    ("Asia/Tokyo", datetime(2027, 1, 1, 5, 0)),
+    ("Asia/Kolkata", datetime(2026, 10, 19, 23, 30)),
+    ("UTC", datetime(2028, 2, 28, 23, 0)),
+]
+
+_HORAS = ["", " 9:30", " a las 0:00", " a las 2:30", " a las 9", " a las 12:00", " a las 18:30", " a las 23:59"]
+_DIAS = ["lunes", "martes", "miércoles", "miercoles", "jueves", "viernes", "sábado", "sabado", "domingo"]
+_FECHAS = ["25/12", "13/10", "18/10", "19/10", "20/10", "25/10", "28/03", "31/12", "01/01", "1/1", "29/02", "31/02",
+           "1/3", "2/1", "1/13", "25/12/2026", "19/10/2027", "29/02/2027"]
+_DENTRO_DE = ["en 0 minutos", "en 1 minuto", "en 1 minutos", "en 30 minutos", "en 90 minutos", "en un minuto",
+              "en 1 hora", "en 2 horas", "en 24 horas", "en una hora", "en 1 día", "en 2 dias", "en un dia",
+              "en 1 semana", "en 3 semanas", "en una semana", "EN 2 HORAS"]
+# Formas que la vía rápida deja a dateparser.
+_OTRAS = ["pasado mañana a las 9", "a las 9", "mañana, a las 9", "el lunes que viene", "25-12 a las 10",
+          "mañana a la 1", "en 2 horas y 30 minutos", "dentro de 2 horas", "mañana a las 9:30h", "hoy  a las 9",
+          "en media hora", "el 25 de diciembre a las 10", "mañana por la tarde", "el próximo viernes", "en 2 meses"]
+
+
+def generar_corpus() -> list[str]:
+    corpus = [dia + hora for dia in ("hoy", "mañana", "manana", "Mañana", "HOY") for hora in _HORAS]
+    corpus += [prefijo + dia + hora for prefijo in ("", "el ", "El ") for dia in _DIAS + ["Lunes"] for hora in _HORAS]
+    corpus += [prefijo + fecha + hora for prefijo in ("", "el ") for fecha in _FECHAS for hora in _HORAS]
+    return corpus + _DENTRO_DE + _OTRAS
+
+def comparar(corpus: list[str], mostrar: int) -> int:
+    aciertos = fallos = 0
+    t_rapida = t_dateparser = 0.0
+    discrepancias = []
+    for tz_str, base_local in BASES:
+        tz = pytz.timezone(tz_str)
+        ajustes = ajustes_dateparser(tz_str, tz.localize(base_local))
+        for entrada in corpus:
+            texto = normalizar_hora(entrada)
+            inicio = time.perf_counter()
+            rapida = parseo_rapido.buscar_fecha(texto, tz, ajustes['RELATIVE_BASE'])
+            t_rapida += time.perf_counter() - inicio
+            if rapida is None:
+                fallos += 1
+                continue
+            aciertos += 1
+            inicio = time.perf_counter()
+            fechas = search_dates(texto, languages=['es'], settings=ajustes)
+            t_dateparser += time.perf_counter() - inicio
+            esperada = fechas[0] if fechas else None
+            if esperada is None or esperada[0] != rapida[0] or esperada[1] != rapida[1]:
+                discrepancias.append((tz_str, base_local, texto, rapida, esperada))
+
+    total = aciertos + fallos
+    print(f"Entradas: {total} ({len(corpus)} × {len(BASES)} fechas base)")
+    print(f"Vía rápida: {aciertos} ({aciertos / total:.1%}) · a dateparser: {fallos}")
+    if aciertos:
+        print(f"Tiempo medio: vía rápida {t_rapida / total * 1e6:.1f} µs/entrada · dateparser {t_dateparser / aciertos * 1e6:.1f} µs/entrada")
+    for tz_str, base_local, texto, rapida, esperada in discrepancias[:mostrar]:
+        print(f"  ✗ [{tz_str} {base_local}] {texto!r}: rápida={rapida} dateparser={esperada}")
+    print("🎉 Las dos vías coinciden en todo el corpus." if not discrepancias else f"🚨 {len(discrepancias)} discrepancia(s).")
+    return 1 if discrepancias else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mostrar", type=int, default=20, help="Nº máximo de discrepancias a enseñar.")
+    args = parser.parse_args()
+    sys.exit(comparar(generar_corpus(), args.mostrar))
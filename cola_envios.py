@@ -0,0 +1,240 @@
+# cola_envios.py
+"""
+Cola Global de Envíos a Telegram.
+
+Todos los mensajes proactivos del bot (avisos principales, avisos previos y
+resúmenes diarios) pasan por aquí en lugar de llamar a `bot.send_message`
+directamente. La cola:
+
+- Limita el ritmo global con un cubo de fichas (COLA_ENVIOS_POR_SEGUNDO) y deja
+  al menos COLA_INTERVALO_POR_CHAT segundos entre dos mensajes al mismo chat.
+- Atiende primero a la clase más prioritaria: un aviso principal adelanta a los
+  avisos previos, y estos a los resúmenes diarios pendientes.
+- Reintenta sola los RetryAfter (pausando todos los envíos el tiempo que pide
+  Telegram) y los TimedOut (con espera exponencial, hasta COLA_MAX_INTENTOS).
+
+Quien encola recibe un Future con el resultado del envío (el Message, o la
+excepción definitiva como Forbidden), así que puede esperarlo como si hubiera
+llamado a `send_message`.
+"""
+
+import asyncio
+import heapq
+import itertools
+from typing import Optional
+
+from telegram.error import RetryAfter, TimedOut
+
+# Importaciones módulos locales
+import bot_state
+import metricas
+from config import COLA_ENVIOS_POR_SEGUNDO, COLA_INTERVALO_POR_CHAT, COLA_MAX_INTENTOS
+
+# --- Clases de prioridad (menor número = sale antes) ---
+PRIORIDAD_RECORDATORIO = 0
+PRIORIDAD_AVISO = 1
+PRIORIDAD_RESUMEN = 2
+
+NOMBRES_PRIORIDAD = {
+    PRIORIDAD_RECORDATORIO: "recordatorio",
+    PRIORIDAD_AVISO: "aviso",
+    PRIORIDAD_RESUMEN: "resumen",
+}
+
+# Por encima de este nº de chats se olvidan los que ya pueden volver a recibir (para que el diccionario no crezca sin fin).
+_MAX_CHATS_RECORDADOS = 10_000
+
+
+class _Envio:
+    """Un mensaje pendiente de enviar y el Future por el que espera quien lo encoló."""
+
+    __slots__ = ("chat_id", "texto", "kwargs", "prioridad", "futuro", "encolado_en", "intentos")
+
+    def __init__(self, chat_id: int, texto: str, kwargs: dict, prioridad: int, futuro: asyncio.Future, ahora: float):
+        self.chat_id = chat_id
+        self.texto = texto
+        self.kwargs = kwargs
+        self.prioridad = prioridad
+        self.futuro = futuro
+        self.encolado_en = ahora
+        self.intentos = 0
+
+
+_secuencia = itertools.count()                         # Desempate FIFO dentro de la misma prioridad
+_listos: list[tuple[int, int, _Envio]] = []            # (prioridad, secuencia, envío): se pueden mandar ya
+_en_espera: list[tuple[float, int, _Envio]] = []       # (no antes de, secuencia, envío): ritmo por chat o reintentos
+_proximo_por_chat: dict[int, float] = {}               # chat_id -> instante (loop.time) a partir del cual puede recibir
+_fichas: float = 0.0
+_fichas_actualizadas: float = 0.0
+_pausa_hasta: float = 0.0                              # RetryAfter: nadie envía hasta este instante
+_hay_trabajo: Optional[asyncio.Event] = None
+_tarea: Optional[asyncio.Task] = None
+_envios_en_curso: set[asyncio.Task] = set()
+
+
+# =============================================================================
+# INTERFAZ PÚBLICA
+# =============================================================================
+
+def encolar(
+    chat_id: int, texto: str, prioridad: int = PRIORIDAD_RECORDATORIO, diferir: float = 0.0, **kwargs
+) -> asyncio.Future:
+    """
+    Mete un mensaje en la cola. Los kwargs se pasan tal cual a `send_message` (parse_mode, reply_markup...).
+    Con 'diferir' el mensaje no sale hasta pasados esos segundos (p. ej., para repartir los resúmenes diarios).
+
+    Returns:
+        asyncio.Future: Se resuelve con el Message enviado o con la excepción que lo impidió.
+    """
+    iniciar()
+    loop = asyncio.get_running_loop()
+    # La espera en cola se mide desde que el mensaje PUEDE salir, no desde que se encoló diferido.
+    envio = _Envio(chat_id, texto, kwargs, prioridad, loop.create_future(), loop.time() + max(0.0, diferir))
+    if diferir > 0:
+        heapq.heappush(_en_espera, (envio.encolado_en, next(_secuencia), envio))
+    else:
+        heapq.heappush(_listos, (prioridad, next(_secuencia), envio))
+    metricas.observar("cola.profundidad", len(_listos) + len(_en_espera))
+    _hay_trabajo.set()
+    return envio.futuro
+
+async def enviar(chat_id: int, texto: str, prioridad: int = PRIORIDAD_RECORDATORIO, **kwargs):
+    """Encola un mensaje y espera a que se envíe. Lanza la excepción definitiva si no se pudo."""
+    return await encolar(chat_id, texto, prioridad, **kwargs)
+
+def profundidad() -> dict[str, int]:
+    """Mensajes pendientes ahora mismo por clase de prioridad (para /metricas)."""
+    pendientes = {nombre: 0 for nombre in NOMBRES_PRIORIDAD.values()}
+    for _, _, envio in itertools.chain(_listos, _en_espera):
+        pendientes[NOMBRES_PRIORIDAD[envio.prioridad]] += 1
+    return pendientes
+
+def iniciar():
+    """Arranca el bucle de la cola en el event loop actual (una sola vez; encolar() lo hace si hace falta)."""
+    global _tarea, _hay_trabajo, _fichas, _fichas_actualizadas
+    if _tarea is not None:
+        return
+    loop = asyncio.get_running_loop()
+    _hay_trabajo = asyncio.Event()
+    _fichas, _fichas_actualizadas = COLA_ENVIOS_POR_SEGUNDO, loop.time()
+    _tarea = loop.create_task(_bucle())
+    print(f"📤 Cola de envíos iniciada ({COLA_ENVIOS_POR_SEGUNDO:g} mensajes/s).")
+
+async def detener():
+    """Detiene la cola: espera a los envíos en curso y cancela los que aún no habían salido."""
+    global _tarea
+    if _tarea is None:
+        return
+    _tarea.cancel()
+    try:
+        await _tarea
+    except asyncio.CancelledError:
+        pass
+    _tarea = None
+    if _envios_en_curso:
+        await asyncio.gather(*_envios_en_curso, return_exceptions=True)
+    for _, _, envio in itertools.chain(_listos, _en_espera):
+        envio.futuro.cancel()
+    _listos.clear()
+    _en_espera.clear()
+
+
+# =============================================================================
+# BUCLE DE LA COLA
+# =============================================================================
+
+def _reprogramar(envio: _Envio, no_antes: float):
+    heapq.heappush(_en_espera, (no_antes, next(_secuencia), envio))
+    _hay_trabajo.set()
+
+async def _mandar(envio: _Envio):
+    """Hace el envío real y resuelve el Future, o lo vuelve a encolar si el error es transitorio."""
+    global _pausa_hasta
+    loop = asyncio.get_running_loop()
+    envio.intentos += 1
+    clase = NOMBRES_PRIORIDAD[envio.prioridad]
+    try:
+        mensaje = await bot_state.telegram_app.bot.send_message(chat_id=envio.chat_id, text=envio.texto, **envio.kwargs)
+    except RetryAfter as e:
+        # Telegram nos pide parar: frenamos TODOS los envíos, no solo este, y lo reintentamos después.
+        metricas.incrementar("cola.retry_after")
+        print(f"⏳ Telegram pide esperar {e.retry_after} s: cola de envíos en pausa.")
+        _pausa_hasta = max(_pausa_hasta, loop.time() + e.retry_after)
+        _reprogramar(envio, _pausa_hasta)
+    except TimedOut as e:
+        if envio.intentos < COLA_MAX_INTENTOS:
+            metricas.incrementar("cola.reintentos")
+            _reprogramar(envio, loop.time() + 2 ** (envio.intentos - 1))
+        else:
+            metricas.incrementar("cola.fallidos")
+            if not envio.futuro.done():
+                envio.futuro.set_exception(e)
+    except Exception as e:
+        metricas.incrementar("cola.fallidos")
+        if not envio.futuro.done():
+            envio.futuro.set_exception(e)
+    else:
+        metricas.incrementar(f"cola.enviados.{clase}")
+        metricas.observar(f"cola.espera.{clase}", (loop.time() - envio.encolado_en) * 1000)
+        if not envio.futuro.done():
+            envio.futuro.set_result(mensaje)
+
+def _lanzar(envio: _Envio):
+    """Cada envío va en su propia tarea: la latencia de la API no limita el ritmo de la cola."""
+    tarea = asyncio.get_running_loop().create_task(_mandar(envio))
+    _envios_en_curso.add(tarea)
+    tarea.add_done_callback(_envios_en_curso.discard)
+
+async def _esperar(segundos: Optional[float]):
+    """Duerme hasta 'segundos' (None = sin límite), o menos si llega trabajo nuevo."""
+    try:
+        await asyncio.wait_for(_hay_trabajo.wait(), timeout=segundos)
+    except asyncio.TimeoutError:
+        pass
+
+async def _bucle():
+    global _fichas, _fichas_actualizadas
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            _hay_trabajo.clear()
+            ahora = loop.time()
+
+            while _en_espera and _en_espera[0][0] <= ahora:
+                _, secuencia, envio = heapq.heappop(_en_espera)
+                heapq.heappush(_listos, (envio.prioridad, secuencia, envio))
+
+            if not _listos:
+                await _esperar(_en_espera[0][0] - ahora if _en_espera else None)
+                continue
+            if _pausa_hasta > ahora:
+                await asyncio.sleep(_pausa_hasta - ahora)
+                continue
+
+            # Cubo de fichas: se rellena de forma continua hasta un segundo de ráfaga.
+            _fichas = min(COLA_ENVIOS_POR_SEGUNDO, _fichas + (ahora - _fichas_actualizadas) * COLA_ENVIOS_POR_SEGUNDO)
+            _fichas_actualizadas = ahora
+            if _fichas < 1:
+                await asyncio.sleep((1 - _fichas) / COLA_ENVIOS_POR_SEGUNDO)
+                continue
+
+            _, secuencia, envio = heapq.heappop(_listos)
+            if envio.futuro.done():
+                continue  # Quien lo encoló ya no lo espera (cancelado).
+            libre_en = _proximo_por_chat.get(envio.chat_id, 0.0)
+            if libre_en > ahora:
+                # Ese chat acaba de recibir un mensaje: este espera su turno sin frenar a los demás chats.
+                heapq.heappush(_en_espera, (libre_en, secuencia, envio))
+                continue
+
+            _fichas -= 1
+            if len(_proximo_por_chat) > _MAX_CHATS_RECORDADOS:
+                for chat_id in [c for c, t in _proximo_por_chat.items() if t <= ahora]:
+                    del _proximo_por_chat[chat_id]
+            _proximo_por_chat[envio.chat_id] = ahora + COLA_INTERVALO_POR_CHAT
+            _lanzar(envio)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"🚨 Error en la cola de envíos: {e}")
+            await asyncio.sleep(1)
@@ -9,6 +9,7 @@ manteniendo la compatibilidad con las variables de entorno de producción (Rende
 
 import locale
 import os
+import socket
 from dotenv import load_dotenv
 
 # --- Carga de Variables de Entorno ---
@@ -56,18 +57,118 @@ if OWNER_ID_STR and OWNER_ID_STR.isdigit():
     OWNER_ID = int(OWNER_ID_STR)
 
 
+# =============================================================================
+# MOTOR DE ALMACENAMIENTO
+# =============================================================================
+
+# 'postgres' (Supabase, producción) o 'sqlite' (fichero local o ':memory:', para desarrollo y benchmarks).
+DB_BACKEND: str = os.getenv("DB_BACKEND", "postgres").lower()
+# Ruta del fichero SQLite (datos y jobs del scheduler). ':memory:' crea una base de datos en memoria.
+SQLITE_DB_PATH: str = os.getenv("SQLITE_DB_PATH", "bot.sqlite")
+
+
+# =============================================================================
+# POOL DE CONEXIONES A LA BASE DE DATOS
+# =============================================================================
+
+# Nº mínimo de conexiones que el pool mantiene abiertas y nº máximo que puede llegar a abrir.
+DB_POOL_MIN: int = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX: int = int(os.getenv("DB_POOL_MAX", "10"))
+# Segundos de vida máxima de una conexión antes de reciclarla (el pooler de Supabase corta las viejas).
+DB_POOL_MAX_LIFETIME: int = int(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+# Segundos de inactividad a partir de los cuales se comprueba la conexión (SELECT 1) antes de usarla.
+DB_POOL_HEALTHCHECK_IDLE: int = int(os.getenv("DB_POOL_HEALTHCHECK_IDLE", "30"))
+
+
+# =============================================================================
+# CACHÉ DE CONFIGURACIÓN POR CHAT
+# =============================================================================
+
+# Nº máximo de chats cuya configuración se guarda en memoria (se expulsa el menos usado).
+CONFIG_CACHE_MAX: int = int(os.getenv("CONFIG_CACHE_MAX", "10000"))
+# Segundos que una configuración cacheada se considera válida antes de volver a leerla de la DB.
+CONFIG_CACHE_TTL: int = int(os.getenv("CONFIG_CACHE_TTL", "300"))
+
+
+# =============================================================================
+# ENTREGA DE AVISOS
+# =============================================================================
+
+# 'jobs': un job de APScheduler por aviso (modo clásico).
+# 'dispatcher': la tabla 'recordatorios' es la fuente de verdad y un despachador en memoria
+#               mantiene solo las notificaciones de los próximos minutos (ver despachador.py).
+AVISOS_MODO: str = os.getenv("AVISOS_MODO", "jobs").lower()
+# Minutos por delante que el despachador tiene cargados en memoria, y máximo de filas por recarga.
+AVISOS_VENTANA_MIN: int = int(os.getenv("AVISOS_VENTANA_MIN", "10"))
+AVISOS_VENTANA_MAX_FILAS: int = int(os.getenv("AVISOS_VENTANA_MAX_FILAS", "5000"))
+# Segundos que una instancia tiene en exclusiva una notificación reclamada (si se cae, otra la reintenta).
+AVISOS_PLAZO_RECLAMACION: int = int(os.getenv("AVISOS_PLAZO_RECLAMACION", "30"))
+# Identificador de esta instancia del bot en las reclamaciones (por defecto, máquina y proceso).
+INSTANCIA_ID: str = os.getenv("INSTANCIA_ID") or f"{socket.gethostname()}-{os.getpid()}"
+# Horas hacia atrás que se revisan como mucho al arrancar en busca de avisos perdidos mientras el bot estaba caído.
+AVISOS_RECUPERAR_MAX_HORAS: int = int(os.getenv("AVISOS_RECUPERAR_MAX_HORAS", "24"))
+# Segundos que se esperan a otros avisos principales del mismo chat para mandarlos juntos en un solo mensaje (0 = no agrupar).
+AVISOS_AGRUPAR_SEGUNDOS: float = float(os.getenv("AVISOS_AGRUPAR_SEGUNDOS", "2"))
+
+
+# =============================================================================
+# COLA DE ENVÍOS A TELEGRAM
+# =============================================================================
+
+# Mensajes por segundo que el bot envía como mucho en total (Telegram corta a partir de ~30/s).
+COLA_ENVIOS_POR_SEGUNDO: float = float(os.getenv("COLA_ENVIOS_POR_SEGUNDO", "30"))
+# Segundos mínimos entre dos mensajes al mismo chat (Telegram admite ~1 mensaje/s por chat).
+COLA_INTERVALO_POR_CHAT: float = float(os.getenv("COLA_INTERVALO_POR_CHAT", "1.0"))
+# Intentos de un envío que falla por tiempo de espera agotado antes de darlo por perdido.
+COLA_MAX_INTENTOS: int = int(os.getenv("COLA_MAX_INTENTOS", "5"))
+
+
+# =============================================================================
+# RESUMEN DIARIO
+# =============================================================================
+
+# Segundos por los que se reparten los resúmenes de un mismo tramo horario (0 = todos a la vez).
+# Cada chat recibe el suyo con un desfase fijo dentro de esa ventana (08:00-08:05 con 300); la hora en /ajustes no cambia.
+RESUMEN_REPARTO_SEGUNDOS: float = float(os.getenv("RESUMEN_REPARTO_SEGUNDOS", "300"))
+
+
+# =============================================================================
+# PARSEO DE FECHAS
+# =============================================================================
+
+# Nº máximo de resultados de dateparser que se guardan en memoria (se expulsa el menos usado; 0 = sin caché).
+PARSEO_CACHE_MAX: int = int(os.getenv("PARSEO_CACHE_MAX", "2048"))
+# Procesos aparte en los que se ejecuta dateparser para no bloquear el bucle del bot (0 = en el propio bucle).
+PARSEO_PROCESOS: int = int(os.getenv("PARSEO_PROCESOS", "0"))
+# Segundos que se espera a uno de esos procesos antes de responder al usuario que no se ha podido entender la fecha.
+PARSEO_TIMEOUT_SEGUNDOS: float = float(os.getenv("PARSEO_TIMEOUT_SEGUNDOS", "5"))
+
+
+# =============================================================================
+# MÉTRICAS
+# =============================================================================
+
+# Milisegundos a partir de los cuales una consulta a la DB se anota en el log de consultas lentas.
+SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Objetivo de puntualidad: un aviso cumple si llega como mucho estos segundos después de su hora (ver /metricas).
+AVISOS_SLO_SEGUNDOS: float = float(os.getenv("AVISOS_SLO_SEGUNDOS", "10"))
+
+
 # =============================================================================
 # VALIDACIÓN DE SEGURIDAD INICIAL
 # =============================================================================
 
 # Comprobación de que las variables esenciales han sido cargadas.
-if not TOKEN or not OWNER_ID or not SUPABASE_DB_URL:
+FALTA_URL_DB = DB_BACKEND == "postgres" and not SUPABASE_DB_URL
+if not TOKEN or not OWNER_ID or FALTA_URL_DB or DB_BACKEND not in ("postgres", "sqlite"):
     print("🚨 ¡ERROR DE CONFIGURACIÓN! 🚨")
     if not TOKEN:
         print("- La variable de entorno TELEGRAM_TOKEN no está definida.")
     if not OWNER_ID:
         print("- La variable de entorno OWNER_ID no está definida o no es un número válido.")
-    if not SUPABASE_DB_URL:
-        print("- La variable de entorno SUPABASE_DB_URL no está definida.")
+    if FALTA_URL_DB:
+        print("- La variable de entorno SUPABASE_DB_URL no está definida (obligatoria con DB_BACKEND=postgres).")
+    if DB_BACKEND not in ("postgres", "sqlite"):
+        print(f"- DB_BACKEND='{DB_BACKEND}' no es válido. Usa 'postgres' o 'sqlite'.")
     print("Asegúrate de haber creado un archivo .env en local o de haber configurado las variables en tu plataforma de despliegue.")
     exit()
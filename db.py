@@ -3,62 +3,88 @@
 Módulo de Acceso a la Base de Datos (Capa de Datos).
 
 Este archivo contiene toda la lógica para interactuar con la base de datos externa
-alojada en Supabase (PostgreSQL).
+alojada en Supabase (PostgreSQL), o con una base de datos SQLite local si así se
+configura (ver `db_backends.py`).
 """
 
-import psycopg2
+import threading
+import time
+from collections import OrderedDict
 from typing import Tuple, List, Optional
 from datetime import datetime
 import pytz
 
 # Importaciones módulos locales
-from config import SUPABASE_DB_URL
+import metricas
+from config import CONFIG_CACHE_MAX, CONFIG_CACHE_TTL, SLOW_QUERY_MS
+from db_backends import crear_backend
 
 
-def get_connection(): 
+# =============================================================================
+# MOTOR DE ALMACENAMIENTO Y CONEXIONES
+# =============================================================================
+
+# El motor (PostgreSQL con pool o SQLite local) se elige con DB_BACKEND en config.py.
+# Crearlo no abre ninguna conexión: eso ocurre en la primera petición.
+_backend = crear_backend()
+
+# 'postgres' o 'sqlite': solo unas pocas sentencias necesitan una variante por motor.
+DIALECTO: str = _backend.dialecto
+
+
+def get_connection():
     """
-    Establece y devuelve una conexión a la base de datos PostgreSQL en Supabase.
+    Presta una conexión del motor de almacenamiento configurado.
+
+    Se usa igual que antes (`with get_connection() as conn:`): al salir del bloque
+    se hace commit (o rollback si hubo una excepción) y la conexión se libera.
     """
-    # psycopg2 gestiona el 'threading' de forma diferente y más robusta.
-    # No se necesita el check_same_thread=False.
-    return psycopg2.connect(SUPABASE_DB_URL)
+    return _backend.conexion()
+
+def cerrar_pool():
+    """Cierra todas las conexiones abiertas (al apagar el bot)."""
+    _backend.cerrar()
+
+def url_jobstore() -> Optional[str]:
+    """URL de SQLAlchemy para el jobstore de APScheduler en el mismo motor (None = guardar los jobs en memoria)."""
+    return _backend.url_jobstore()
 
 
 # =============================================================================
-# INICIALIZACIÓN DE LA BASE DE DATOS
+# MEDICIÓN DE CONSULTAS
 # =============================================================================
 
-def crear_tablas():
+# Todas las sentencias pasan por _ejecutar() con un nombre lógico ('lista.pagina', 'recordar.insertar'...),
+# que es el que aparece en /metricas y en el log de consultas lentas.
+
+def _forma_parametros(params) -> str:
+    """Describe los parámetros de una consulta por su tipo (y tamaño de las tuplas), sin revelar su contenido."""
+    if params is None:
+        return "()"
+    formas = []
+    for valor in params:
+        if isinstance(valor, (tuple, list)):
+            formas.append(f"{type(valor).__name__}[{len(valor)}]")
+        else:
+            formas.append(type(valor).__name__)
+    return f"({', '.join(formas)})"
+
+def _ejecutar(cursor, nombre: str, sql: str, params=None):
     """
-    Crea las tablas 'recordatorios' y 'configuracion' si no existen.
-    """
-    # Usamos 'with' para asegurar que la conexión y el cursor se cierren solos.
-    with get_connection() as conn:
-        with conn.cursor() as cursor:
-            # CAMBIO: La sintaxis de autoincremento en PostgreSQL es SERIAL o BIGSERIAL.
-            # BIGSERIAL es mejor para IDs que pueden crecer mucho.
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS recordatorios (
-                    id BIGSERIAL PRIMARY KEY,                  -- ID único global
-                    user_id INTEGER NOT NULL,
-                    chat_id BIGINT NOT NULL,                   -- Usar BIGINT para chat_id por si acaso
-                    texto TEXT,
-                    fecha_hora TIMESTAMPTZ,                    -- TIMESTAMPTZ es el tipo ideal para UTC en Postgres
-                    estado INTEGER DEFAULT 0,
-                    aviso_previo INTEGER,
-                    timezone TEXT
-                )
-            """)
+    Ejecuta una sentencia midiendo su duración en el histograma 'sql.<nombre>'.
 
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS configuracion (
-                    chat_id BIGINT NOT NULL,
-                    clave TEXT NOT NULL,
-                    valor TEXT,
-                    PRIMARY KEY (chat_id, clave)
-                )
-            """)
-            
+    Si supera SLOW_QUERY_MS se registra en el log de consultas lentas con la FORMA de
+    sus parámetros (tipos), nunca con sus valores: ahí irían los textos de los usuarios.
+    """
+    inicio = time.perf_counter()
+    try:
+        cursor.execute(sql, params)
+    finally:
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        metricas.observar(f"sql.{nombre}", duracion_ms)
+        if duracion_ms >= SLOW_QUERY_MS:
+            metricas.incrementar("sql.lentas")
+            print(f"🐢 Consulta lenta '{nombre}': {duracion_ms:.0f} ms · parámetros {_forma_parametros(params)}")
 
 
 # =============================================================================
@@ -67,130 +93,795 @@ def crear_tablas():
 
 # CAMBIO CLAVE: PostgreSQL usa %s como placeholder en lugar de ?.
 
-def get_config(chat_id: int, key: str) -> Optional[str]:
-    """Obtiene el valor de una clave de configuración para un usuario."""
+# --- Caché en memoria de la tabla 'configuracion' ---
+# La configuración de un chat casi nunca cambia, pero se lee en casi todos los handlers.
+# Guardamos TODAS las claves de cada chat: chat_id -> (cargado_en, {clave: valor}).
+# Es una LRU acotada (OrderedDict) con caducidad, y las escrituras la actualizan al momento.
+_cache_config: "OrderedDict[int, tuple[float, dict[str, Optional[str]]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+# Contador de escrituras: una carga que empezó antes de una escritura no debe pisar la caché con datos viejos.
+_cache_escrituras = 0
+
+
+def leer_cache_config(chat_id: int) -> Optional[dict[str, Optional[str]]]:
+    """Devuelve la configuración cacheada de un chat (sin ir a la DB), o None si no está o ha caducado."""
+    with _cache_lock:
+        entrada = _cache_config.get(chat_id)
+        if entrada is None:
+            return None
+        if time.monotonic() - entrada[0] > CONFIG_CACHE_TTL:
+            del _cache_config[chat_id]
+            return None
+        _cache_config.move_to_end(chat_id)
+        return entrada[1]
+
+def _guardar_cache_config(chat_id: int, valores: dict[str, Optional[str]], escrituras_al_cargar: int):
+    """Mete en la caché la configuración recién cargada, expulsando al chat menos usado si hace falta."""
+    with _cache_lock:
+        if escrituras_al_cargar != _cache_escrituras:
+            return  # Alguien ha escrito mientras cargábamos: mejor no cachear este resultado.
+        _cache_config[chat_id] = (time.monotonic(), valores)
+        _cache_config.move_to_end(chat_id)
+        while len(_cache_config) > CONFIG_CACHE_MAX:
+            _cache_config.popitem(last=False)
+
+def _escribir_en_cache_config(chat_id: int, valores: dict[str, Optional[str]]):
+    """Write-through: refleja en la caché (si el chat está cargado) lo que se acaba de guardar en la DB."""
+    global _cache_escrituras
+    with _cache_lock:
+        _cache_escrituras += 1
+        entrada = _cache_config.get(chat_id)
+        if entrada is not None:
+            # Se crea un diccionario nuevo en vez de modificarlo: quien tenga el antiguo lo sigue leyendo sin sustos.
+            _cache_config[chat_id] = (entrada[0], {**entrada[1], **valores})
+
+def invalidar_cache_config(chat_id: Optional[int] = None):
+    """Olvida la configuración cacheada de un chat (o de todos si no se indica ninguno)."""
+    global _cache_escrituras
+    with _cache_lock:
+        _cache_escrituras += 1
+        if chat_id is None:
+            _cache_config.clear()
+        else:
+            _cache_config.pop(chat_id, None)
+
+def _cargar_config(chat_id: int) -> dict[str, Optional[str]]:
+    """Devuelve toda la configuración de un chat, desde la caché o con UNA SOLA CONSULTA a la DB."""
+    valores = leer_cache_config(chat_id)
+    if valores is not None:
+        return valores
+
+    escrituras_al_cargar = _cache_escrituras
     with get_connection() as conn:
         with conn.cursor() as cursor:
-            cursor.execute("SELECT valor FROM configuracion WHERE chat_id = %s AND clave = %s", (chat_id, key))
-            row = cursor.fetchone()
-            return row[0] if row else None
+            _ejecutar(cursor, "config.cargar", "SELECT clave, valor FROM configuracion WHERE chat_id = %s", (chat_id,))
+            valores = dict(cursor.fetchall())
+    _guardar_cache_config(chat_id, valores, escrituras_al_cargar)
+    return valores
+
+def get_all_config(chat_id: int) -> dict[str, Optional[str]]:
+    """Obtiene todas las claves de configuración de un usuario en un diccionario."""
+    return dict(_cargar_config(chat_id))
+
+def get_config(chat_id: int, key: str) -> Optional[str]:
+    """Obtiene el valor de una clave de configuración para un usuario."""
+    return _cargar_config(chat_id).get(key)
 
 def set_config(chat_id: int, key: str, value: str):
     """Establece o actualiza el valor de una clave de configuración para un usuario."""
+    set_config_many(chat_id, {key: value})
+
+def set_config_many(chat_id: int, valores: dict[str, str]):
+    """Establece o actualiza varias claves de configuración de un usuario con UNA SOLA SENTENCIA."""
+    if not valores:
+        return
     with get_connection() as conn:
         with conn.cursor() as cursor:
             # CAMBIO: 'INSERT OR REPLACE' es de SQLite. El equivalente en PostgreSQL es 'INSERT ... ON CONFLICT'.
-            sql = """
-                INSERT INTO configuracion (chat_id, clave, valor) VALUES (%s, %s, %s)
+            filas = ", ".join(["(%s, %s, %s)"] * len(valores))
+            sql = f"""
+                INSERT INTO configuracion (chat_id, clave, valor) VALUES {filas}
                 ON CONFLICT (chat_id, clave) DO UPDATE SET valor = EXCLUDED.valor;
             """
-            cursor.execute(sql, (chat_id, key, value))
+            params = [dato for clave, valor in valores.items() for dato in (chat_id, clave, valor)]
+            _ejecutar(cursor, "config.guardar", sql, params)
+    _escribir_en_cache_config(chat_id, valores)
 
 # =============================================================================
 # FUNCIONES DE GESTIÓN DE RECORDATORIOS
 # =============================================================================
 
-def get_recordatorios(chat_id: int, filtro: str = "futuro", page: int = 1, items_per_page: int = 7) -> Tuple[List, int]:
+# Orden estándar de las columnas de un recordatorio en todas las consultas que devuelven filas completas.
+COLUMNAS_RECORDATORIO = "id, user_id, chat_id, texto, fecha_hora, estado, aviso_previo, timezone, recurrencia"
+
+# Cursor de paginación por clave (keyset): (dirección, fecha_hora, id) de la fila frontera de la página actual.
+# La dirección es 'n' (página siguiente: filas DESPUÉS de la frontera) o 'p' (anterior: filas ANTES de ella).
+CursorLista = Tuple[str, Optional[datetime], int]
+
+
+def _construir_consulta_lista(
+    chat_id: int, filtro: str, items_per_page: int, cursor: Optional[CursorLista],
+    offset: int, now_utc: datetime, user_tz_str: str
+) -> Tuple[str, list, bool]:
+    """
+    Construye la consulta de una página de la lista.
+
+    El total de elementos viaja en la misma consulta (subconsulta escalar), de modo
+    que pasar de página cuesta un único viaje a la DB. Con cursor, la página se
+    obtiene por rango sobre (fecha_hora, id) en lugar de con OFFSET, que se vuelve
+    lineal en las páginas profundas.
+
+    Returns:
+        tuple: (sql, params, invertida). Si 'invertida' es True las filas llegan en orden
+               inverso (página anterior) y hay que darles la vuelta.
+    """
+    query_where = "WHERE chat_id = %s"
+    params_where: list = [chat_id]
+
+    # AÑADIMOS LOS FILTROS POR ESTADO
+    if filtro == "hechos":
+        query_where += " AND estado = 1"
+        # No se añaden más parámetros
+    elif filtro == "pendientes":
+        query_where += " AND estado = 0"
+
+    # AÑADIMOS LOS FILTROS TEMPORALES 
+    if filtro == "futuro":
+        query_where += " AND (fecha_hora IS NULL OR fecha_hora > %s)"
+        params_where.append(now_utc) # psycopg2 maneja objetos datetime directamente
+    elif filtro == "pasado":
+        query_where += " AND fecha_hora IS NOT NULL AND fecha_hora <= %s"
+        params_where.append(now_utc)
+    elif filtro == "hoy":
+        user_tz = pytz.timezone(user_tz_str)
+        now_local = now_utc.astimezone(user_tz)
+        
+        start_of_day_local = now_local.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_of_day_local = now_local.replace(hour=23, minute=59, second=59, microsecond=999999)
+
+        start_of_day_utc = start_of_day_local.astimezone(pytz.utc)
+        end_of_day_utc = end_of_day_local.astimezone(pytz.utc)
+        
+        query_where += " AND estado = 0 AND fecha_hora >= %s AND fecha_hora <= %s"
+        params_where.extend([start_of_day_utc, end_of_day_utc])
+
+    # Si filtramos por estado, tiene más sentido ordenar por fecha de más reciente a más antiguo.
+    ascendente = filtro not in ["hechos", "pendientes"]
+    invertida = cursor is not None and cursor[0] == "p"
+    if invertida:
+        ascendente = not ascendente  # Para la página anterior recorremos el índice al revés.
+
+    # El 'id' desempata las filas con la misma fecha, así el orden es total y el cursor no salta ni repite filas.
+    # Los NULL van al final en orden ascendente y al principio en descendente (lo habitual en PostgreSQL).
+    if ascendente:
+        query_order = "ORDER BY fecha_hora ASC NULLS LAST, id ASC"
+    else:
+        query_order = "ORDER BY fecha_hora DESC NULLS FIRST, id DESC"
+
+    query_keyset = ""
+    params_keyset: list = []
+    if cursor is not None:
+        _, fecha_cursor, id_cursor = cursor
+        if fecha_cursor is not None and ascendente:
+            query_keyset = " AND ((fecha_hora, id) > (%s, %s) OR fecha_hora IS NULL)"
+            params_keyset = [fecha_cursor, id_cursor]
+        elif fecha_cursor is not None:
+            query_keyset = " AND (fecha_hora, id) < (%s, %s)"
+            params_keyset = [fecha_cursor, id_cursor]
+        elif ascendente:
+            query_keyset = " AND fecha_hora IS NULL AND id > %s"
+            params_keyset = [id_cursor]
+        else:
+            query_keyset = " AND (fecha_hora IS NOT NULL OR id < %s)"
+            params_keyset = [id_cursor]
+        offset = 0
+
+    sql = (
+        f"SELECT {COLUMNAS_RECORDATORIO}, (SELECT COUNT(id) FROM recordatorios {query_where}) "
+        f"FROM recordatorios {query_where}{query_keyset} {query_order} LIMIT %s OFFSET %s"
+    )
+    params = params_where + params_where + params_keyset + [items_per_page, offset]
+    return sql, params, invertida
+
+def get_recordatorios(
+    chat_id: int, filtro: str = "futuro", page: int = 1, items_per_page: int = 7,
+    cursor: Optional[CursorLista] = None
+) -> Tuple[List, int]:
+    """
+    Obtiene una página de recordatorios de un chat y el total de elementos del filtro.
+
+    Sin cursor se pagina por OFFSET a partir de 'page' (la primera página siempre va así).
+    Con cursor se pagina por clave (keyset) desde la fila frontera que indica.
+    """
     now_utc = datetime.now(pytz.utc)
+    # La zona horaria se lee ANTES de abrir la conexión, para no ocupar dos conexiones del pool a la vez.
+    user_tz_str = (get_config(chat_id, "user_timezone") or "UTC") if filtro == "hoy" else "UTC"
+
+    sql, params, invertida = _construir_consulta_lista(
+        chat_id, filtro, items_per_page, cursor, (page - 1) * items_per_page, now_utc, user_tz_str
+    )
+    with get_connection() as conn:
+        with conn.cursor() as cursor_db:
+            _ejecutar(cursor_db, "lista.pagina", sql, tuple(params))
+            filas = cursor_db.fetchall()
+
+    if not filas:
+        return [], 0
+
+    total_items = filas[0][-1]
+    recordatorios_pagina = [fila[:-1] for fila in filas]
+    if invertida:
+        recordatorios_pagina.reverse()
+    return recordatorios_pagina, total_items
+
+def get_recordatorio_por_id(rid: int) -> Optional[tuple]:
+    """Obtiene un recordatorio completo a partir de su ID global."""
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "recordatorio.por_id", f"SELECT {COLUMNAS_RECORDATORIO} FROM recordatorios WHERE id = %s", (rid,))
+            return cursor.fetchone()
+
+def get_recordatorio_por_user_id(chat_id: int, user_id: int) -> Optional[tuple]:
+    """Obtiene un recordatorio completo a partir del ID corto (#) que ve el usuario en su chat."""
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "recordatorio.por_user_id",
+                f"SELECT {COLUMNAS_RECORDATORIO} FROM recordatorios WHERE user_id = %s AND chat_id = %s",
+                (user_id, chat_id)
+            )
+            return cursor.fetchone()
+
+def get_recordatorios_para_disparo(rids: List[int]) -> List[tuple]:
+    """
+    Carga, en UNA SOLA CONSULTA, los recordatorios de los jobs que vencen a la vez (por ID global).
+
+    Returns:
+        list: Filas con las COLUMNAS_RECORDATORIO más 'aviso_en'. Los borrados no aparecen.
+    """
+    if not rids:
+        return []
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "disparo.cargar",
+                f"SELECT {COLUMNAS_RECORDATORIO}, aviso_en FROM recordatorios WHERE id IN %s", (tuple(rids),)
+            )
+            return cursor.fetchall()
+
+def get_recordatorios_por_user_ids(chat_id: int, user_ids: List[int]) -> List[tuple]:
+    """Obtiene, en UNA SOLA CONSULTA, todos los recordatorios de un chat cuyos IDs cortos se indican."""
+    if not user_ids:
+        return []
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            # psycopg2 puede manejar una tupla de valores para 'IN' directamente.
+            _ejecutar(cursor, "recordatorio.por_user_ids",
+                f"SELECT {COLUMNAS_RECORDATORIO} FROM recordatorios WHERE user_id IN %s AND chat_id = %s",
+                (tuple(user_ids), chat_id)
+            )
+            return cursor.fetchall()
+
+def _reservar_user_ids(cursor, chat_id: int, cantidad: int = 1) -> int:
+    """
+    Reserva 'cantidad' IDs cortos consecutivos para un chat en la tabla 'secuencias_chat'.
+
+    Es una única fila por chat que se incrementa de forma atómica: el UPSERT bloquea esa fila
+    hasta el final de la transacción, así dos altas simultáneas nunca reciben el mismo ID.
+
+    Returns:
+        int: El último ID reservado (los reservados son [último - cantidad + 1, último]).
+    """
+    _ejecutar(cursor, "recordar.reservar_id",
+        """INSERT INTO secuencias_chat (chat_id, ultimo_user_id) VALUES (%s, %s)
+           ON CONFLICT (chat_id) DO UPDATE SET ultimo_user_id = secuencias_chat.ultimo_user_id + EXCLUDED.ultimo_user_id
+           RETURNING ultimo_user_id""",
+        (chat_id, cantidad)
+    )
+    return cursor.fetchone()[0]
+
+def insertar_recordatorio(
+    chat_id: int, texto: str, fecha: Optional[datetime], timezone: str, recurrencia: Optional[str] = None
+) -> Tuple[int, int]:
+    """
+    Guarda un nuevo recordatorio y le asigna el siguiente ID corto del chat.
+    Si es recurrente, 'fecha' es su primera ocurrencia y 'recurrencia' la regla (ver recurrencia.py).
+
+    Returns:
+        tuple: (ID global del recordatorio, ID corto visible para el usuario).
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            nuevo_user_id = _reservar_user_ids(cursor, chat_id)
+            # Para obtener el ID insertado en PostgreSQL, usamos 'RETURNING id'.
+            _ejecutar(cursor, "recordar.insertar",
+                """INSERT INTO recordatorios (user_id, chat_id, texto, fecha_hora, aviso_previo, timezone, recurrencia)
+                   VALUES (%s, %s, %s, %s, 0, %s, %s)
+                   RETURNING id, user_id""",
+                (nuevo_user_id, chat_id, texto, fecha, timezone, recurrencia)
+            )
+            return cursor.fetchone()
+
+def insertar_recordatorios(
+    chat_id: int, recordatorios: List[Tuple[str, Optional[datetime], Optional[str]]], timezone: str
+) -> List[Tuple[int, int]]:
+    """
+    Guarda de golpe varios recordatorios (texto, fecha, recurrencia) de un chat, p. ej. una lista pegada en /recordar.
+    Una sola transacción: se reservan todos los IDs cortos (consecutivos) y se insertan con un único INSERT.
+
+    Returns:
+        list: (ID global, ID corto) de cada recordatorio, en el mismo orden en que se han dado.
+    """
+    if not recordatorios:
+        return []
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            primero = _reservar_user_ids(cursor, chat_id, len(recordatorios)) - len(recordatorios) + 1
+            valores = ", ".join(["(%s, %s, %s, %s, 0, %s, %s)"] * len(recordatorios))
+            params = tuple(
+                valor for i, (texto, fecha, recurrencia) in enumerate(recordatorios)
+                for valor in (primero + i, chat_id, texto, fecha, timezone, recurrencia)
+            )
+            _ejecutar(cursor, "recordar.insertar_lote",
+                f"""INSERT INTO recordatorios (user_id, chat_id, texto, fecha_hora, aviso_previo, timezone, recurrencia)
+                    VALUES {valores}
+                    RETURNING id, user_id""",
+                params
+            )
+            # RETURNING no garantiza el orden de las filas: se casan por su ID corto, que es único en el chat.
+            por_user_id = {user_id: rid for rid, user_id in cursor.fetchall()}
+            return [(por_user_id[primero + i], primero + i) for i in range(len(recordatorios))]
+
+def actualizar_aviso_previo(rid: int, minutos: int):
+    """
+    Guarda los minutos de antelación del aviso previo.
+    Con 0 (sin aviso, o el aviso ya se ha dado) se anula también la próxima notificación ('aviso_en').
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "aviso.actualizar",
+                "UPDATE recordatorios SET aviso_previo = %s, aviso_en = CASE WHEN %s = 0 THEN NULL ELSE aviso_en END WHERE id = %s",
+                (minutos, minutos, rid)
+            )
+
+def marcar_como_hecho(rid: int):
+    """Marca un recordatorio como 'Hecho' y limpia su aviso previo y su próxima notificación."""
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "posponer.marcar_hecho",
+                "UPDATE recordatorios SET estado = 1, aviso_previo = 0, aviso_en = NULL WHERE id = %s", (rid,)
+            )
+
+def actualizar_contenido_recordatorio(
+    rid: int, texto: str, fecha: Optional[datetime], timezone: str, recurrencia: Optional[str] = None
+):
+    """
+    Sustituye el texto, la fecha, la zona horaria y la regla de repetición de un recordatorio existente.
+    Su próxima notificación queda anulada hasta que se vuelva a programar con la nueva fecha.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "editar.actualizar",
+                "UPDATE recordatorios SET texto = %s, fecha_hora = %s, timezone = %s, recurrencia = %s, aviso_en = NULL WHERE id = %s",
+                (texto, fecha, timezone, recurrencia, rid)
+            )
+
+def actualizar_timezone_recordatorios(chat_id: int, timezone: str):
+    """Cambia la zona horaria de TODOS los recordatorios de un chat."""
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "ajustes.timezone", "UPDATE recordatorios SET timezone = %s WHERE chat_id = %s", (timezone, chat_id))
+
+def mover_a_ocurrencia(rid: int, fecha_anterior: datetime, nueva_fecha: datetime) -> bool:
+    """
+    Pasa un recordatorio recurrente de su ocurrencia 'fecha_anterior' a la siguiente ('nueva_fecha').
+    Solo si sigue pendiente y en esa ocurrencia: si alguien ya lo ha movido, editado o completado, no hace nada.
+
+    Returns:
+        bool: True si el recordatorio se ha movido.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "recurrencia.mover",
+                "UPDATE recordatorios SET fecha_hora = %s WHERE id = %s AND fecha_hora = %s AND estado = 0",
+                (nueva_fecha, rid, fecha_anterior)
+            )
+            return cursor.rowcount > 0
+
+def fijar_aviso_en(rid: int, aviso_en: Optional[datetime]):
+    """Guarda cuándo toca la próxima notificación (aviso previo o principal) de un recordatorio."""
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "avisos.fijar", "UPDATE recordatorios SET aviso_en = %s WHERE id = %s", (aviso_en, rid))
+
+def fijar_aviso_principal_bulk(rids: List[int]):
+    """Deja como próxima notificación de muchos recordatorios (sin aviso previo) su propia fecha, con UN SOLO UPDATE."""
+    if not rids:
+        return
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "avisos.fijar_lote",
+                "UPDATE recordatorios SET aviso_en = fecha_hora WHERE id IN %s AND fecha_hora IS NOT NULL", (tuple(rids),)
+            )
+
+def get_ids_con_aviso_en(rids: List[int]) -> List[int]:
+    """De entre 'rids', los recordatorios que tienen próxima notificación ('aviso_en'): los que ve el despachador."""
+    if not rids:
+        return []
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "avisos.con_aviso_en",
+                "SELECT id FROM recordatorios WHERE id IN %s AND aviso_en IS NOT NULL", (tuple(rids),)
+            )
+            return [fila[0] for fila in cursor.fetchall()]
 
+def get_avisos_en_ventana(hasta: datetime, limite: int) -> List[Tuple[int, datetime]]:
+    """
+    Devuelve (id, aviso_en) de las notificaciones pendientes que vencen antes de 'hasta' (incluidas
+    las atrasadas), ordenadas por hora. Es la consulta de recarga del despachador (índice parcial).
+    """
     with get_connection() as conn:
         with conn.cursor() as cursor:
-            query_base = "FROM recordatorios WHERE chat_id = %s"
-            params = [chat_id]
-
-            # AÑADIMOS LOS FILTROS POR ESTADO
-            if filtro == "hechos":
-                query_base += " AND estado = 1"
-                # No se añaden más parámetros
-            elif filtro == "pendientes":
-                query_base += " AND estado = 0"
-
-            # AÑADIMOS LOS FILTROS TEMPORALES 
-            if filtro == "futuro":
-                query_base += " AND (fecha_hora IS NULL OR fecha_hora > %s)"
-                params.append(now_utc) # psycopg2 maneja objetos datetime directamente
-            elif filtro == "pasado":
-                query_base += " AND fecha_hora IS NOT NULL AND fecha_hora <= %s"
-                params.append(now_utc)
-            elif filtro == "hoy":
-                user_tz_str = get_config(chat_id, "user_timezone") or "UTC"
-                user_tz = pytz.timezone(user_tz_str)
-                now_local = now_utc.astimezone(user_tz)
-                
-                start_of_day_local = now_local.replace(hour=0, minute=0, second=0, microsecond=0)
-                end_of_day_local = now_local.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-                start_of_day_utc = start_of_day_local.astimezone(pytz.utc)
-                end_of_day_utc = end_of_day_local.astimezone(pytz.utc)
-                
-                query_base += " AND estado = 0 AND fecha_hora >= %s AND fecha_hora <= %s"
-                params.extend([start_of_day_utc, end_of_day_utc])
-
-            cursor.execute(f"SELECT COUNT(id) {query_base}", tuple(params))
-            total_items = cursor.fetchone()[0]
-
-            if total_items == 0:
-                return [], 0
-
-            offset = (page - 1) * items_per_page
-            query_select = "SELECT id, user_id, chat_id, texto, fecha_hora, estado, aviso_previo, timezone"
-            query_order = "ORDER BY fecha_hora ASC"
-
-            # Si filtramos por estado, tiene más sentido ordenar por fecha de más reciente a más antiguo.
-            if filtro in ["hechos", "pendientes"]:
-                query_order = "ORDER BY fecha_hora DESC"
-            
-            cursor.execute(f"{query_select} {query_base} {query_order} LIMIT %s OFFSET %s", tuple(params + [items_per_page, offset]))
-            recordatorios_pagina = cursor.fetchall()
-
-            return recordatorios_pagina, total_items
+            _ejecutar(cursor, "avisos.ventana",
+                """SELECT id, aviso_en FROM recordatorios
+                   WHERE estado = 0 AND aviso_en IS NOT NULL AND aviso_en <= %s
+                   ORDER BY aviso_en LIMIT %s""",
+                (hasta, limite)
+            )
+            return cursor.fetchall()
+
+def reclamar_entrega(
+    rid: int, aviso_en: datetime, instancia: str, reclamada_hasta: datetime, ahora: datetime
+) -> Tuple[Optional[tuple], Optional[datetime]]:
+    """
+    Intenta reclamar en exclusiva la notificación de un recordatorio que vence en 'aviso_en'.
+
+    La reclamación es una fila de 'entregas' con plazo: se consigue si nadie la tiene, o si quien
+    la tenía no llegó a entregarla y su plazo ya venció (la instancia se cayó a mitad de envío).
+    Así, con varias instancias del bot a la vez, cada notificación se envía una sola vez.
+
+    Returns:
+        tuple: ((chat_id, user_id, texto, fecha_hora, aviso_previo, timezone, recurrencia), None) si la reclamación es nuestra.
+               (None, reclamada_hasta) si otra instancia la tiene todavía: hay que volver a mirar entonces.
+               (None, None) si ya no hay nada que enviar (entregada, o el recordatorio ha cambiado).
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "entregas.leer_recordatorio",
+                """SELECT chat_id, user_id, texto, fecha_hora, aviso_previo, timezone, recurrencia
+                   FROM recordatorios WHERE id = %s AND aviso_en = %s AND estado = 0""",
+                (rid, aviso_en)
+            )
+            datos = cursor.fetchone()
+            if not datos:
+                return None, None
+
+            _ejecutar(cursor, "entregas.reclamar",
+                """INSERT INTO entregas (recordatorio_id, aviso_en, instancia, reclamada_hasta) VALUES (%s, %s, %s, %s)
+                   ON CONFLICT (recordatorio_id, aviso_en) DO UPDATE
+                   SET instancia = EXCLUDED.instancia, reclamada_hasta = EXCLUDED.reclamada_hasta
+                   WHERE entregas.enviado_en IS NULL AND entregas.reclamada_hasta < %s
+                   RETURNING instancia""",
+                (rid, aviso_en, instancia, reclamada_hasta, ahora)
+            )
+            if cursor.fetchone():
+                return datos, None
+
+            _ejecutar(cursor, "entregas.consultar",
+                "SELECT reclamada_hasta, enviado_en FROM entregas WHERE recordatorio_id = %s AND aviso_en = %s",
+                (rid, aviso_en)
+            )
+            ocupada_hasta, enviado_en = cursor.fetchone()
+            return None, (None if enviado_en else ocupada_hasta)
+
+def completar_entrega(
+    rid: int, aviso_en: datetime, ahora: datetime,
+    siguiente_fecha: Optional[datetime] = None, siguiente_aviso_en: Optional[datetime] = None
+) -> Optional[datetime]:
+    """
+    Da por entregada una notificación reclamada y avanza el recordatorio a la siguiente, en una
+    sola transacción: tras el aviso previo toca el principal (a 'fecha_hora') y tras el principal, ninguna.
+    Si es recurrente, tras el principal pasa a su siguiente ocurrencia: 'fecha_hora' = 'siguiente_fecha'
+    y la próxima notificación es 'siguiente_aviso_en' (su aviso previo, o ella misma).
+
+    Returns:
+        datetime: Cuándo vence la siguiente notificación del recordatorio, o None si no queda ninguna.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "entregas.completar",
+                "UPDATE entregas SET enviado_en = %s WHERE recordatorio_id = %s AND aviso_en = %s",
+                (ahora, rid, aviso_en)
+            )
+            # Todas las expresiones del SET ven el 'aviso_en' ANTERIOR a la actualización.
+            # Solo avanza si la notificación sigue siendo esa (nadie ha reprogramado el recordatorio entretanto).
+            _ejecutar(cursor, "avisos.avanzar",
+                """UPDATE recordatorios
+                   SET aviso_en = CASE WHEN aviso_en < fecha_hora THEN fecha_hora ELSE %s END,
+                       fecha_hora = CASE WHEN aviso_en < fecha_hora THEN fecha_hora ELSE COALESCE(%s, fecha_hora) END,
+                       aviso_previo = CASE WHEN aviso_en < fecha_hora OR %s IS NOT NULL THEN aviso_previo ELSE 0 END
+                   WHERE id = %s AND aviso_en = %s AND estado = 0
+                   RETURNING aviso_en""",
+                (siguiente_aviso_en, siguiente_fecha, siguiente_fecha, rid, aviso_en)
+            )
+            fila = cursor.fetchone()
+            return fila[0] if fila else None
+
+def purgar_entregas(antes: datetime) -> int:
+    """Borra el registro de las entregas de notificaciones que vencieron antes de 'antes'."""
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "entregas.purgar", "DELETE FROM entregas WHERE aviso_en < %s", (antes,))
+            return cursor.rowcount
+
+def reclamar_resumen(
+    tramo: str, dia: str, instancia: str, reclamada_hasta: datetime, ahora: datetime
+) -> Tuple[bool, Optional[datetime]]:
+    """
+    Intenta reclamar en exclusiva el envío del resumen diario de un tramo para el día local 'dia'.
+    Funciona igual que `reclamar_entrega`: si otra instancia lo tiene y su plazo no ha vencido, es suyo.
+
+    Returns:
+        tuple: (True, None) si la reclamación es nuestra.
+               (False, reclamada_hasta) si otra instancia lo tiene todavía: hay que volver a mirar entonces.
+               (False, None) si ese día ya se envió.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "resumen.reclamar",
+                """INSERT INTO resumenes_tramo (tramo, dia, instancia, reclamada_hasta) VALUES (%s, %s, %s, %s)
+                   ON CONFLICT (tramo, dia) DO UPDATE
+                   SET instancia = EXCLUDED.instancia, reclamada_hasta = EXCLUDED.reclamada_hasta
+                   WHERE resumenes_tramo.enviado_en IS NULL AND resumenes_tramo.reclamada_hasta < %s
+                   RETURNING instancia""",
+                (tramo, dia, instancia, reclamada_hasta, ahora)
+            )
+            if cursor.fetchone():
+                return True, None
+
+            _ejecutar(cursor, "resumen.consultar_reclamacion",
+                "SELECT reclamada_hasta, enviado_en FROM resumenes_tramo WHERE tramo = %s AND dia = %s",
+                (tramo, dia)
+            )
+            ocupada_hasta, enviado_en = cursor.fetchone()
+            return False, (None if enviado_en else ocupada_hasta)
+
+def completar_resumen(tramo: str, dia: str, ahora: datetime):
+    """Da por enviado el resumen diario de un tramo para el día local 'dia'."""
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "resumen.completar",
+                "UPDATE resumenes_tramo SET enviado_en = %s WHERE tramo = %s AND dia = %s", (ahora, tramo, dia)
+            )
+
+def purgar_resumenes(antes: str) -> int:
+    """Borra el registro de los resúmenes de los días locales anteriores a 'antes' ('AAAA-MM-DD')."""
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "resumen.purgar", "DELETE FROM resumenes_tramo WHERE dia < %s", (antes,))
+            return cursor.rowcount
+
+def avanzar_a_aviso_principal(rid: int):
+    """Tras enviar el aviso previo (modo 'jobs'), la próxima notificación pasa a ser la principal."""
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "avisos.avanzar_principal",
+                "UPDATE recordatorios SET aviso_en = fecha_hora WHERE id = %s AND estado = 0 AND aviso_en < fecha_hora",
+                (rid,)
+            )
+
+def registrar_latido(ahora: datetime):
+    """Anota que el bot sigue vivo en este instante (tabla 'estado_bot')."""
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "latido.registrar",
+                """INSERT INTO estado_bot (clave, instante) VALUES ('latido', %s)
+                   ON CONFLICT (clave) DO UPDATE SET instante = EXCLUDED.instante""",
+                (ahora,)
+            )
+
+def get_ultimo_latido() -> Optional[datetime]:
+    """Devuelve el último instante en que algún proceso del bot estaba vivo (None si nunca ha arrancado)."""
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "latido.leer", "SELECT instante FROM estado_bot WHERE clave = 'latido'")
+            fila = cursor.fetchone()
+            return fila[0] if fila else None
+
+def get_avisos_perdidos(desde: datetime, hasta: datetime) -> List[tuple]:
+    """
+    Busca los recordatorios pendientes con alguna notificación sin enviar que vencía entre 'desde' y 'hasta'.
+
+    'aviso_en' apunta siempre a la próxima notificación sin entregar (previa o principal) y se anula
+    al entregar la principal; la condición sobre 'fecha_hora' cubre además las filas cuyo 'aviso_en'
+    se quedó en un aviso previo ya enviado. Ambas ramas son rangos sobre índices parciales.
+
+    Returns:
+        list: Filas con las COLUMNAS_RECORDATORIO más 'aviso_en', agrupadas por chat y en orden cronológico.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "recuperacion.buscar",
+                f"""SELECT {COLUMNAS_RECORDATORIO}, aviso_en FROM recordatorios
+                    WHERE estado = 0 AND aviso_en IS NOT NULL
+                      AND ((aviso_en > %s AND aviso_en <= %s) OR (fecha_hora > %s AND fecha_hora <= %s))
+                    ORDER BY chat_id, fecha_hora, id""",
+                (desde, hasta, desde, hasta)
+            )
+            return cursor.fetchall()
+
+def reclamar_avisos_perdidos(
+    perdidos: List[Tuple[int, datetime]], instancia: str, reclamada_hasta: datetime, ahora: datetime
+) -> List[int]:
+    """
+    Reclama en 'entregas', con UNA SOLA SENTENCIA, las notificaciones (rid, aviso_en) perdidas.
+    Si otra instancia está recuperando a la vez, cada notificación se la queda solo una.
+
+    Returns:
+        list: IDs globales de los recordatorios cuya notificación es nuestra.
+    """
+    if not perdidos:
+        return []
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            filas = ", ".join(["(%s, %s, %s, %s)"] * len(perdidos))
+            params = [dato for rid, aviso_en in perdidos for dato in (rid, aviso_en, instancia, reclamada_hasta)]
+            _ejecutar(cursor, "recuperacion.reclamar",
+                f"""INSERT INTO entregas (recordatorio_id, aviso_en, instancia, reclamada_hasta) VALUES {filas}
+                    ON CONFLICT (recordatorio_id, aviso_en) DO UPDATE
+                    SET instancia = EXCLUDED.instancia, reclamada_hasta = EXCLUDED.reclamada_hasta
+                    WHERE entregas.enviado_en IS NULL AND entregas.reclamada_hasta < %s
+                    RETURNING recordatorio_id""",
+                params + [ahora]
+            )
+            return [fila[0] for fila in cursor.fetchall()]
+
+def completar_avisos_perdidos(rids: List[int], instancia: str, hasta: datetime, ahora: datetime):
+    """
+    Da por entregadas las notificaciones recuperadas y avanza sus recordatorios: si la hora principal
+    ya pasó, quedan sin más avisos; si solo se perdió el aviso previo, la próxima es la principal.
+    """
+    if not rids:
+        return
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "recuperacion.completar",
+                "UPDATE entregas SET enviado_en = %s WHERE recordatorio_id IN %s AND instancia = %s AND enviado_en IS NULL",
+                (ahora, tuple(rids), instancia)
+            )
+            _ejecutar(cursor, "recuperacion.avanzar",
+                """UPDATE recordatorios
+                   SET aviso_en = CASE WHEN fecha_hora > %s THEN fecha_hora END,
+                       aviso_previo = CASE WHEN fecha_hora > %s THEN aviso_previo ELSE 0 END
+                   WHERE id IN %s AND estado = 0 AND aviso_en <= %s""",
+                (hasta, hasta, tuple(rids), hasta)
+            )
+
+def cambiar_estado_recordatorios(chat_id: int, user_ids: List[int]) -> List[tuple]:
+    """
+    Alterna el estado (pendiente <-> hecho) de varios recordatorios de un chat con UNA SOLA SENTENCIA.
+
+    Returns:
+        list: Filas (id, user_id, estado_anterior, texto, fecha_hora, aviso_previo) de los recordatorios cambiados.
+    """
+    if not user_ids:
+        return []
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            # RETURNING ve el estado ya cambiado: el anterior es, de nuevo, 1 - estado.
+            # Las notificaciones se anulan: el handler reprograma las de los que vuelven a estar pendientes.
+            _ejecutar(cursor, "cambiar.alternar_estado",
+                """UPDATE recordatorios SET estado = 1 - estado, aviso_en = NULL
+                   WHERE user_id IN %s AND chat_id = %s
+                   RETURNING id, user_id, 1 - estado, texto, fecha_hora, aviso_previo""",
+                (tuple(user_ids), chat_id)
+            )
+            return cursor.fetchall()
+
+def borrar_recordatorios_por_user_ids(chat_id: int, user_ids: List[int]) -> List[tuple]:
+    """
+    Borra varios recordatorios de un chat a partir de sus IDs cortos, con UNA SOLA SENTENCIA.
+
+    Returns:
+        list: Filas (id, user_id, texto) de los recordatorios borrados. El ID GLOBAL sirve para cancelar sus avisos.
+    """
+    if not user_ids:
+        return []
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "borrar.por_user_ids",
+                "DELETE FROM recordatorios WHERE user_id IN %s AND chat_id = %s RETURNING id, user_id, texto",
+                (tuple(user_ids), chat_id)
+            )
+            return cursor.fetchall()
 
 def get_todos_los_chat_ids() -> List[int]:
     with get_connection() as conn:
         with conn.cursor() as cursor:
-            cursor.execute("SELECT DISTINCT chat_id FROM recordatorios UNION SELECT DISTINCT chat_id FROM configuracion")
+            _ejecutar(cursor, "chats.todos", "SELECT DISTINCT chat_id FROM recordatorios UNION SELECT DISTINCT chat_id FROM configuracion")
             return [item[0] for item in cursor.fetchall()]
 
-def borrar_recordatorios_por_filtro(chat_id: int, filtro: str) -> tuple[int, List[int]]:
+def borrar_recordatorios_por_filtro(chat_id: int, filtro: str) -> List[tuple]:
     """
     Función universal para eliminar recordatorios de un usuario basándose en un filtro.
+    El borrado y la obtención de lo borrado van en UNA SOLA SENTENCIA (DELETE ... RETURNING).
 
     Args:
         chat_id (int): El ID del chat del usuario.
         filtro (str): El criterio para borrar. Puede ser "pasados" o "hechos".
 
     Returns:
-        tuple: (Número de recordatorios borrados, Lista de IDs de los recordatorios borrados).
+        list: Filas (id, user_id, texto) de los recordatorios borrados.
     """
+    # Construimos la consulta SQL dinámicamente según el filtro
+    if filtro == "pasados":
+        sql_where = "WHERE chat_id = %s AND fecha_hora IS NOT NULL AND fecha_hora <= %s"
+        params = (chat_id, datetime.now(pytz.utc))
+    elif filtro == "hechos":
+        sql_where = "WHERE chat_id = %s AND estado = 1"
+        params = (chat_id,)
+    else:
+        # Si se pasa un filtro no válido, no hacemos nada.
+        return []
+
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "lista.borrar_por_filtro", f"DELETE FROM recordatorios {sql_where} RETURNING id, user_id, texto", params)
+            return cursor.fetchall()
+
+def resetear_base_de_datos():
     with get_connection() as conn:
         with conn.cursor() as cursor:
-            # Construimos la consulta SQL dinámicamente según el filtro
-            if filtro == "pasados":
-                sql_where = "WHERE chat_id = %s AND fecha_hora IS NOT NULL AND fecha_hora <= %s"
-                params = (chat_id, datetime.now(pytz.utc))
-            elif filtro == "hechos":
-                sql_where = "WHERE chat_id = %s AND estado = 1"
-                params = (chat_id,)
+            # TRUNCATE es más rápido que DELETE para vaciar tablas grandes en PostgreSQL.
+            # Los contadores de IDs cortos se vacían también, para que cada chat vuelva a empezar por el #1.
+            if DIALECTO == "sqlite":
+                _ejecutar(cursor, "reset.vaciar", "DELETE FROM recordatorios")
+                _ejecutar(cursor, "reset.vaciar_secuencias", "DELETE FROM secuencias_chat")
+                _ejecutar(cursor, "reset.vaciar_entregas", "DELETE FROM entregas")
+                _ejecutar(cursor, "reset.vaciar_resumenes", "DELETE FROM resumenes_tramo")
             else:
-                # Si se pasa un filtro no válido, no hacemos nada.
-                return 0, []
+                _ejecutar(cursor, "reset.vaciar", "TRUNCATE TABLE recordatorios, secuencias_chat, entregas, resumenes_tramo")
+    print("🧹 La tabla de recordatorios ha sido vaciada por completo.")
 
-            # 1. Obtenemos los IDs de los recordatorios que vamos a borrar.
-            cursor.execute(f"SELECT id {sql_where}", params)
-            ids_a_borrar = [item[0] for item in cursor.fetchall()]
 
-            if not ids_a_borrar:
-                return 0, []
+# =============================================================================
+# FUNCIONES DEL RESUMEN DIARIO
+# =============================================================================
 
-            # 2. Los borramos usando sus IDs.
-            cursor.execute("DELETE FROM recordatorios WHERE id IN %s", (tuple(ids_a_borrar),))
-            num_borrados = cursor.rowcount
+# Chats suscritos al resumen diario con su hora y su zona horaria, con los mismos valores por defecto que /ajustes.
+_FROM_SUSCRIPCIONES_RESUMEN = """
+    FROM configuracion AS a
+    LEFT JOIN configuracion AS h ON h.chat_id = a.chat_id AND h.clave = 'resumen_diario_hora'
+    LEFT JOIN configuracion AS t ON t.chat_id = a.chat_id AND t.clave = 'user_timezone'
+"""
+_WHERE_SUSCRIPCIONES_RESUMEN = "WHERE a.clave = 'resumen_diario_activado' AND a.valor = '1'"
 
-    return num_borrados, ids_a_borrar
+def get_tramos_resumen() -> List[Tuple[str, str]]:
+    """Devuelve los tramos (zona horaria, 'HH:MM') distintos en los que hay algún chat suscrito al resumen diario."""
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            _ejecutar(cursor, "resumen.tramos",
+                f"SELECT DISTINCT COALESCE(t.valor, 'UTC'), COALESCE(h.valor, '08:00') "
+                f"{_FROM_SUSCRIPCIONES_RESUMEN} {_WHERE_SUSCRIPCIONES_RESUMEN}"
+            )
+            return cursor.fetchall()
 
-def resetear_base_de_datos():
+def get_recordatorios_resumen(tz: str, hora: str, desde: datetime, hasta: datetime) -> List[tuple]:
+    """
+    Obtiene, en UNA SOLA CONSULTA, los recordatorios pendientes entre 'desde' y 'hasta' de TODOS
+    los chats suscritos al resumen diario en el tramo (tz, hora).
+
+    Returns:
+        list: Filas con las COLUMNAS_RECORDATORIO, agrupadas por chat y en orden cronológico.
+    """
+    columnas = ", ".join(f"r.{columna}" for columna in COLUMNAS_RECORDATORIO.split(", "))
     with get_connection() as conn:
         with conn.cursor() as cursor:
-            # TRUNCATE es más rápido que DELETE para vaciar tablas grandes en PostgreSQL
-            cursor.execute("TRUNCATE TABLE recordatorios")
-    print("🧹 La tabla de recordatorios ha sido vaciada por completo.")
\ No newline at end of file
+            _ejecutar(cursor, "resumen.recordatorios",
+                f"""SELECT {columnas} {_FROM_SUSCRIPCIONES_RESUMEN}
+                    JOIN recordatorios AS r ON r.chat_id = a.chat_id
+                    {_WHERE_SUSCRIPCIONES_RESUMEN}
+                      AND COALESCE(t.valor, 'UTC') = %s AND COALESCE(h.valor, '08:00') = %s
+                      AND r.estado = 0 AND r.fecha_hora >= %s AND r.fecha_hora <= %s
+                    ORDER BY r.chat_id, r.fecha_hora, r.id""",
+                (tz, hora, desde, hasta)
+            )
+            return cursor.fetchall()
@@ -0,0 +1,191 @@
+# db_async.py
+"""
+Capa de Datos Asíncrona.
+
+Los handlers y los jobs del scheduler son corrutinas que se ejecutan en un único
+event loop. Si llamasen directamente a las funciones síncronas de `db.py`, cada
+viaje de ida y vuelta a Supabase bloquearía el bot entero para TODOS los chats.
+
+Este módulo expone la misma interfaz que `db.py`, pero cada llamada se delega a
+un pool de hilos acotado (`run_in_executor`). Así el event loop queda libre
+mientras se espera a la base de datos.
+
+El nº de hilos coincide con el tamaño máximo del pool de conexiones: nunca hay
+más consultas en vuelo que conexiones disponibles.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Tuple, List, Optional
+
+import db
+from config import DB_POOL_MAX
+
+_executor = ThreadPoolExecutor(max_workers=DB_POOL_MAX, thread_name_prefix="db")
+
+
+async def _en_hilo(func, *args, **kwargs):
+    """Ejecuta una función síncrona de la capa de datos en el pool de hilos y espera su resultado."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+
+async def en_hilo_de_datos(func, *args, **kwargs):
+    """
+    Lo mismo para código de fuera de la capa de datos que también escribe en la DB de forma bloqueante
+    (p. ej., add_job/remove_job con el jobstore de SQLAlchemy), para que no frene el event loop.
+    """
+    return await _en_hilo(func, *args, **kwargs)
+
+
+# =============================================================================
+# FUNCIONES DE CONFIGURACIÓN (CLAVE-VALOR)
+# =============================================================================
+
+async def get_config(chat_id: int, key: str) -> Optional[str]:
+    # Si la configuración del chat ya está en la caché, no hace falta ni salir del event loop.
+    valores = db.leer_cache_config(chat_id)
+    if valores is not None:
+        return valores.get(key)
+    return await _en_hilo(db.get_config, chat_id, key)
+
+async def get_all_config(chat_id: int) -> dict[str, Optional[str]]:
+    valores = db.leer_cache_config(chat_id)
+    if valores is not None:
+        return dict(valores)
+    return await _en_hilo(db.get_all_config, chat_id)
+
+async def set_config(chat_id: int, key: str, value: str):
+    return await _en_hilo(db.set_config, chat_id, key, value)
+
+async def set_config_many(chat_id: int, valores: dict[str, str]):
+    return await _en_hilo(db.set_config_many, chat_id, valores)
+
+
+# =============================================================================
+# FUNCIONES DE GESTIÓN DE RECORDATORIOS
+# =============================================================================
+
+async def get_recordatorios(
+    chat_id: int, filtro: str = "futuro", page: int = 1, items_per_page: int = 7,
+    cursor: Optional[db.CursorLista] = None
+) -> Tuple[List, int]:
+    return await _en_hilo(db.get_recordatorios, chat_id, filtro=filtro, page=page, items_per_page=items_per_page, cursor=cursor)
+
+async def get_recordatorio_por_id(rid: int) -> Optional[tuple]:
+    return await _en_hilo(db.get_recordatorio_por_id, rid)
+
+async def get_recordatorio_por_user_id(chat_id: int, user_id: int) -> Optional[tuple]:
+    return await _en_hilo(db.get_recordatorio_por_user_id, chat_id, user_id)
+
+async def get_recordatorios_para_disparo(rids: List[int]) -> List[tuple]:
+    return await _en_hilo(db.get_recordatorios_para_disparo, rids)
+
+async def get_recordatorios_por_user_ids(chat_id: int, user_ids: List[int]) -> List[tuple]:
+    return await _en_hilo(db.get_recordatorios_por_user_ids, chat_id, user_ids)
+
+async def insertar_recordatorio(
+    chat_id: int, texto: str, fecha: Optional[datetime], timezone: str, recurrencia: Optional[str] = None
+) -> Tuple[int, int]:
+    return await _en_hilo(db.insertar_recordatorio, chat_id, texto, fecha, timezone, recurrencia)
+
+async def insertar_recordatorios(
+    chat_id: int, recordatorios: List[Tuple[str, Optional[datetime], Optional[str]]], timezone: str
+) -> List[Tuple[int, int]]:
+    return await _en_hilo(db.insertar_recordatorios, chat_id, recordatorios, timezone)
+
+async def actualizar_aviso_previo(rid: int, minutos: int):
+    return await _en_hilo(db.actualizar_aviso_previo, rid, minutos)
+
+async def marcar_como_hecho(rid: int):
+    return await _en_hilo(db.marcar_como_hecho, rid)
+
+async def actualizar_contenido_recordatorio(
+    rid: int, texto: str, fecha: Optional[datetime], timezone: str, recurrencia: Optional[str] = None
+):
+    return await _en_hilo(db.actualizar_contenido_recordatorio, rid, texto, fecha, timezone, recurrencia)
+
+async def actualizar_timezone_recordatorios(chat_id: int, timezone: str):
+    return await _en_hilo(db.actualizar_timezone_recordatorios, chat_id, timezone)
+
+async def mover_a_ocurrencia(rid: int, fecha_anterior: datetime, nueva_fecha: datetime) -> bool:
+    return await _en_hilo(db.mover_a_ocurrencia, rid, fecha_anterior, nueva_fecha)
+
+async def fijar_aviso_en(rid: int, aviso_en: Optional[datetime]):
+    return await _en_hilo(db.fijar_aviso_en, rid, aviso_en)
+
+async def fijar_aviso_principal_bulk(rids: List[int]):
+    return await _en_hilo(db.fijar_aviso_principal_bulk, rids)
+
+async def get_ids_con_aviso_en(rids: List[int]) -> List[int]:
+    return await _en_hilo(db.get_ids_con_aviso_en, rids)
+
+async def get_avisos_en_ventana(hasta: datetime, limite: int) -> List[Tuple[int, datetime]]:
+    return await _en_hilo(db.get_avisos_en_ventana, hasta, limite)
+
+async def reclamar_entrega(
+    rid: int, aviso_en: datetime, instancia: str, reclamada_hasta: datetime, ahora: datetime
+) -> Tuple[Optional[tuple], Optional[datetime]]:
+    return await _en_hilo(db.reclamar_entrega, rid, aviso_en, instancia, reclamada_hasta, ahora)
+
+async def completar_entrega(
+    rid: int, aviso_en: datetime, ahora: datetime,
+    siguiente_fecha: Optional[datetime] = None, siguiente_aviso_en: Optional[datetime] = None
+) -> Optional[datetime]:
+    return await _en_hilo(db.completar_entrega, rid, aviso_en, ahora, siguiente_fecha, siguiente_aviso_en)
+
+async def purgar_entregas(antes: datetime) -> int:
+    return await _en_hilo(db.purgar_entregas, antes)
+
+async def reclamar_resumen(
+    tramo: str, dia: str, instancia: str, reclamada_hasta: datetime, ahora: datetime
+) -> Tuple[bool, Optional[datetime]]:
+    return await _en_hilo(db.reclamar_resumen, tramo, dia, instancia, reclamada_hasta, ahora)
+
+async def completar_resumen(tramo: str, dia: str, ahora: datetime):
+    return await _en_hilo(db.completar_resumen, tramo, dia, ahora)
+
+async def purgar_resumenes(antes: str) -> int:
+    return await _en_hilo(db.purgar_resumenes, antes)
+
+async def avanzar_a_aviso_principal(rid: int):
+    return await _en_hilo(db.avanzar_a_aviso_principal, rid)
+
+async def registrar_latido(ahora: datetime):
+    return await _en_hilo(db.registrar_latido, ahora)
+
+async def get_ultimo_latido() -> Optional[datetime]:
+    return await _en_hilo(db.get_ultimo_latido)
+
+async def get_avisos_perdidos(desde: datetime, hasta: datetime) -> List[tuple]:
+    return await _en_hilo(db.get_avisos_perdidos, desde, hasta)
+
+async def reclamar_avisos_perdidos(
+    perdidos: List[Tuple[int, datetime]], instancia: str, reclamada_hasta: datetime, ahora: datetime
+) -> List[int]:
+    return await _en_hilo(db.reclamar_avisos_perdidos, perdidos, instancia, reclamada_hasta, ahora)
+
+async def completar_avisos_perdidos(rids: List[int], instancia: str, hasta: datetime, ahora: datetime):
+    return await _en_hilo(db.completar_avisos_perdidos, rids, instancia, hasta, ahora)
+
+async def cambiar_estado_recordatorios(chat_id: int, user_ids: List[int]) -> List[tuple]:
+    return await _en_hilo(db.cambiar_estado_recordatorios, chat_id, user_ids)
+
+async def borrar_recordatorios_por_user_ids(chat_id: int, user_ids: List[int]) -> List[tuple]:
+    return await _en_hilo(db.borrar_recordatorios_por_user_ids, chat_id, user_ids)
+
+async def borrar_recordatorios_por_filtro(chat_id: int, filtro: str) -> List[tuple]:
+    return await _en_hilo(db.borrar_recordatorios_por_filtro, chat_id, filtro)
+
+async def get_todos_los_chat_ids() -> List[int]:
+    return await _en_hilo(db.get_todos_los_chat_ids)
+
+async def get_tramos_resumen() -> List[Tuple[str, str]]:
+    return await _en_hilo(db.get_tramos_resumen)
+
+async def get_recordatorios_resumen(tz: str, hora: str, desde: datetime, hasta: datetime) -> List[tuple]:
+    return await _en_hilo(db.get_recordatorios_resumen, tz, hora, desde, hasta)
+
+async def resetear_base_de_datos():
+    return await _en_hilo(db.resetear_base_de_datos)
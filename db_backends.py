@@ -0,0 +1,306 @@
+# db_backends.py
+"""
+Motores de Almacenamiento de la Capa de Datos.
+
+`db.py` no abre conexiones por su cuenta: se las pide al motor configurado con
+DB_BACKEND. Todos los motores ofrecen la misma interfaz:
+
+- `conexion()`: context manager que presta una conexión con commit al salir
+  (o rollback si hubo una excepción). Sus cursores se usan con `with`.
+- `cerrar()`: libera todas las conexiones al apagar el bot.
+- `url_jobstore()`: URL de SQLAlchemy donde APScheduler guarda sus jobs
+  (None = jobstore en memoria).
+- `dialecto`: 'postgres' o 'sqlite', para las pocas sentencias que difieren.
+
+Motores disponibles:
+- 'postgres': Supabase/PostgreSQL a través de un pool de conexiones (producción).
+- 'sqlite': un fichero local (o ':memory:') para desarrollo, CI y benchmarks sin red.
+  Las consultas se escriben en el dialecto de psycopg2 (%s, IN %s) y se traducen al vuelo.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Optional
+
+import psycopg2
+import pytz
+from psycopg2.pool import ThreadedConnectionPool
+
+# Importaciones módulos locales
+from config import (
+    DB_BACKEND, SUPABASE_DB_URL, SQLITE_DB_PATH,
+    DB_POOL_MIN, DB_POOL_MAX, DB_POOL_MAX_LIFETIME, DB_POOL_HEALTHCHECK_IDLE
+)
+
+
+# =============================================================================
+# MOTOR POSTGRESQL (SUPABASE)
+# =============================================================================
+
+class BackendPostgres:
+    """Pool de conexiones a PostgreSQL con comprobación de salud y reciclado de conexiones viejas."""
+
+    dialecto = "postgres"
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        # El pool se crea de forma perezosa en la primera petición, para que importar
+        # este módulo no abra conexiones (ni falle si la base de datos no está disponible).
+        self._pool: Optional[ThreadedConnectionPool] = None
+        self._pool_lock = threading.Lock()
+        # Metadatos de cada conexión viva: id(conn) -> [creada_en, ultimo_uso]
+        self._conexiones_info: dict[int, list[float]] = {}
+
+    def _get_pool(self) -> ThreadedConnectionPool:
+        """Devuelve el pool, creándolo la primera vez que se necesita."""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, self.dsn)
+        return self._pool
+
+    def _conexion_sana(self, conn, ahora: float) -> bool:
+        """
+        Decide si una conexión recién sacada del pool se puede usar.
+        Descarta las cerradas o demasiado viejas, y hace un 'SELECT 1' a las que llevan un rato inactivas.
+        """
+        if conn.closed:
+            return False
+        creada_en, ultimo_uso = self._conexiones_info.setdefault(id(conn), [ahora, ahora])
+        if ahora - creada_en > DB_POOL_MAX_LIFETIME:
+            return False
+        if ahora - ultimo_uso > DB_POOL_HEALTHCHECK_IDLE:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        return True
+
+    def _descartar(self, pool: ThreadedConnectionPool, conn):
+        """Cierra una conexión y la saca del pool para que se abra una nueva en su lugar."""
+        self._conexiones_info.pop(id(conn), None)
+        try:
+            pool.putconn(conn, close=True)
+        except psycopg2.Error:
+            pass
+
+    @contextmanager
+    def conexion(self):
+        pool = self._get_pool()
+        # Como mucho descartamos una vez cada hueco del pool antes de rendirnos.
+        for _ in range(DB_POOL_MAX + 1):
+            conn = pool.getconn()
+            if self._conexion_sana(conn, time.monotonic()):
+                break
+            self._descartar(pool, conn)
+        else:
+            raise psycopg2.OperationalError("No se ha podido obtener una conexión sana del pool.")
+
+        conexion_rota = False
+        try:
+            with conn:  # Commit al terminar o rollback si hay excepción (no cierra la conexión).
+                yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            # La conexión ha muerto a mitad de uso: no la devolvemos al pool.
+            conexion_rota = True
+            raise
+        finally:
+            if conexion_rota or conn.closed:
+                self._descartar(pool, conn)
+            else:
+                self._conexiones_info[id(conn)][1] = time.monotonic()
+                pool.putconn(conn)
+
+    def cerrar(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                self._conexiones_info.clear()
+
+    def url_jobstore(self) -> Optional[str]:
+        return self.dsn
+
+
+# =============================================================================
+# MOTOR SQLITE (LOCAL)
+# =============================================================================
+
+# Las fechas se guardan como texto en UTC con un formato de ancho fijo: así la
+# comparación de cadenas de SQLite coincide con el orden cronológico (rangos y keyset).
+_FORMATO_FECHA_SQLITE = "%Y-%m-%d %H:%M:%S.%f+00:00"
+
+def _adaptar_fecha(valor: datetime) -> str:
+    if valor.tzinfo is not None:
+        valor = valor.astimezone(pytz.utc)
+    return valor.strftime(_FORMATO_FECHA_SQLITE)
+
+def _convertir_fecha(valor: bytes) -> datetime:
+    fecha = datetime.fromisoformat(valor.decode())
+    if fecha.tzinfo is None:
+        return pytz.utc.localize(fecha)
+    return fecha.astimezone(pytz.utc)
+
+sqlite3.register_adapter(datetime, _adaptar_fecha)
+# Las columnas declaradas como TIMESTAMPTZ vuelven como datetime con zona UTC, igual que con psycopg2.
+sqlite3.register_converter("TIMESTAMPTZ", _convertir_fecha)
+
+# Ajustes de rendimiento de cada conexión (WAL: los lectores no bloquean al escritor).
+_PRAGMAS_SQLITE = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",   # 256 MB leídos directamente de la memoria mapeada
+    "PRAGMA cache_size = -65536",     # 64 MB de caché de páginas por conexión
+    "PRAGMA busy_timeout = 5000",     # Esperar al escritor de turno en vez de fallar con 'database is locked'
+]
+
+_MARCADOR = re.compile(r"%[s%]")
+
+
+def _traducir_consulta(sql: str, params) -> tuple[str, list]:
+    """
+    Pasa una consulta del estilo de psycopg2 al de sqlite3: '%s' -> '?', '%%' -> '%'
+    y las tuplas/listas (para 'IN %s') se expanden a '(?, ?, ...)'.
+    """
+    if params is None:
+        return sql, []  # Igual que psycopg2: sin parámetros, los '%' no se interpretan.
+    valores = list(params or ())
+    planos: list = []
+    indice = 0
+
+    def sustituir(marcador: re.Match) -> str:
+        nonlocal indice
+        if marcador.group() == "%%":
+            return "%"
+        valor = valores[indice]
+        indice += 1
+        if isinstance(valor, (tuple, list)):
+            planos.extend(valor)
+            return "(" + ", ".join("?" * len(valor)) + ")"
+        planos.append(valor)
+        return "?"
+
+    return _MARCADOR.sub(sustituir, sql), planos
+
+
+class _CursorSQLite:
+    """Cursor de sqlite3 con la interfaz que usa db.py: context manager y placeholders de psycopg2."""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def execute(self, sql: str, params=None):
+        self._cursor.execute(*_traducir_consulta(sql, params))
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+
+class _ConexionSQLite:
+    """Envoltorio mínimo de una conexión sqlite3 para que db.py y migraciones.py la usen como una de psycopg2."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def cursor(self) -> _CursorSQLite:
+        return _CursorSQLite(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+
+class BackendSQLite:
+    """
+    Base de datos SQLite local.
+
+    Con un fichero, cada hilo del pool de db_async tiene su propia conexión (modo WAL:
+    lecturas en paralelo, escrituras de una en una). Con ':memory:' hay una única
+    conexión compartida y protegida por un lock, porque cada conexión a ':memory:'
+    sería una base de datos distinta.
+    """
+
+    dialecto = "sqlite"
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self.en_memoria = ruta == ":memory:"
+        self._local = threading.local()
+        self._conexiones: list[sqlite3.Connection] = []
+        self._lock = threading.RLock()
+
+    def _abrir(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.ruta, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        for pragma in _PRAGMAS_SQLITE:
+            conn.execute(pragma)
+        with self._lock:
+            self._conexiones.append(conn)
+        return conn
+
+    def _conexion_del_hilo(self) -> sqlite3.Connection:
+        if self.en_memoria:
+            with self._lock:
+                if not self._conexiones:
+                    self._abrir()
+                return self._conexiones[0]
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._abrir()
+        return conn
+
+    @contextmanager
+    def conexion(self):
+        conn = self._conexion_del_hilo()
+        # En memoria se serializa todo el bloque; en fichero el propio SQLite coordina a los escritores.
+        with (self._lock if self.en_memoria else nullcontext()):
+            try:
+                yield _ConexionSQLite(conn)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def cerrar(self):
+        with self._lock:
+            for conn in self._conexiones:
+                conn.close()
+            self._conexiones.clear()
+            self._local = threading.local()
+
+    def url_jobstore(self) -> Optional[str]:
+        # Los jobs de APScheduler viven en el mismo fichero que los datos (ya no hace falta jobs.sqlite aparte).
+        return None if self.en_memoria else f"sqlite:///{self.ruta}"
+
+
+# =============================================================================
+# SELECCIÓN DEL MOTOR
+# =============================================================================
+
+def crear_backend():
+    """Crea el motor de almacenamiento indicado por DB_BACKEND (no abre ninguna conexión todavía)."""
+    if DB_BACKEND == "sqlite":
+        return BackendSQLite(SQLITE_DB_PATH)
+    return BackendPostgres(SUPABASE_DB_URL)
@@ -0,0 +1,151 @@
+# despachador.py
+"""
+Despachador de Avisos basado en la Base de Datos (AVISOS_MODO=dispatcher).
+
+En lugar de un job serializado de APScheduler por aviso, la tabla 'recordatorios'
+es la única fuente de verdad: la columna 'aviso_en' dice cuándo toca la próxima
+notificación de cada recordatorio (el aviso previo o el principal).
+
+El despachador mantiene en memoria un montículo (min-heap) con las notificaciones
+de los próximos AVISOS_VENTANA_MIN minutos, que rellena periódicamente con una
+consulta por rango sobre un índice parcial. Crear, editar, posponer o borrar un
+recordatorio es solo una actualización de su fila más, como mucho, un "toque"
+(`notificar`) para que el despachador se entere antes de la siguiente recarga.
+
+Las entradas del montículo no se validan al meterlas sino al dispararlas: el
+disparador reclama la notificación en la DB y, si la fila ya no coincide
+(borrada, completada, editada...), simplemente no envía nada. Si la tiene otra
+instancia del bot, se vuelve a mirar cuando venza su plazo (`reintentar`).
+"""
+
+import asyncio
+import heapq
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+import pytz
+
+# Importaciones módulos locales
+from db_async import get_avisos_en_ventana
+from config import AVISOS_VENTANA_MIN, AVISOS_VENTANA_MAX_FILAS
+
+# Función que envía una notificación: recibe (ID global del recordatorio, aviso_en que vence).
+Disparador = Callable[[int, datetime], Awaitable[None]]
+
+# Segundos de espera antes de reintentar si una vuelta del bucle falla (p. ej., la DB no responde).
+_ESPERA_TRAS_ERROR = 5
+
+# Entradas (cuándo mirar, rid, aviso_en), la más próxima arriba. Normalmente 'cuándo' es el propio aviso_en.
+_monticulo: list[tuple[datetime, int, datetime]] = []
+_en_monticulo: set[tuple[datetime, int, datetime]] = set()
+_ventana_hasta: Optional[datetime] = None      # Todo lo que vence hasta aquí ya está cargado
+_despertar: Optional[asyncio.Event] = None
+_tarea: Optional[asyncio.Task] = None
+_disparos_en_curso: set[asyncio.Task] = set()
+
+
+# =============================================================================
+# INTERFAZ PÚBLICA
+# =============================================================================
+
+def notificar(rid, aviso_en: Optional[datetime]):
+    """
+    Toque al despachador: la próxima notificación del recordatorio 'rid' vence en 'aviso_en'.
+    Si cae fuera de la ventana cargada no hace nada: ya la traerá una recarga.
+    """
+    if aviso_en is None or _ventana_hasta is None or aviso_en > _ventana_hasta:
+        return
+    _meter((aviso_en, int(rid), aviso_en))
+
+def reintentar(rid, aviso_en: datetime, cuando: datetime):
+    """Vuelve a intentar en 'cuando' la notificación que vence en 'aviso_en' (p. ej., al caducar la reclamación de otra instancia)."""
+    _meter((cuando, int(rid), aviso_en))
+
+def iniciar(disparar: Disparador):
+    """Arranca el bucle del despachador en el event loop actual (una sola vez)."""
+    global _tarea, _despertar
+    if _tarea is not None:
+        return
+    _despertar = asyncio.Event()
+    _tarea = asyncio.get_running_loop().create_task(_bucle(disparar))
+    print(f"📬 Despachador de avisos iniciado (ventana de {AVISOS_VENTANA_MIN} min).")
+
+async def detener():
+    """Detiene el bucle y espera a que terminen los envíos en curso."""
+    global _tarea
+    if _tarea is None:
+        return
+    _tarea.cancel()
+    try:
+        await _tarea
+    except asyncio.CancelledError:
+        pass
+    _tarea = None
+    if _disparos_en_curso:
+        await asyncio.gather(*_disparos_en_curso, return_exceptions=True)
+
+
+# =============================================================================
+# BUCLE PRINCIPAL
+# =============================================================================
+
+def _meter(entrada: tuple[datetime, int, datetime]):
+    if entrada in _en_monticulo:
+        return
+    _en_monticulo.add(entrada)
+    heapq.heappush(_monticulo, entrada)
+    if _despertar is not None:
+        _despertar.set()
+
+async def _recargar(ahora: datetime):
+    """Trae de la DB las notificaciones que vencen dentro de la ventana y las suma al montículo."""
+    global _ventana_hasta
+    hasta = ahora + timedelta(minutes=AVISOS_VENTANA_MIN)
+    filas = await get_avisos_en_ventana(hasta, AVISOS_VENTANA_MAX_FILAS)
+    if len(filas) == AVISOS_VENTANA_MAX_FILAS:
+        # Ventana llena: solo está garantizado lo anterior a la última fila (puede haber empates sin cargar).
+        hasta = filas[-1][1] - timedelta(microseconds=1)
+    for rid, aviso_en in filas:
+        _meter((aviso_en, rid, aviso_en))
+    _ventana_hasta = hasta
+
+def _lanzar(disparar: Disparador, rid: int, aviso_en: datetime):
+    """Lanza el envío en su propia tarea, para que un envío lento no retrase a los demás."""
+    async def disparo_seguro():
+        try:
+            await disparar(rid, aviso_en)
+        except Exception as e:
+            print(f"🚨 Error al enviar el aviso del recordatorio '{rid}': {e}")
+
+    tarea = asyncio.get_running_loop().create_task(disparo_seguro())
+    _disparos_en_curso.add(tarea)
+    tarea.add_done_callback(_disparos_en_curso.discard)
+
+async def _bucle(disparar: Disparador):
+    proxima_recarga = datetime.now(pytz.utc)
+    while True:
+        try:
+            _despertar.clear()
+            ahora = datetime.now(pytz.utc)
+
+            if ahora >= proxima_recarga:
+                await _recargar(ahora)
+                # Recargamos a mitad de ventana: lo que entre en ella siempre se carga con margen.
+                proxima_recarga = ahora + timedelta(minutes=AVISOS_VENTANA_MIN) / 2
+
+            while _monticulo and _monticulo[0][0] <= ahora:
+                entrada = heapq.heappop(_monticulo)
+                _en_monticulo.discard(entrada)
+                _lanzar(disparar, entrada[1], entrada[2])
+
+            siguiente = min(proxima_recarga, _monticulo[0][0]) if _monticulo else proxima_recarga
+            espera = max(0.0, (siguiente - datetime.now(pytz.utc)).total_seconds())
+            try:
+                await asyncio.wait_for(_despertar.wait(), timeout=espera)
+            except asyncio.TimeoutError:
+                pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"🚨 Error en el despachador de avisos: {e}")
+            await asyncio.sleep(_ESPERA_TRAS_ERROR)
@@ -12,7 +12,7 @@ from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, Mess
 from timezonefinderL import TimezoneFinder
 from geopy.geocoders import Nominatim
 
-from db import get_config, set_config, get_connection
+from db_async import get_config, set_config, actualizar_timezone_recordatorios
 from personalidad import get_text, TEXTOS
 from utils import cancelar_conversacion, comando_inesperado, normalizar_texto
 from avisos_resumen_diario import programar_resumen_diario_usuario, cancelar_resumen_diario_usuario
@@ -113,7 +113,7 @@ async def menu_modo_seguro(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     query = update.callback_query
     await query.answer()
     chat_id = update.effective_chat.id
-    modo_seguro_actual = get_config(chat_id, "modo_seguro") or "0"
+    modo_seguro_actual = await get_config(chat_id, "modo_seguro") or "0"
     
     keyboard = [
         [InlineKeyboardButton("🔓 Nivel 0 (Sin confirmaciones)", callback_data="nivel_seguro:0")],
@@ -134,7 +134,7 @@ async def recibir_nivel_callback(update: Update, context: ContextTypes.DEFAULT_T
     await query.answer()
     
     nivel_str = query.data.split(":")[1]
-    set_config(update.effective_chat.id, "modo_seguro", nivel_str)
+    await set_config(update.effective_chat.id, "modo_seguro", nivel_str)
     
     descripcion_nivel = TEXTOS["niveles_modo_seguro"].get(nivel_str, "Desconocido")
     mensaje_confirmacion = get_text("ajustes_confirmados", nivel=nivel_str, descripcion=descripcion_nivel)
@@ -153,7 +153,7 @@ async def menu_zona_horaria(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     await query.answer()
     chat_id = update.effective_chat.id
-    tz_actual = get_config(chat_id, "user_timezone") or "aún sin configurar"
+    tz_actual = await get_config(chat_id, "user_timezone") or "aún sin configurar"
     
     # Creamos los botones Inline para elegir el método
     keyboard = [
@@ -299,7 +299,7 @@ async def confirmar_ciudad(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 async def _guardar_y_preguntar_actualizacion_tz(update: Update, context: ContextTypes.DEFAULT_TYPE, nueva_tz: str):
     """Función ayudante: Guarda la nueva TZ y pregunta si se actualizan los recordatorios antiguos."""
     chat_id = update.effective_chat.id
-    set_config(chat_id, "user_timezone", nueva_tz)
+    await set_config(chat_id, "user_timezone", nueva_tz)
     context.user_data["nueva_tz"] = nueva_tz
     
     keyboard = [
@@ -329,17 +329,15 @@ async def procesar_actualizacion_tz(update: Update, context: ContextTypes.DEFAUL
     
     if query.data == "tz_update_yes":
         nueva_tz = context.user_data.get("nueva_tz")
-        with get_connection() as conn:
-            # CAMBIO: Se reemplaza '?' por '%s' para compatibilidad con PostgreSQL.
-            conn.cursor().execute("UPDATE recordatorios SET timezone = %s WHERE chat_id = %s", (nueva_tz, chat_id))
+        await actualizar_timezone_recordatorios(chat_id, nueva_tz)
         await query.edit_message_text("✅ ¡Entendido! He actualizado todos tus recordatorios a tu nueva zona horaria.")
     else: # tz_update_no
         await query.edit_message_text("👍 De acuerdo. Tus recordatorios antiguos conservarán la zona horaria con la que fueron creados.")
         
     # --- ¡LÓGICA DE EVENTOS! ---
     # Reprogramamos el resumen con la nueva TZ (si está activado)
-    if get_config(chat_id, "resumen_diario_activado") == '1':
-        hora = get_config(chat_id, "resumen_diario_hora") or "08:00"
+    if await get_config(chat_id, "resumen_diario_activado") == '1':
+        hora = await get_config(chat_id, "resumen_diario_hora") or "08:00"
         nueva_tz = context.user_data.get("nueva_tz", "UTC")
         programar_resumen_diario_usuario(chat_id, hora, nueva_tz)
 
@@ -359,8 +357,8 @@ async def menu_resumen_diario(update: Update, context: ContextTypes.DEFAULT_TYPE
     chat_id = update.effective_chat.id
 
     # Obtenemos la configuración actual del usuario, con valores por defecto
-    activado = get_config(chat_id, "resumen_diario_activado") == '1'
-    hora = get_config(chat_id, "resumen_diario_hora") or "08:00"
+    activado = await get_config(chat_id, "resumen_diario_activado") == '1'
+    hora = await get_config(chat_id, "resumen_diario_hora") or "08:00"
 
     # Preparamos los textos para el mensaje
     estado_str = "✅ Activado" if activado else "❌ Desactivado"
@@ -384,15 +382,15 @@ async def toggle_resumen_diario(update: Update, context: ContextTypes.DEFAULT_TY
     await query.answer()
     chat_id = update.effective_chat.id
 
-    activado_actual = get_config(chat_id, "resumen_diario_activado") == '1'
+    activado_actual = await get_config(chat_id, "resumen_diario_activado") == '1'
     nuevo_estado = '0' if activado_actual else '1'
-    set_config(chat_id, "resumen_diario_activado", nuevo_estado)
+    await set_config(chat_id, "resumen_diario_activado", nuevo_estado)
 
     # --- ¡LÓGICA DE EVENTOS! ---
     if nuevo_estado == '1':
         # Si se activa, leemos la hora y la TZ y programamos el job
-        hora = get_config(chat_id, "resumen_diario_hora") or "08:00"
-        tz = get_config(chat_id, "user_timezone") or "UTC"
+        hora = await get_config(chat_id, "resumen_diario_hora") or "08:00"
+        tz = await get_config(chat_id, "user_timezone") or "UTC"
         programar_resumen_diario_usuario(chat_id, hora, tz)
     else:
         # Si se desactiva, cancelamos el job
@@ -423,10 +421,10 @@ async def guardar_hora_resumen(update: Update, context: ContextTypes.DEFAULT_TYP
         return RESUMEN_DIARIO_PIDE_HORA # Mantenemos al usuario en este paso
 
     # Si el formato es correcto, guardamos y reprogramamos
-    set_config(chat_id, "resumen_diario_hora", hora_escrita)
+    await set_config(chat_id, "resumen_diario_hora", hora_escrita)
     
-    if get_config(chat_id, "resumen_diario_activado") == '1':
-        tz = get_config(chat_id, "user_timezone") or "UTC"
+    if await get_config(chat_id, "resumen_diario_activado") == '1':
+        tz = await get_config(chat_id, "user_timezone") or "UTC"
         programar_resumen_diario_usuario(chat_id, hora_escrita, tz)
     
     # Enviamos un mensaje de confirmación y terminamos la conversación
@@ -12,9 +12,9 @@ from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, MessageHandler, filters
 from datetime import datetime
 
-from db import get_connection, get_config
+from db_async import get_config, get_recordatorios_por_user_ids, borrar_recordatorios_por_user_ids
 from utils import cancelar_conversacion, comando_inesperado, enviar_lista_interactiva, convertir_utc_a_local, normalizar_texto
-from avisos import cancelar_avisos
+from avisos import cancelar_avisos_bulk
 from handlers.lista import TITULOS, lista_cancel_handler
 from personalidad import get_text
 
@@ -71,14 +71,9 @@ async def _procesar_ids(update: Update, context: ContextTypes.DEFAULT_TYPE, ids:
         return ConversationHandler.END
 
     # 2. Hacemos UNA SOLA CONSULTA a la base de datos para obtener la info de todos los IDs.
-    with get_connection() as conn:
-        with conn.cursor() as cursor:
-            # CAMBIO: PostgreSQL usa %s como placeholder, no ?.
-            # psycopg2 puede manejar una tupla de valores para 'IN' directamente.
-            query = "SELECT user_id, texto, fecha_hora FROM recordatorios WHERE user_id IN %s AND chat_id = %s"
-
-            cursor.execute(query, (tuple(user_ids_a_buscar), chat_id))
-            recordatorios_encontrados = cursor.fetchall()
+    # Nos quedamos solo con (user_id, texto, fecha_hora) de cada recordatorio.
+    filas = await get_recordatorios_por_user_ids(chat_id, user_ids_a_buscar)
+    recordatorios_encontrados = [(r[1], r[3], r[4]) for r in filas]
 
     if not recordatorios_encontrados:
         await update.message.reply_text(get_text("error_no_id"))
@@ -88,10 +83,10 @@ async def _procesar_ids(update: Update, context: ContextTypes.DEFAULT_TYPE, ids:
     context.user_data["info_a_borrar"] = recordatorios_encontrados
     
     # 3. Comprobamos el Modo Seguro.
-    modo_seguro = int(get_config(chat_id, "modo_seguro") or 0)
+    modo_seguro = int(await get_config(chat_id, "modo_seguro") or 0)
     if modo_seguro in (1, 3):
         # Si se requiere confirmación, construimos el mensaje y esperamos respuesta.
-        user_tz = get_config(chat_id, "user_timezone") or "UTC"
+        user_tz = await get_config(chat_id, "user_timezone") or "UTC"
         mensaje_lista = []
         for user_id, texto, fecha_utc in recordatorios_encontrados:
             fecha_str = "Sin fecha"
@@ -136,20 +131,11 @@ async def ejecutar_borrado(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 
     user_ids_a_borrar = [recordatorio[0] for recordatorio in info_a_borrar]
 
-    with get_connection() as conn:
-        with conn.cursor() as cursor:
-            # 1. Obtenemos los IDs GLOBALES para cancelar los jobs del scheduler.
-            query_ids = "SELECT id FROM recordatorios WHERE user_id IN %s AND chat_id = %s"
-            cursor.execute(query_ids, (tuple(user_ids_a_borrar), chat_id))
-            ids_globales = [row[0] for row in cursor.fetchall()]
-
-            # 2. Hacemos UNA SOLA CONSULTA para borrar todos los recordatorios.
-            query_delete = "DELETE FROM recordatorios WHERE user_id IN %s AND chat_id = %s"
-            cursor.execute(query_delete, (tuple(user_ids_a_borrar), chat_id))
+    # 1 y 2. Borramos los recordatorios y obtenemos sus IDs GLOBALES para cancelar los jobs del scheduler.
+    borrados = await borrar_recordatorios_por_user_ids(chat_id, user_ids_a_borrar)
     
     # 3. Cancelamos todos los avisos asociados.
-    for rid in ids_globales:
-        cancelar_avisos(str(rid))
+    await cancelar_avisos_bulk([rid for rid, _, _ in borrados])
     
     # 4. Enviamos un único mensaje de confirmación.
     if len(info_a_borrar) == 1:
@@ -13,9 +13,9 @@ from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, Mess
 from datetime import datetime
 import pytz
 
-from db import get_connection, get_config
+from db_async import get_config, get_recordatorios_por_user_ids, cambiar_estado_recordatorios, actualizar_aviso_previo
 from utils import parsear_tiempo_a_minutos, cancelar_conversacion, comando_inesperado, enviar_lista_interactiva, normalizar_texto
-from avisos import cancelar_avisos, programar_avisos
+from avisos import cancelar_avisos_bulk, programar_avisos
 from handlers.lista import TITULOS, lista_cancel_handler
 from personalidad import get_text
 
@@ -56,12 +56,9 @@ async def _procesar_ids_para_cambiar(update: Update, context: ContextTypes.DEFAU
         await update.message.reply_text(get_text("error_no_id"))
         return ConversationHandler.END
 
-    with get_connection() as conn:
-        with conn.cursor() as cursor:
-            # CAMBIO: Placeholder a %s y uso de tupla para IN
-            query = "SELECT user_id, texto, estado FROM recordatorios WHERE user_id IN %s AND chat_id = %s"
-            cursor.execute(query, (tuple(user_ids_a_buscar), chat_id))
-            recordatorios_encontrados = cursor.fetchall()
+    # Nos quedamos solo con (user_id, texto, estado) de cada recordatorio.
+    filas = await get_recordatorios_por_user_ids(chat_id, user_ids_a_buscar)
+    recordatorios_encontrados = [(r[1], r[3], r[5]) for r in filas]
 
     if not recordatorios_encontrados:
         await update.message.reply_text(get_text("error_no_id"))
@@ -69,7 +66,7 @@ async def _procesar_ids_para_cambiar(update: Update, context: ContextTypes.DEFAU
 
     context.user_data["info_a_cambiar"] = recordatorios_encontrados
     
-    modo_seguro = int(get_config(chat_id, "modo_seguro") or 0)
+    modo_seguro = int(await get_config(chat_id, "modo_seguro") or 0)
     if modo_seguro in (2, 3):
         emojis_estado = {0: "⬜️", 1: "✅"}
         mensaje_lista = []
@@ -106,34 +103,18 @@ async def ejecutar_cambio(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     user_ids_a_cambiar = [recordatorio[0] for recordatorio in info_a_cambiar]
     
-    # 1. Obtenemos toda la información necesaria con UNA SOLA CONSULTA.
-    with get_connection() as conn:
-        with conn.cursor() as cursor:
-            # CAMBIO: Placeholder a %s y uso de tupla para IN
-            query = "SELECT id, user_id, estado, texto, fecha_hora, aviso_previo FROM recordatorios WHERE user_id IN %s AND chat_id = %s"
-            cursor.execute(query, (tuple(user_ids_a_cambiar), chat_id))
-            full_info_recordatorios = cursor.fetchall()
-
-            # CAMBIO: La sintaxis de UPDATE ahora usa %s
-            ids_a_pendiente = [r[1] for r in full_info_recordatorios if r[2] == 1]
-            ids_a_hecho = [r[1] for r in full_info_recordatorios if r[2] == 0]     
-            
-            if ids_a_pendiente:
-                cursor.execute("UPDATE recordatorios SET estado = 0 WHERE user_id IN %s AND chat_id = %s", 
-                               (tuple(ids_a_pendiente), chat_id))
-            if ids_a_hecho:
-                cursor.execute("UPDATE recordatorios SET estado = 1 WHERE user_id IN %s AND chat_id = %s", 
-                               (tuple(ids_a_hecho), chat_id))
+    # 1. Cambiamos el estado en la DB y obtenemos la información (con el estado ANTERIOR) de cada uno.
+    full_info_recordatorios = await cambiar_estado_recordatorios(chat_id, user_ids_a_cambiar)
+    ids_a_pendiente = [r[1] for r in full_info_recordatorios if r[2] == 1]
+
+    # 2. Tanto si pasan a 'Hecho' como a 'Pendiente', sus avisos actuales sobran: se cancelan todos de una vez.
+    await cancelar_avisos_bulk([r[0] for r in full_info_recordatorios])
 
     # 3. Procesamos los resultados en Python.
     reprogramables, pasados_sin_aviso = [], []
     
     for r_id, u_id, estado, texto, fecha_utc, aviso in full_info_recordatorios:
-        if u_id in ids_a_hecho:
-            cancelar_avisos(str(r_id))
-        
-        elif u_id in ids_a_pendiente:
-            cancelar_avisos(str(r_id))
+        if u_id in ids_a_pendiente:
             if fecha_utc:
                 # ELIMINAMOS la línea que daba error: datetime.fromisoformat()
                 if fecha_utc > datetime.now(pytz.utc):
@@ -177,9 +158,7 @@ async def recibir_nuevo_aviso(update: Update, context: ContextTypes.DEFAULT_TYPE
     recordatorio_actual = reprogramar_lista.pop(0) # Lo sacamos de la lista
     
     # Guardamos el nuevo aviso_previo en la DB
-    with get_connection() as conn:
-        # CAMBIO: Placeholder a %s
-        conn.cursor().execute("UPDATE recordatorios SET aviso_previo = %s WHERE id = %s", (minutos, recordatorio_actual["global_id"]))
+    await actualizar_aviso_previo(recordatorio_actual["global_id"], minutos)
 
     # Programamos el aviso con la nueva configuración
     await programar_avisos(
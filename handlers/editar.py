@@ -16,9 +16,9 @@ from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, Mess
 from datetime import datetime
 import pytz
 
-from db import get_connection, get_config
+from db_async import get_config, get_recordatorio_por_user_id, get_recordatorio_por_id, actualizar_contenido_recordatorio, actualizar_aviso_previo
 from utils import (
-    enviar_lista_interactiva, parsear_recordatorio, parsear_tiempo_a_minutos, 
+    enviar_lista_interactiva, parsear_recordatorio_async, parsear_tiempo_a_minutos, 
     cancelar_conversacion, comando_inesperado, convertir_utc_a_local
 )
 from handlers.lista import TITULOS, lista_cancel_handler
@@ -64,28 +64,21 @@ async def _procesar_id_y_avanzar(update: Update, context: ContextTypes.DEFAULT_T
         await update.message.reply_text(get_text("error_no_id"))
         return ConversationHandler.END
 
-    with get_connection() as conn:
-        with conn.cursor() as cursor:
-            # CAMBIO: Placeholder a %s
-            cursor.execute(
-                "SELECT id, texto, fecha_hora, timezone, aviso_previo FROM recordatorios WHERE user_id = %s AND chat_id = %s", 
-                (user_id_a_editar, chat_id)
-            )
-            recordatorio = cursor.fetchone()
+    recordatorio = await get_recordatorio_por_user_id(chat_id, user_id_a_editar)
 
     if not recordatorio:
         await update.message.reply_text(get_text("error_no_id"))
         return ConversationHandler.END
 
     # Guardamos toda la información necesaria para los siguientes pasos.
-    global_id, texto, fecha_utc, timezone, aviso_previo = recordatorio
+    global_id, _, _, texto, fecha_utc, _, aviso_previo, timezone, regla = recordatorio
     context.user_data["editar_info"] = {
         "global_id": global_id, "user_id": user_id_a_editar, "texto": texto,
-        "fecha_utc": fecha_utc, "timezone": timezone, "aviso_previo": aviso_previo
+        "fecha_utc": fecha_utc, "timezone": timezone, "aviso_previo": aviso_previo, "recurrencia": regla
     }
 
     # Preparamos y enviamos el menú de opciones.
-    user_tz = get_config(chat_id, "user_timezone") or "UTC"
+    user_tz = await get_config(chat_id, "user_timezone") or "UTC"
     fecha_str = "Sin fecha"
     if fecha_utc:
         fecha_local = convertir_utc_a_local(fecha_utc, timezone or user_tz)
@@ -127,7 +120,7 @@ async def pedir_nuevo_recordatorio(update: Update, context: ContextTypes.DEFAULT
     await query.answer()
     info = context.user_data.get("editar_info", {})
     
-    user_tz = get_config(update.effective_chat.id, "user_timezone") or 'UTC'
+    user_tz = await get_config(update.effective_chat.id, "user_timezone") or 'UTC'
     fecha_str = "Sin fecha"
 
     fecha_utc = info.get("fecha_utc")
@@ -146,20 +139,16 @@ async def guardar_nuevo_recordatorio(update: Update, context: ContextTypes.DEFAU
     if not info: return ConversationHandler.END
 
     chat_id = update.effective_chat.id
-    user_tz = get_config(chat_id, "user_timezone") or 'UTC'
+    user_tz = await get_config(chat_id, "user_timezone") or 'UTC'
     
-    texto, fecha, error = parsear_recordatorio(update.message.text, user_timezone=user_tz)
+    # El nuevo contenido sustituye también la repetición: sin "cada..." pasa a ser de una sola vez.
+    texto, fecha, regla, error = await parsear_recordatorio_async(update.message.text, user_timezone=user_tz)
     
     if error:
-        await update.message.reply_text(get_text("error_formato"))
+        await update.message.reply_text(error)
         return EDITAR_RECORDATORIO
 
-    with get_connection() as conn:
-        # CAMBIO: Placeholder a %s
-        conn.cursor().execute(
-            "UPDATE recordatorios SET texto = %s, fecha_hora = %s, timezone = %s WHERE id = %s",
-            (texto, fecha, user_tz, info["global_id"])
-        )
+    await actualizar_contenido_recordatorio(info["global_id"], texto, fecha, user_tz, regla)
     
     # Reprogramamos los avisos usando el 'aviso_previo' que ya estaba guardado.
     cancelar_avisos(str(info["global_id"]))
@@ -199,14 +188,10 @@ async def pedir_nuevo_aviso(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     # --- LÓGICA DE VALIDACIÓN ---
     # 1. Obtenemos el estado actual desde la base de datos para estar seguros.
-    with get_connection() as conn:
-        with conn.cursor() as cursor:
-            # Placeholder >> %s
-            cursor.execute("SELECT estado, fecha_hora FROM recordatorios WHERE id = %s", (info.get("global_id"),))
-            recordatorio_actual = cursor.fetchone()
+    recordatorio_actual = await get_recordatorio_por_id(info.get("global_id"))
     
     if recordatorio_actual:
-        estado_actual, fecha_utc_actual = recordatorio_actual
+        estado_actual, fecha_utc_actual = recordatorio_actual[5], recordatorio_actual[4]
         
         # 2. Comprobamos si el recordatorio está hecho (estado 1).
         if estado_actual == 1:
@@ -244,9 +229,13 @@ async def guardar_nuevo_aviso(update: Update, context: ContextTypes.DEFAULT_TYPE
         return EDITAR_AVISO
         
     if minutos == 0:
-        with get_connection() as conn:
-            conn.cursor().execute("UPDATE recordatorios SET aviso_previo = %s WHERE id = %s", (0, info["global_id"]))
+        await actualizar_aviso_previo(info["global_id"], 0)
         cancelar_avisos(str(info["global_id"]))
+        if info.get("recurrencia") and info.get("fecha_utc"):
+            # Sin aviso previo, pero un recurrente conserva su notificación principal para seguir repitiéndose.
+            await programar_avisos(
+                update.effective_chat.id, str(info["global_id"]), info["user_id"], info["texto"], info["fecha_utc"], 0
+            )
         mensaje_confirmacion = get_text("editar_confirmacion_aviso", user_id=info["user_id"], aviso_nuevo="ninguno")
     
     elif not info.get("fecha_utc"):
@@ -260,8 +249,7 @@ async def guardar_nuevo_aviso(update: Update, context: ContextTypes.DEFAULT_TYPE
             update.effective_chat.id, str(info["global_id"]), info["user_id"], info["texto"], fecha, minutos
         )
         if se_programo_aviso:
-            with get_connection() as conn:
-                conn.cursor().execute("UPDATE recordatorios SET aviso_previo = %s WHERE id = %s", (minutos, info["global_id"]))
+            await actualizar_aviso_previo(info["global_id"], minutos)
             horas, mins = divmod(minutos, 60)
             tiempo_nuevo_str = f"{horas}h" if mins == 0 else f"{horas}h {mins}m" if horas > 0 else f"{mins}m"
             mensaje_confirmacion = get_text("editar_confirmacion_aviso", user_id=info["user_id"], aviso_nuevo=tiempo_nuevo_str)
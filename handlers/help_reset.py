@@ -11,7 +11,7 @@ Contiene dos funcionalidades distintas:
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, MessageHandler, filters
 
-from db import resetear_base_de_datos
+from db_async import resetear_base_de_datos
 from avisos import cancelar_todos_los_avisos
 from config import OWNER_ID  
 from personalidad import get_text
@@ -68,7 +68,7 @@ async def confirmar_reset(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     # --- Validación robusta (insensible a mayúsculas/minúsculas) ---
     if update.message.text.strip().upper() == "CONFIRMAR":
         # Ejecuta las dos acciones de reseteo: vaciar la DB y limpiar el scheduler.
-        resetear_base_de_datos()
+        await resetear_base_de_datos()
         cancelar_todos_los_avisos()
         await update.message.reply_text(get_text("reset_confirmado"))
     else:
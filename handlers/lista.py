@@ -12,9 +12,9 @@ y las acciones contextuales (Limpiar, Cancelar) para TODAS las listas del bot
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler
 
-from db import borrar_recordatorios_por_filtro
+from db_async import borrar_recordatorios_por_filtro
 from utils import enviar_lista_interactiva, cancelar_callback
-from avisos import cancelar_avisos
+from avisos import cancelar_avisos_bulk
 
 # =============================================================================
 # DEFINICIÓN DE TÍTULOS
@@ -77,14 +77,17 @@ async def lista_shared_callback(update: Update, context: ContextTypes.DEFAULT_TY
     Extrae el estado del callback_data y redibuja la lista con los parámetros correctos.
     """
     query = update.callback_query
-    # Formato del callback_data: "accion:val1:val2:contexto:cancel_flag"
+    # Formato del callback_data: "accion:val1:val2:contexto:cancel_flag[:cursor]"
     parts = query.data.split(":")
     action = parts[0]
+    cursor = None
     
     # Desempaquetamos los datos según la acción
     if action == "list_page":
         page = int(parts[1])
         filtro, context_key, cancel_flag = parts[2], parts[3], parts[4]
+        # El cursor (keyset) de la página es opcional: los botones antiguos no lo llevan.
+        cursor = parts[5] if len(parts) > 5 else None
     elif action == "list_pivot":
         page = 1 # Al cambiar de vista, siempre volvemos a la página 1.
         filtro, context_key, cancel_flag = parts[1], parts[2], parts[3]
@@ -101,7 +104,8 @@ async def lista_shared_callback(update: Update, context: ContextTypes.DEFAULT_TY
         titulos=titulos_correctos, 
         page=page, 
         filtro=filtro, 
-        mostrar_boton_cancelar=mostrar_cancelar
+        mostrar_boton_cancelar=mostrar_cancelar,
+        cursor=cursor
     )
 
 
@@ -136,11 +140,10 @@ async def limpiar_callback_unificado(update: Update, context: ContextTypes.DEFAU
         )
     elif step == "confirm":
         # Llamamos a nuestra nueva función universal con el filtro correcto
-        num_borrados, ids_borrados = borrar_recordatorios_por_filtro(update.effective_chat.id, filtro)
-        for rid in ids_borrados:
-            cancelar_avisos(str(rid))
+        borrados = await borrar_recordatorios_por_filtro(update.effective_chat.id, filtro)
+        await cancelar_avisos_bulk([rid for rid, _, _ in borrados])
         await query.edit_message_text(
-            text=f"🪄✨ ¡Fregotego!\n\nSe han borrado {num_borrados} recordatorios '{texto_actual['nombre']}' de tu archivo.",
+            text=f"🪄✨ ¡Fregotego!\n\nSe han borrado {len(borrados)} recordatorios '{texto_actual['nombre']}' de tu archivo.",
             parse_mode="Markdown"
         )
     elif step == "cancel":
@@ -0,0 +1,87 @@
+# handlers/metricas.py
+"""
+Módulo para el comando de administración /metricas.
+
+Muestra al propietario del bot (OWNER_ID) las consultas a la base de datos más
+lentas según su p95, con sus percentiles p50/p95/p99, el retraso con que se
+disparan y entregan los avisos (y qué parte cumple el objetivo de puntualidad),
+el estado de la cola de envíos a Telegram, qué parte de las fechas se resuelve sin
+llamar a dateparser y los contadores acumulados desde el último arranque.
+Uso: `/metricas [N]` (por defecto, 10).
+"""
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+import cola_envios
+import metricas
+from config import OWNER_ID, AVISOS_SLO_SEGUNDOS
+from personalidad import get_text
+
+TOP_N_POR_DEFECTO = 10
+
+
+def _tabla_histogramas(filas: list) -> str:
+    """Formatea un resumen de histogramas como tabla monoespaciada (tiempos en ms)."""
+    lineas = [f"{'nombre':<28} {'n':>6} {'p50':>7} {'p95':>7} {'p99':>7}"]
+    for nombre, total, p50, p95, p99, _ in filas:
+        lineas.append(f"{nombre[:28]:<28} {total:>6} {p50:>7.1f} {p95:>7.1f} {p99:>7.1f}")
+    return "\n".join(lineas)
+
+async def metricas_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Envía el informe de métricas. Solo responde al propietario del bot."""
+    if update.effective_chat.id != OWNER_ID:
+        await update.message.reply_text(get_text("metricas_denegado"))
+        return
+
+    top_n = TOP_N_POR_DEFECTO
+    if context.args and context.args[0].isdigit():
+        top_n = max(1, int(context.args[0]))
+
+    secciones = []
+    consultas = metricas.resumen_histogramas("sql.", top_n)
+    if consultas:
+        secciones.append(f"🐢 *Consultas más lentas (top {top_n}, ms)*\n```\n{_tabla_histogramas(consultas)}\n```")
+
+    retrasos = metricas.resumen_histogramas("retraso.")
+    if retrasos:
+        retrasos.sort(key=lambda fila: fila[0])
+        lineas = [_tabla_histogramas(retrasos)]
+        slo = metricas.contadores("slo.")
+        for tipo in sorted({nombre.split(".")[1] for nombre in slo}):
+            total = slo.get(f"slo.{tipo}.total", 0)
+            if total:
+                dentro = slo.get(f"slo.{tipo}.dentro", 0)
+                lineas.append(f"{tipo}: {dentro / total:.1%} entregados en ≤{AVISOS_SLO_SEGUNDOS:g} s ({dentro}/{total})")
+        secciones.append("⏱️ *Retraso de los avisos (ms)*\n```\n" + "\n".join(lineas) + "\n```")
+
+    pendientes = cola_envios.profundidad()
+    esperas = metricas.resumen_histogramas("cola.espera.")
+    if any(pendientes.values()) or esperas:
+        lineas = ["Pendientes: " + " · ".join(f"{clase} {n}" for clase, n in pendientes.items())]
+        for _, _, p50, p95, _, maximo in metricas.resumen_histogramas("cola.profundidad"):
+            lineas.append(f"Profundidad al encolar: p50 {p50:.0f} · p95 {p95:.0f} · máx {maximo:.0f}")
+        if esperas:
+            lineas += ["", "Espera en cola (ms):", _tabla_histogramas(esperas)]
+        secciones.append("📤 *Cola de envíos*\n```\n" + "\n".join(lineas) + "\n```")
+
+    parseos = metricas.contadores("parseo.")
+    rapidos, cacheados, lentos = (parseos.get(f"parseo.{nombre}", 0) for nombre in ("rapido", "cache.aciertos", "dateparser"))
+    if rapidos + cacheados + lentos:
+        total = rapidos + cacheados + lentos
+        lineas = [
+            f"Vía rápida: {rapidos / total:.1%} ({rapidos} de {total})",
+            f"Caché:      {cacheados / total:.1%} ({cacheados})",
+            f"dateparser: {lentos / total:.1%} ({lentos})",
+        ]
+        secciones.append("🗓️ *Parseo de fechas*\n```\n" + "\n".join(lineas) + "\n```")
+
+    contadores = metricas.contadores()
+    if contadores:
+        lineas = [f"{nombre:<32} {valor:>8}" for nombre, valor in contadores.items()]
+        secciones.append("🔢 *Contadores*\n```\n" + "\n".join(lineas) + "\n```")
+
+    if not secciones:
+        await update.message.reply_text(get_text("metricas_vacias"))
+        return
+    await update.message.reply_text("\n\n".join(secciones), parse_mode="Markdown")
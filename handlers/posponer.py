@@ -7,13 +7,54 @@ de nivel superior que reacciona a las pulsaciones de los botones que se envían
 junto con los avisos de recordatorio (principal y previo).
 """
 
-from telegram import Update
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CallbackQueryHandler
 from datetime import datetime, timedelta
 import pytz
 
-from db import get_connection, get_config
+from db_async import get_config, get_recordatorio_por_id, marcar_como_hecho, actualizar_aviso_previo
 from avisos import cancelar_avisos, programar_avisos
+from recurrencia import describir
+
+
+# =============================================================================
+# AVISOS AGRUPADOS
+# =============================================================================
+# Cuando varios avisos principales de un chat vencen a la vez salen en un solo mensaje con una
+# fila de botones por recordatorio (ver avisos._enviar_recordatorios). Ahí, pulsar un botón solo
+# afecta a su fila: el resto del mensaje se queda como está para los demás recordatorios.
+
+def _es_aviso_agrupado(query) -> bool:
+    """Los botones de un aviso agrupado llevan el ID corto ('✅ Hecho #3'); aunque solo quede una fila, lo sigue siendo."""
+    markup = query.message.reply_markup
+    return markup is not None and any("#" in boton.text for fila in markup.inline_keyboard for boton in fila)
+
+async def _actualizar_fila_agrupada(query, rid: str, etiqueta: str | None):
+    """Sustituye la fila de botones del recordatorio por una etiqueta inerte (o la quita si no hay etiqueta)."""
+    filas = []
+    for fila in query.message.reply_markup.inline_keyboard:
+        if any((boton.callback_data or "").endswith(f":{rid}") for boton in fila):
+            if etiqueta:
+                filas.append([InlineKeyboardButton(etiqueta, callback_data="placeholder")])
+        else:
+            filas.append(list(fila))
+    await query.edit_message_reply_markup(reply_markup=InlineKeyboardMarkup(filas) if filas else None)
+
+async def _accion_en_aviso_agrupado(query, action: str, rid: str, recordatorio_data):
+    """'Hecho' u 'OK' pulsados en un aviso agrupado (en estos mensajes no hay botón de posponer)."""
+    if not recordatorio_data:
+        await _actualizar_fila_agrupada(query, rid, None)
+        return
+    _, user_id, _, _, _, estado_actual, _, _, regla = recordatorio_data
+    if action == "mark_done":
+        # Igual que en un aviso suelto: un recurrente no se completa, solo esta repetición.
+        if estado_actual == 0 and not regla:
+            await marcar_como_hecho(rid)
+            cancelar_avisos(rid)
+        await _actualizar_fila_agrupada(query, rid, f"✅ #{user_id} hecho")
+    else:
+        # El aviso principal ya ha llegado: 'OK' solo retira sus botones.
+        await _actualizar_fila_agrupada(query, rid, None)
 
 
 # =============================================================================
@@ -33,19 +74,17 @@ async def handle_posponer_or_done(update: Update, context: ContextTypes.DEFAULT_
     rid = parts[-1] # El ID del recordatorio siempre es la última parte.
 
     # --- 2. Obtención de datos y validaciones iniciales ---
-    with get_connection() as conn:
-        with conn.cursor() as cursor:
-            # Placeholder >> %s
-            cursor.execute(
-                "SELECT user_id, texto, estado, fecha_hora, aviso_previo FROM recordatorios WHERE id = %s", (rid,)
-            )
-            recordatorio_data = cursor.fetchone()
+    recordatorio_data = await get_recordatorio_por_id(rid)
+
+    if _es_aviso_agrupado(query):
+        await _accion_en_aviso_agrupado(query, action, rid, recordatorio_data)
+        return
 
     if not recordatorio_data:
         await query.edit_message_text(text="👵 Vaya, parece que este recordatorio ya no existe.")
         return
 
-    user_id, texto, estado_actual, fecha_recordatorio_utc, aviso_previo_actual = recordatorio_data
+    _, user_id, _, texto, fecha_recordatorio_utc, estado_actual, aviso_previo_actual, _, regla = recordatorio_data
 
     # Si el recordatorio ya estaba marcado como "Hecho", informamos y no hacemos nada más.
     if estado_actual == 1:
@@ -54,9 +93,19 @@ async def handle_posponer_or_done(update: Update, context: ContextTypes.DEFAULT_
 
     # --- 3. Lógica específica para cada acción ---
 
-    if action == "mark_done":   # Acción: Marcar como Hecho.
-        with get_connection() as conn:
-            conn.cursor().execute("UPDATE recordatorios SET estado = 1, aviso_previo = 0 WHERE id = %s", (rid,))
+    if regla and action in ("mark_done", "ok"):
+        # En un recurrente, 'Hecho' y 'OK' valen solo para esta repetición: la serie sigue su curso.
+        # Para terminarla del todo están /cambiar y /borrar.
+        if action == "mark_done":
+            await query.edit_message_text(
+                text=f"✅ ¡Bien hecho! Has completado: _{texto}_\n\n🔁 Te lo volveré a recordar {describir(regla)}.",
+                parse_mode="Markdown"
+            )
+        else:
+            await query.edit_message_text(text=query.message.text, reply_markup=None, parse_mode="Markdown")
+
+    elif action == "mark_done":   # Acción: Marcar como Hecho.
+        await marcar_como_hecho(rid)
         cancelar_avisos(rid) # Cancelamos cualquier job futuro que pudiera quedar.
         await query.edit_message_text(text=f"✅ ¡Bien hecho! Has completado: _{texto}_", parse_mode="Markdown")
 
@@ -92,11 +141,10 @@ async def handle_posponer_or_done(update: Update, context: ContextTypes.DEFAULT_
         )
 
         # Guardamos el nuevo valor de 'aviso_previo' en la base de datos.
-        with get_connection() as conn:
-            conn.cursor().execute("UPDATE recordatorios SET aviso_previo = %s WHERE id = %s", (nuevo_aviso_previo_min, rid))
+        await actualizar_aviso_previo(rid, nuevo_aviso_previo_min)
 
         # Confirmamos al usuario.
-        user_tz_str = get_config(query.message.chat_id, "user_timezone") or 'UTC'
+        user_tz_str = await get_config(query.message.chat_id, "user_timezone") or 'UTC'
         try: user_tz = pytz.timezone(user_tz_str)
         except pytz.UnknownTimeZoneError: user_tz = pytz.utc
         
@@ -110,9 +158,8 @@ async def handle_posponer_or_done(update: Update, context: ContextTypes.DEFAULT_
 
     elif action == "ok":
         # Acción: Descartar la notificación.
-        with get_connection() as conn:
-            # Reseteamos el aviso_previo a 0 para que no aparezca en /lista.
-            conn.cursor().execute("UPDATE recordatorios SET aviso_previo = 0 WHERE id = %s", (rid,))
+        # Reseteamos el aviso_previo a 0 para que no aparezca en /lista.
+        await actualizar_aviso_previo(rid, 0)
                     
         # Cancelamos el aviso principal si aún estaba programado.
         cancelar_avisos(rid)
@@ -6,19 +6,34 @@ Gestiona una conversación de dos pasos para crear un nuevo recordatorio:
 1.  Pide y procesa la fecha y el texto del recordatorio.
 2.  Pide y procesa un tiempo de aviso previo opcional.
 Soporta un modo rápido donde toda la información se puede dar en el comando inicial.
+
+Modo lote: si el mensaje trae varias líneas (p. ej., una lista pegada de otra
+aplicación), cada línea es un recordatorio `fecha * texto`. Se parsean todas a
+la vez, se guardan con un solo INSERT (IDs cortos consecutivos), se programan
+de golpe y se contesta con un único resumen que incluye las líneas que no se
+han entendido. A diferencia del modo de uno en uno (donde un aviso previo '0'
+deja el recordatorio sin notificación), cada uno avisa a su hora con el aviso
+principal; el resumen, /info y el README lo dicen.
 """
 
+import asyncio
+
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, MessageHandler, filters
 
-from db import get_connection, get_config
-from utils import parsear_recordatorio, parsear_tiempo_a_minutos, cancelar_conversacion, convertir_utc_a_local, comando_inesperado
-from avisos import programar_avisos
+from db_async import get_config, insertar_recordatorio, insertar_recordatorios, actualizar_aviso_previo
+from utils import parsear_recordatorio_async, parsear_tiempo_a_minutos, cancelar_conversacion, convertir_utc_a_local, comando_inesperado
+from avisos import programar_avisos, programar_avisos_bulk
 from personalidad import get_text
+from recurrencia import describir
 
 # --- DEFINICIÓN DE ESTADOS ---
 FECHA_TEXTO, AVISO_PREVIO = range(2)
 
+MAX_LINEAS_LOTE = 50
+# Telegram corta los mensajes de más de 4096 caracteres: el resumen del lote se parte antes.
+MAX_CARACTERES_MENSAJE = 4000
+
 
 # =============================================================================
 # FUNCIONES DE LA CONVERSACIÓN
@@ -27,6 +42,10 @@ FECHA_TEXTO, AVISO_PREVIO = range(2)
 async def recordar_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Punto de entrada para /recordar. Dirige al modo rápido o interactivo"""
     if context.args:
+        # Modo lote: 'context.args' pierde los saltos de línea, así que se mira el texto tal cual.
+        lineas = _lineas(update.message.text.split(None, 1)[1])
+        if len(lineas) > 1:
+            return await _procesar_lote(update, context, lineas)
         # Modo rápido: si ya se da la info, se salta el primer paso
         entrada = " ".join(context.args)
         # Delegamos a la misma función que el modo interactivo para no duplicar código
@@ -39,6 +58,9 @@ async def recordar_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def recibir_fecha_texto(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Recibe la fecha y el texto del usuario en el modo interactivo."""
     entrada = update.message.text
+    lineas = _lineas(entrada)
+    if len(lineas) > 1:
+        return await _procesar_lote(update, context, lineas)
     return await _procesar_fecha_texto(update, context, entrada)
 
 async def _procesar_fecha_texto(update: Update, context: ContextTypes.DEFAULT_TYPE, entrada: str):
@@ -46,10 +68,10 @@ async def _procesar_fecha_texto(update: Update, context: ContextTypes.DEFAULT_TY
     Función central del primer paso: parsea, valida y guarda el recordatorio inicial en la DB.
     """
     chat_id = update.effective_chat.id
-    user_tz = get_config(chat_id, "user_timezone") or 'UTC'
+    user_tz = await get_config(chat_id, "user_timezone") or 'UTC'
 
     # 1. Parsear la entrada del usuario.
-    texto, fecha, error = parsear_recordatorio(entrada, user_timezone=user_tz)
+    texto, fecha, regla, error = await parsear_recordatorio_async(entrada, user_timezone=user_tz)
 
     if error:
         await update.message.reply_text(error)
@@ -61,32 +83,19 @@ async def _procesar_fecha_texto(update: Update, context: ContextTypes.DEFAULT_TY
         await update.message.reply_text("👵 ¡Criatura, no puedes crear un recordatorio sin nada que recordar! Inténtalo de nuevo.")
         return FECHA_TEXTO if not context.args else ConversationHandler.END
 
-    # 3. Guardar en la base de datos y obtener IDs.
-    fecha_iso = fecha.isoformat() if fecha else None
-    with get_connection() as conn:
-        with conn.cursor() as cursor:
-            
-            # --- LÓGICA DE ID OPTIMIZADA ---
-            # CAMBIO 1: PostgreSQL usa %s en lugar de ?.
-            # CAMBIO 2: IFNULL (SQLite) se reemplaza por COALESCE (SQL estándar).
-            # CAMBIO 3: Para obtener el ID insertado en PostgreSQL, usamos 'RETURNING id'.
-            cursor.execute(
-                """INSERT INTO recordatorios (user_id, chat_id, texto, fecha_hora, aviso_previo, timezone) 
-                   VALUES ((SELECT COALESCE(MAX(user_id), 0) + 1 FROM recordatorios WHERE chat_id = %s), %s, %s, %s, 0, %s)
-                   RETURNING id, user_id""",
-                (chat_id, chat_id, texto, fecha_iso, user_tz)
-            )
-            # Obtenemos los IDs directamente del resultado de la inserción
-            recordatorio_id_global, nuevo_user_id = cursor.fetchone()
+    # 3. Guardar en la base de datos y obtener IDs (global y corto del chat).
+    recordatorio_id_global, nuevo_user_id = await insertar_recordatorio(chat_id, texto, fecha, user_tz, regla)
 
     # 4. Guardar información para el siguiente paso y confirmar al usuario.
     context.user_data["recordatorio_info"] = {
         "global_id": recordatorio_id_global, "user_id": nuevo_user_id,
-        "texto": texto, "fecha": fecha
+        "texto": texto, "fecha": fecha, "recurrencia": regla
     }
 
     fecha_local = convertir_utc_a_local(fecha, user_tz)
     fecha_str = fecha_local.strftime("%d %b, %H:%M") if fecha_local else "Sin fecha"
+    if regla:
+        fecha_str += f", y luego {describir(regla)}"
     mensaje_guardado = get_text("recordatorio_guardado", id=nuevo_user_id, texto=texto, fecha=fecha_str)
     
     await update.message.reply_text(mensaje_guardado, parse_mode="Markdown")
@@ -95,6 +104,64 @@ async def _procesar_fecha_texto(update: Update, context: ContextTypes.DEFAULT_TY
     return AVISO_PREVIO
 
 
+def _lineas(entrada: str) -> list[str]:
+    return [linea.strip() for linea in entrada.splitlines() if linea.strip()]
+
+def _partir_mensaje(lineas: list[str]) -> list[str]:
+    """Junta las líneas en mensajes que no pasen de MAX_CARACTERES_MENSAJE."""
+    mensajes, actual = [], ""
+    for linea in lineas:
+        if actual and len(actual) + len(linea) + 1 > MAX_CARACTERES_MENSAJE:
+            mensajes.append(actual)
+            actual = ""
+        actual = f"{actual}\n{linea}" if actual else linea[:MAX_CARACTERES_MENSAJE]
+    return mensajes + [actual] if actual else mensajes
+
+async def _procesar_lote(update: Update, context: ContextTypes.DEFAULT_TYPE, lineas: list[str]) -> int:
+    """
+    Modo lote: cada línea es un recordatorio. Se parsean a la vez, se guardan con un solo INSERT
+    y se programan de golpe. Sin aviso previo (no se pregunta uno por uno): solo el principal.
+    """
+    if len(lineas) > MAX_LINEAS_LOTE:
+        await update.message.reply_text(get_text("recordar_lote_demasiado_largo", max=MAX_LINEAS_LOTE))
+        return ConversationHandler.END
+
+    chat_id = update.effective_chat.id
+    user_tz = await get_config(chat_id, "user_timezone") or 'UTC'
+
+    # 1. Parsear todas las líneas a la vez (con el pool de procesos activo, en paralelo de verdad).
+    resultados = await asyncio.gather(*(parsear_recordatorio_async(linea, user_timezone=user_tz) for linea in lineas))
+    validos, fallidos = [], []
+    for numero, (linea, (texto, fecha, regla, error)) in enumerate(zip(lineas, resultados), start=1):
+        if error or not texto:
+            fallidos.append(f"  {numero}. {linea}")
+        else:
+            validos.append((texto, fecha, regla))
+
+    # 2. Guardar y programar todos los válidos de una vez.
+    ids = await insertar_recordatorios(chat_id, validos, user_tz)
+    await programar_avisos_bulk([(rid, fecha) for (rid, _), (_, fecha, _) in zip(ids, validos)])
+
+    # 3. Un único resumen (en texto plano: las líneas que fallan traen '*' y romperían el Markdown).
+    resumen = []
+    if validos:
+        resumen.append(get_text("recordar_lote_guardados", n=len(validos)))
+        for (_, user_id), (texto, fecha, regla) in zip(ids, validos):
+            fecha_local = convertir_utc_a_local(fecha, user_tz)
+            fecha_str = fecha_local.strftime("%d %b, %H:%M") if fecha_local else "Sin fecha"
+            if regla:
+                fecha_str += f", y luego {describir(regla)}"
+            resumen.append(f"  #{user_id} - {texto} ({fecha_str})")
+    if fallidos:
+        resumen.append(("\n" if validos else "") + get_text("recordar_lote_errores"))
+        resumen.extend(fallidos)
+    for mensaje in _partir_mensaje(resumen):
+        await update.message.reply_text(mensaje)
+
+    context.user_data.clear()
+    return ConversationHandler.END
+
+
 async def recibir_aviso_previo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
     Segundo paso: recibe el tiempo de aviso, lo valida, lo guarda y programa los jobs.
@@ -113,6 +180,9 @@ async def recibir_aviso_previo(update: Update, context: ContextTypes.DEFAULT_TYP
     
     # Caso 1: El usuario no quiere aviso.
     if minutos == 0:
+        if info.get("recurrencia"):
+            # Un recurrente necesita su notificación principal: al dispararse es cuando pasa a la siguiente repetición.
+            await programar_avisos(update.effective_chat.id, str(info["global_id"]), info["user_id"], info["texto"], info["fecha"], 0)
         await update.message.reply_text(get_text("aviso_no_programado"))
         # El 'aviso_previo' en la DB ya es 0 por defecto, no hace falta actualizar.
         context.user_data.clear()
@@ -131,9 +201,7 @@ async def recibir_aviso_previo(update: Update, context: ContextTypes.DEFAULT_TYP
 
     if se_programo_aviso:
         # Si tiene éxito, guardamos los minutos en la DB y terminamos.
-        with get_connection() as conn:
-            # CAMBIO: Placeholder a %s
-            conn.cursor().execute("UPDATE recordatorios SET aviso_previo = %s WHERE id = %s", (minutos, info["global_id"]))
+        await actualizar_aviso_previo(info["global_id"], minutos)
             
         horas, mins = divmod(minutos, 60)
         tiempo_str = f"{horas}h" if mins == 0 else f"{horas}h {mins}m" if horas > 0 else f"{mins}m"
@@ -14,7 +14,7 @@ from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, Mess
 from timezonefinderL import TimezoneFinder
 from geopy.geocoders import Nominatim
 
-from db import get_config, set_config
+from db_async import get_config, set_config, set_config_many
 from personalidad import get_text, TEXTOS
 from utils import cancelar_conversacion, comando_inesperado, normalizar_texto
 from avisos_resumen_diario import programar_resumen_diario_usuario
@@ -46,7 +46,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     Si es un usuario nuevo, inicia el onboarding. Si no, envía un saludo.
     """
     chat_id = update.effective_chat.id
-    if get_config(chat_id, "onboarding_completo"):
+    if await get_config(chat_id, "onboarding_completo"):
         await update.message.reply_text(get_text("start"))
         return ConversationHandler.END
 
@@ -76,7 +76,7 @@ async def recibir_modo_seguro_onboarding(update: Update, context: ContextTypes.D
     chat_id = query.message.chat_id
 
     nivel_str = query.data.split(":")[1]
-    set_config(chat_id, "modo_seguro", nivel_str)
+    await set_config(chat_id, "modo_seguro", nivel_str)
 
     descripcion_nivel = TEXTOS["niveles_modo_seguro"].get(nivel_str, "Desconocido")
     await query.edit_message_text(
@@ -209,11 +209,13 @@ async def _finalizar_onboarding(update: Update, context: ContextTypes.DEFAULT_TY
     """
     chat_id = update.effective_chat.id
     
-    # 1. Guardar configuraciones en la base de datos
-    set_config(chat_id, "user_timezone", user_timezone)
-    set_config(chat_id, "onboarding_completo", "1")
-    set_config(chat_id, "resumen_diario_activado", "1") # Activado por defecto
-    set_config(chat_id, "resumen_diario_hora", "08:00") # A las 8:00 por defecto
+    # 1. Guardar configuraciones en la base de datos (en una sola sentencia)
+    await set_config_many(chat_id, {
+        "user_timezone": user_timezone,
+        "onboarding_completo": "1",
+        "resumen_diario_activado": "1", # Activado por defecto
+        "resumen_diario_hora": "08:00", # A las 8:00 por defecto
+    })
 
     # 2. Programar el primer job de resumen diario para el nuevo usuario
     programar_resumen_diario_usuario(chat_id, "08:00", user_timezone)
@@ -22,13 +22,16 @@ from telegram.ext import ApplicationBuilder, CommandHandler
 import telegram.error
 
 # --- Importaciones de Módulos Locales ---
-from config import TOKEN
-from db import crear_tablas
+from config import TOKEN, AVISOS_MODO
+from db import cerrar_pool
+from migraciones import aplicar_migraciones
 import avisos
+import avisos_resumen_diario
+import parseo_procesos
 # Se importan los módulos de handlers que contienen los objetos handler ya construidos.
 from handlers import (
     lista, recordar, cambiar_estado, borrar, ajustes,
-    help_reset, start_onboarding, editar, posponer
+    help_reset, start_onboarding, editar, posponer, metricas
 )
 
 # =============================================================================
@@ -57,13 +60,32 @@ def run_flask():
 # SECCIÓN 2: LÓGICA PRINCIPAL DEL BOT DE TELEGRAM
 # =============================================================================
 
+async def al_iniciar(app):
+    """
+    Arranca los avisos, deja un job de resumen diario por cada tramo (zona horaria, hora) con suscriptores
+    y, si está activado, calienta el pool de procesos para dateparser.
+    """
+    await avisos.iniciar_scheduler(app)
+    await avisos_resumen_diario.sincronizar_resumenes()
+    await parseo_procesos.iniciar()
+
+async def al_detener(app):
+    """Detiene los avisos (esperando a los envíos en curso) y cierra el pool de parseo."""
+    await avisos.detener_avisos(app)
+    parseo_procesos.detener()
+
 def run_telegram_bot():
     """Inicializa, configura y ejecuta el bot de Telegram de forma indefinida."""
-    # 1. Se asegura de que las tablas de la base de datos existan.
-    crear_tablas()
+    # 1. Se asegura de que el esquema de la base de datos esté al día (tablas, índices...).
+    aplicar_migraciones()
 
-    # 2. Construye la aplicación del bot, vinculando el inicio del scheduler.
-    app = ApplicationBuilder().token(TOKEN).post_init(avisos.iniciar_scheduler).build()
+    # 2. Construye la aplicación del bot, vinculando el inicio y la parada de los avisos (y del pool de parseo).
+    app = (
+        ApplicationBuilder().token(TOKEN)
+        .post_init(al_iniciar)
+        .post_shutdown(al_detener)
+        .build()
+    )
 
     # 3. Registro de Handlers (el "cerebro" del bot).
     # El orden de registro es importante para la legibilidad del código.
@@ -92,10 +114,17 @@ def run_telegram_bot():
     # --- Handlers de Configuración y Administración ---
     app.add_handler(ajustes.ajustes_handler)           # /ajustes
     app.add_handler(help_reset.reset_handler)          # /reset (comando de admin)
+    app.add_handler(CommandHandler("metricas", metricas.metricas_cmd))  # /metricas (comando de admin)
 
     # 4. Inicio del bot.
-    print("⏳ Esperando 10 segundos para asegurar que la instancia antigua se ha detenido...")
-    time.sleep(10)
+    # En modo 'jobs' dos instancias que compartan el jobstore dispararían los avisos dos veces, así que
+    # damos tiempo a que la anterior se detenga. En modo 'dispatcher' cada aviso se reclama en la DB, y
+    # los jobs que sí quedan en el jobstore compartido tampoco duplican nada: el resumen de cada tramo y
+    # día se reclama en 'resumenes_tramo', y el latido y la purga dan igual si se ejecutan dos veces.
+    # Así varias instancias pueden convivir sin duplicados (p. ej., durante un despliegue).
+    if AVISOS_MODO != "dispatcher":
+        print("⏳ Esperando 10 segundos para asegurar que la instancia antigua se ha detenido...")
+        time.sleep(10)
     print("🤖 La Recordadora (bot de Telegram) está en marcha...")
     
     # Ejecutamos el bot. La librería ya maneja el Ctrl+C internamente de forma limpia.
@@ -137,4 +166,7 @@ if __name__ == "__main__":
             print("🛑 El bot se detendrá. Revisa el error para solucionarlo.")
             break # Salimos del bucle y terminamos el programa.
 
+    # Cerramos las conexiones que queden abiertas en el pool de la base de datos.
+    cerrar_pool()
+
     print("\n~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~\nPrograma finalizado, ¡Hasta otra! 🙋")
\ No newline at end of file
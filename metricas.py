@@ -0,0 +1,105 @@
+# metricas.py
+"""
+Módulo de Métricas en Memoria.
+
+Guarda, dentro del propio proceso, histogramas de tiempos y contadores con nombre
+(por ejemplo, 'sql.lista.pagina' o 'sql.lenta'). No depende de ningún servicio
+externo: el propietario del bot las consulta con /metricas.
+
+Cada histograma conserva como mucho TAMANO_MUESTRA observaciones elegidas al azar
+(muestreo de reservorio), así que la memoria no crece con el tiempo aunque los
+percentiles sigan siendo representativos de todo el histórico.
+"""
+
+import random
+import threading
+from typing import Optional
+
+TAMANO_MUESTRA = 1024
+
+
+class Histograma:
+    """Histograma acotado: nº de observaciones, suma, máximo y una muestra de reservorio para los percentiles."""
+
+    def __init__(self):
+        self.total = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+        self._muestra: list[float] = []
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float):
+        with self._lock:
+            self.total += 1
+            self.suma += valor
+            self.maximo = max(self.maximo, valor)
+            if len(self._muestra) < TAMANO_MUESTRA:
+                self._muestra.append(valor)
+            else:
+                # Algoritmo R: cada observación tiene la misma probabilidad de quedarse en la muestra.
+                indice = random.randrange(self.total)
+                if indice < TAMANO_MUESTRA:
+                    self._muestra[indice] = valor
+
+    def percentiles(self, *ps: float) -> list[float]:
+        """Devuelve los percentiles pedidos (0-100) por el método del rango más cercano."""
+        with self._lock:
+            ordenados = sorted(self._muestra)
+        if not ordenados:
+            return [0.0 for _ in ps]
+        return [ordenados[max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados)) - 1))] for p in ps]
+
+
+_histogramas: dict[str, Histograma] = {}
+_contadores: dict[str, int] = {}
+_lock = threading.Lock()
+
+
+# =============================================================================
+# REGISTRO DE MÉTRICAS
+# =============================================================================
+
+def observar(nombre: str, valor: float):
+    """Añade una observación (normalmente milisegundos) al histograma 'nombre'."""
+    histograma = _histogramas.get(nombre)
+    if histograma is None:
+        with _lock:
+            histograma = _histogramas.setdefault(nombre, Histograma())
+    histograma.observar(valor)
+
+def incrementar(nombre: str, cantidad: int = 1):
+    """Suma 'cantidad' al contador 'nombre'."""
+    with _lock:
+        _contadores[nombre] = _contadores.get(nombre, 0) + cantidad
+
+
+# =============================================================================
+# CONSULTA DE MÉTRICAS
+# =============================================================================
+
+def resumen_histogramas(prefijo: str = "", top_n: Optional[int] = None) -> list[tuple[str, int, float, float, float, float]]:
+    """
+    Resume los histogramas cuyo nombre empieza por 'prefijo', de más lento a más rápido según su p95.
+
+    Returns:
+        list: Tuplas (nombre sin prefijo, nº de observaciones, p50, p95, p99, máximo).
+    """
+    with _lock:
+        seleccion = [(nombre, h) for nombre, h in _histogramas.items() if nombre.startswith(prefijo)]
+    filas = []
+    for nombre, histograma in seleccion:
+        p50, p95, p99 = histograma.percentiles(50, 95, 99)
+        filas.append((nombre[len(prefijo):], histograma.total, p50, p95, p99, histograma.maximo))
+    filas.sort(key=lambda fila: fila[3], reverse=True)
+    return filas[:top_n] if top_n else filas
+
+def contadores(prefijo: str = "") -> dict[str, int]:
+    """Devuelve una copia de los contadores cuyo nombre empieza por 'prefijo'."""
+    with _lock:
+        return {nombre: valor for nombre, valor in sorted(_contadores.items()) if nombre.startswith(prefijo)}
+
+def reiniciar():
+    """Olvida todas las métricas acumuladas."""
+    with _lock:
+        _histogramas.clear()
+        _contadores.clear()
@@ -0,0 +1,275 @@
+# migraciones.py
+"""
+Módulo de Migraciones del Esquema de la Base de Datos.
+
+Sustituye al antiguo `crear_tablas()`. Cada cambio de esquema es una migración
+numerada que se aplica UNA sola vez y queda registrada en la tabla
+'schema_migraciones'. Al arrancar, el bot aplica en orden las que falten.
+
+Reglas para añadir una migración:
+- Se añade al final de MIGRACIONES con el siguiente número de versión.
+- Nunca se modifica una migración ya publicada: si algo cambia, se crea otra nueva.
+- Cada sentencia es un texto común a todos los motores o, si difiere, un diccionario
+  {dialecto: sql} con una variante para 'postgres' y otra para 'sqlite'.
+"""
+
+from typing import Dict, List, Tuple, Union
+
+from db import get_connection, DIALECTO
+
+Sentencia = Union[str, Dict[str, str]]
+
+# Clave del 'advisory lock' de PostgreSQL: evita que dos instancias del bot migren a la vez.
+_LOCK_MIGRACIONES = 7_291_001
+
+
+# =============================================================================
+# LISTA DE MIGRACIONES
+# =============================================================================
+
+MIGRACIONES: List[Tuple[int, str, List[Sentencia]]] = [
+    (1, "Tablas iniciales 'recordatorios' y 'configuracion'", [
+        {
+            # BIGSERIAL es mejor para IDs que pueden crecer mucho.
+            "postgres": """
+            CREATE TABLE IF NOT EXISTS recordatorios (
+                id BIGSERIAL PRIMARY KEY,                  -- ID único global
+                user_id INTEGER NOT NULL,
+                chat_id BIGINT NOT NULL,                   -- Usar BIGINT para chat_id por si acaso
+                texto TEXT,
+                fecha_hora TIMESTAMPTZ,                    -- TIMESTAMPTZ es el tipo ideal para UTC en Postgres
+                estado INTEGER DEFAULT 0,
+                aviso_previo INTEGER,
+                timezone TEXT
+            )
+            """,
+            # En SQLite el autoincremento es 'INTEGER PRIMARY KEY AUTOINCREMENT' (los IDs borrados no se reutilizan).
+            "sqlite": """
+            CREATE TABLE IF NOT EXISTS recordatorios (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                chat_id BIGINT NOT NULL,
+                texto TEXT,
+                fecha_hora TIMESTAMPTZ,                    -- Texto UTC de ancho fijo (ver db_backends.py)
+                estado INTEGER DEFAULT 0,
+                aviso_previo INTEGER,
+                timezone TEXT
+            )
+            """,
+        },
+        """
+        CREATE TABLE IF NOT EXISTS configuracion (
+            chat_id BIGINT NOT NULL,
+            clave TEXT NOT NULL,
+            valor TEXT,
+            PRIMARY KEY (chat_id, clave)
+        )
+        """,
+    ]),
+
+    (2, "Índices para las consultas de listas, filtros y avisos", [
+        # Vistas 'futuro' y 'pasado' (rango por fecha) y paginación por (fecha_hora, id).
+        "CREATE INDEX IF NOT EXISTS idx_recordatorios_chat_fecha ON recordatorios (chat_id, fecha_hora, id)",
+        # Vistas 'hechos', 'pendientes' y 'hoy' (filtran además por estado), y los borrados masivos de hechos.
+        "CREATE INDEX IF NOT EXISTS idx_recordatorios_chat_estado_fecha ON recordatorios (chat_id, estado, fecha_hora, id)",
+        # Solo los pendientes, por fecha: lo que hay que avisar próximamente (índice parcial, muy pequeño).
+        "CREATE INDEX IF NOT EXISTS idx_recordatorios_pendientes_fecha ON recordatorios (fecha_hora) WHERE estado = 0",
+    ]),
+
+    (3, "ID corto (#) único por chat", [
+        # Antes de crear la restricción, renumeramos los duplicados que pudieran existir
+        # (dos altas simultáneas en el mismo chat podían recibir el mismo MAX(user_id) + 1).
+        """
+        WITH duplicados AS (
+            SELECT id, chat_id, ROW_NUMBER() OVER (PARTITION BY chat_id ORDER BY id) AS n
+            FROM recordatorios
+            WHERE id NOT IN (SELECT MIN(id) FROM recordatorios GROUP BY chat_id, user_id)
+        ),
+        maximos AS (
+            SELECT chat_id, MAX(user_id) AS max_user_id FROM recordatorios GROUP BY chat_id
+        )
+        UPDATE recordatorios AS r
+        SET user_id = m.max_user_id + d.n
+        FROM duplicados AS d JOIN maximos AS m ON m.chat_id = d.chat_id
+        WHERE r.id = d.id
+        """,
+        # Además de garantizar la unicidad, sirve las búsquedas por (chat_id, user_id) de /borrar, /editar y /cambiar.
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_recordatorios_chat_user ON recordatorios (chat_id, user_id)",
+    ]),
+
+    (4, "Contador de IDs cortos por chat (sustituye a MAX(user_id) + 1)", [
+        """
+        CREATE TABLE IF NOT EXISTS secuencias_chat (
+            chat_id BIGINT PRIMARY KEY,
+            ultimo_user_id INTEGER NOT NULL
+        )
+        """,
+        # Relleno inicial: cada chat continúa a partir del mayor ID corto que ya tenga.
+        """
+        INSERT INTO secuencias_chat (chat_id, ultimo_user_id)
+        SELECT chat_id, MAX(user_id) FROM recordatorios GROUP BY chat_id
+        """,
+    ]),
+
+    (5, "Próxima notificación de cada recordatorio ('aviso_en') para el despachador", [
+        "ALTER TABLE recordatorios ADD COLUMN aviso_en TIMESTAMPTZ",
+        # Relleno inicial: los recordatorios pendientes y futuros que tienen aviso programado.
+        {
+            "postgres": """
+            UPDATE recordatorios
+            SET aviso_en = CASE
+                WHEN fecha_hora - aviso_previo * interval '1 minute' > now() THEN fecha_hora - aviso_previo * interval '1 minute'
+                ELSE fecha_hora
+            END
+            WHERE estado = 0 AND aviso_previo > 0 AND fecha_hora > now()
+            """,
+            # Mismo formato de texto que db_backends.py: se restan minutos enteros y se conserva el sufijo '.ffffff+00:00'.
+            "sqlite": """
+            UPDATE recordatorios
+            SET aviso_en = CASE
+                WHEN datetime(fecha_hora, '-' || aviso_previo || ' minutes') > datetime('now')
+                THEN datetime(fecha_hora, '-' || aviso_previo || ' minutes') || substr(fecha_hora, 20)
+                ELSE fecha_hora
+            END
+            WHERE estado = 0 AND aviso_previo > 0 AND fecha_hora > datetime('now')
+            """,
+        },
+        # Lo que el despachador lee en cada recarga: las próximas notificaciones pendientes (índice parcial).
+        "CREATE INDEX IF NOT EXISTS idx_recordatorios_aviso_en ON recordatorios (aviso_en) WHERE estado = 0 AND aviso_en IS NOT NULL",
+    ]),
+
+    (6, "Tabla 'entregas': reclamación con plazo de cada notificación entre instancias", [
+        # Una fila por notificación (recordatorio + hora a la que vence). La instancia que la reclama
+        # la tiene en exclusiva hasta 'reclamada_hasta'; 'enviado_en' marca que ya se entregó.
+        """
+        CREATE TABLE IF NOT EXISTS entregas (
+            recordatorio_id BIGINT NOT NULL,
+            aviso_en TIMESTAMPTZ NOT NULL,
+            instancia TEXT NOT NULL,
+            reclamada_hasta TIMESTAMPTZ NOT NULL,
+            enviado_en TIMESTAMPTZ,
+            PRIMARY KEY (recordatorio_id, aviso_en)
+        )
+        """,
+        # Para la purga periódica de las entregas antiguas.
+        "CREATE INDEX IF NOT EXISTS idx_entregas_aviso_en ON entregas (aviso_en)",
+    ]),
+
+    (7, "Índice para encontrar a los suscritos al resumen diario sin recorrer 'configuracion'", [
+        # Sirve a los jobs por tramo del resumen: "clave = 'resumen_diario_activado' AND valor = '1'" -> chat_id.
+        "CREATE INDEX IF NOT EXISTS idx_configuracion_clave_valor ON configuracion (clave, valor, chat_id)",
+    ]),
+
+    (8, "Tabla 'estado_bot': último latido, para recuperar los avisos perdidos al arrancar", [
+        """
+        CREATE TABLE IF NOT EXISTS estado_bot (
+            clave TEXT PRIMARY KEY,
+            instante TIMESTAMPTZ NOT NULL
+        )
+        """,
+    ]),
+
+    (9, "Regla de repetición de los recordatorios recurrentes ('recurrencia')", [
+        # NULL = recordatorio de una sola vez. Formato de la regla en recurrencia.py.
+        "ALTER TABLE recordatorios ADD COLUMN recurrencia TEXT",
+    ]),
+
+    (10, "Tabla 'resumenes_tramo': reclamación con plazo del resumen diario de cada tramo entre instancias", [
+        # Como 'entregas', pero una fila por tramo ('resumen_tramo_<zona>_<HHMM>') y día local ('AAAA-MM-DD'):
+        # con varias instancias, cada una dispara el job del tramo y solo la que lo reclama envía los resúmenes.
+        """
+        CREATE TABLE IF NOT EXISTS resumenes_tramo (
+            tramo TEXT NOT NULL,
+            dia TEXT NOT NULL,
+            instancia TEXT NOT NULL,
+            reclamada_hasta TIMESTAMPTZ NOT NULL,
+            enviado_en TIMESTAMPTZ,
+            PRIMARY KEY (tramo, dia)
+        )
+        """,
+    ]),
+
+    (11, "Relleno de 'aviso_en' de los recordatorios pendientes sin aviso previo (la 5 se los saltaba)", [
+        # La migración 5 solo rellenó los que tenían 'aviso_previo' > 0, pero 0 es lo normal (por defecto, o
+        # tras enviarse el aviso previo, posponer, editar...). Sin 'aviso_en' el despachador no los ve.
+        {
+            "postgres": """
+            UPDATE recordatorios
+            SET aviso_en = CASE
+                WHEN fecha_hora - aviso_previo * interval '1 minute' > now() THEN fecha_hora - aviso_previo * interval '1 minute'
+                ELSE fecha_hora
+            END
+            WHERE estado = 0 AND fecha_hora > now() AND aviso_en IS NULL
+            """,
+            # Mismo formato de texto que db_backends.py (como en la migración 5).
+            "sqlite": """
+            UPDATE recordatorios
+            SET aviso_en = CASE
+                WHEN datetime(fecha_hora, '-' || aviso_previo || ' minutes') > datetime('now')
+                THEN datetime(fecha_hora, '-' || aviso_previo || ' minutes') || substr(fecha_hora, 20)
+                ELSE fecha_hora
+            END
+            WHERE estado = 0 AND fecha_hora > datetime('now') AND aviso_en IS NULL
+            """,
+        },
+    ]),
+]
+
+
+# =============================================================================
+# EJECUCIÓN DE LAS MIGRACIONES
+# =============================================================================
+
+def _sql_para(sentencia: Sentencia, dialecto: str) -> str:
+    """Devuelve el texto de una sentencia en el dialecto del motor."""
+    return sentencia if isinstance(sentencia, str) else sentencia[dialecto]
+
+def aplicar_migraciones_en(conn, dialecto: str = "postgres") -> List[int]:
+    """
+    Aplica sobre una conexión concreta las migraciones pendientes, cada una en su propia transacción.
+
+    Returns:
+        list: Versiones aplicadas en esta llamada.
+    """
+    ahora_sql = "now()" if dialecto == "postgres" else "CURRENT_TIMESTAMP"
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS schema_migraciones (
+                version INTEGER PRIMARY KEY,
+                descripcion TEXT NOT NULL,
+                aplicada_en TIMESTAMPTZ NOT NULL DEFAULT {ahora_sql}
+            )
+        """)
+    conn.commit()
+
+    aplicadas = []
+    for version, descripcion, sentencias in MIGRACIONES:
+        with conn.cursor() as cursor:
+            if dialecto == "postgres":
+                # El lock dura hasta el final de la transacción: si otra instancia está migrando, esperamos.
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (_LOCK_MIGRACIONES,))
+            else:
+                # Varios procesos pueden compartir el fichero (ver benchmarks/dos_instancias.py), y sqlite3 no
+                # abre transacción con un SELECT: los dos pasarían la comprobación. BEGIN IMMEDIATE toma ya el
+                # lock de escritura hasta el commit; el otro proceso espera (busy_timeout) y luego ve la versión.
+                cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT 1 FROM schema_migraciones WHERE version = %s", (version,))
+            if cursor.fetchone():
+                conn.commit()
+                continue
+
+            for sentencia in sentencias:
+                cursor.execute(_sql_para(sentencia, dialecto))
+            cursor.execute(
+                "INSERT INTO schema_migraciones (version, descripcion) VALUES (%s, %s)", (version, descripcion)
+            )
+        conn.commit()
+        aplicadas.append(version)
+        print(f"🧱 Migración {version} aplicada: {descripcion}")
+
+    return aplicadas
+
+def aplicar_migraciones() -> List[int]:
+    """Punto de entrada al arrancar el bot: deja el esquema de la base de datos al día."""
+    with get_connection() as conn:
+        return aplicar_migraciones_en(conn, DIALECTO)
@@ -0,0 +1,89 @@
+# parseo_procesos.py
+"""
+Pool de Procesos para dateparser.
+
+El bot atiende a todos los chats, y además dispara los avisos, desde un único
+bucle de asyncio. Una llamada fría a `dateparser.search_dates` puede tardar
+bastante y, mientras tanto, nadie más avanza. Con PARSEO_PROCESOS > 0 esas
+llamadas se hacen en procesos aparte (así tampoco compiten por el GIL) y el
+bucle solo espera el resultado con `run_in_executor`.
+
+- Los procesos se arrancan y se calientan al iniciar el bot (`iniciar`): cargan
+  los datos del idioma español antes de recibir la primera fecha de verdad.
+- Cada parseo tiene un plazo (PARSEO_TIMEOUT_SEGUNDOS). Si se agota, `buscar`
+  lanza asyncio.TimeoutError y el usuario recibe un mensaje en vez de esperar.
+  El proceso sigue con esa fecha hasta terminarla; no se puede interrumpir.
+
+La vía rápida y la caché (ver utils.py) se resuelven antes, en el propio proceso
+del bot: aquí solo llega lo que de verdad necesita a dateparser.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from dateparser.search import search_dates
+
+from config import PARSEO_PROCESOS, PARSEO_TIMEOUT_SEGUNDOS
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+# =============================================================================
+# CÓDIGO QUE SE EJECUTA EN LOS PROCESOS DEL POOL
+# =============================================================================
+
+def _calentar():
+    """Inicializador de cada proceso: la primera llamada carga (y deja en memoria) los datos del español."""
+    search_dates("mañana a las 9:00", languages=['es'], settings={'PREFER_DATES_FROM': 'future'})
+
+def _buscar_fechas(texto: str, settings: dict) -> Optional[list]:
+    return search_dates(texto, languages=['es'], settings=settings)
+
+def _nada():
+    return None
+
+
+# =============================================================================
+# GESTIÓN DEL POOL (PROCESO PRINCIPAL)
+# =============================================================================
+
+async def iniciar():
+    """Arranca los procesos (si PARSEO_PROCESOS > 0) y espera a que estén calientes."""
+    global _pool
+    if PARSEO_PROCESOS <= 0 or _pool is not None:
+        return
+    # 'spawn' en vez de 'fork': el bot ya tiene hilos en marcha (Flask, scheduler) y copiarlos a medias es peligroso.
+    _pool = ProcessPoolExecutor(
+        max_workers=PARSEO_PROCESOS, mp_context=multiprocessing.get_context("spawn"), initializer=_calentar
+    )
+    # El pool crea los procesos a medida que le llegan tareas: una por proceso los arranca todos ya.
+    await asyncio.gather(*(asyncio.wrap_future(_pool.submit(_nada)) for _ in range(PARSEO_PROCESOS)))
+    print(f"🧮 Pool de parseo de fechas listo: {PARSEO_PROCESOS} proceso(s).")
+
+def detener():
+    """Cierra los procesos del pool sin esperar a los parseos que aún estén en marcha."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+async def buscar(texto: str, settings: dict) -> Optional[list]:
+    """
+    `search_dates` en un proceso del pool (o en el propio bucle si el pool no está activo).
+
+    Raises:
+        asyncio.TimeoutError: Si el parseo tarda más de PARSEO_TIMEOUT_SEGUNDOS.
+    """
+    if _pool is None:
+        return _buscar_fechas(texto, settings)
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(_pool, _buscar_fechas, texto, settings), PARSEO_TIMEOUT_SEGUNDOS)
+    except BrokenProcessPool:
+        # Algún proceso ha muerto (p. ej., sin memoria): se sigue en el propio bucle hasta el próximo arranque.
+        print("🚨 El pool de parseo de fechas se ha roto. Se parsea en el proceso principal.")
+        detener()
+        return _buscar_fechas(texto, settings)
@@ -0,0 +1,112 @@
+# parseo_rapido.py
+"""
+Vía Rápida para el Parseo de Fechas.
+
+`dateparser.search_dates` es lo más caro que hace el bot (decenas de ms por
+llamada, en el bucle de eventos), pero casi todo lo que escriben los usuarios
+en /recordar y /editar tiene una de unas pocas formas:
+
+- "hoy 18:30", "mañana a las 15:00", "mañana"
+- "el lunes a las 9:00", "viernes"
+- "25/12 a las 10:00", "el 31/12/2026"
+- "en 2 horas", "en 30 minutos", "en una semana"
+
+Este módulo las reconoce con expresiones regulares compiladas y devuelve
+exactamente lo mismo que devolvería dateparser con los ajustes de
+`utils.parsear_recordatorio` (RELATIVE_BASE, zona del usuario y
+PREFER_DATES_FROM='future'), incluidas sus rarezas:
+
+- "hoy"/"mañana" conservan el desfase UTC de la fecha base (aunque entre medias cambie el horario de verano).
+- El "el" de delante no forma parte del texto de la fecha ("el lunes" -> "lunes").
+- Un "dd/mm" sin año pasa al año siguiente si, en hora local, no es posterior a la base expresada en UTC.
+
+Solo se aceptan entradas que encajan enteras con una forma conocida; con
+cualquier otra cosa se devuelve None y hay que preguntar a dateparser.
+benchmarks/parseo_equivalencia.py comprueba que las dos vías coinciden.
+"""
+
+import re
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+import pytz
+
+_DIAS_SEMANA = {
+    "lunes": 0, "martes": 1, "miercoles": 2, "miércoles": 2, "jueves": 3,
+    "viernes": 4, "sabado": 5, "sábado": 5, "domingo": 6,
+}
+_UNIDADES = {"minuto": "minutes", "hora": "hours", "dia": "days", "día": "days", "semana": "weeks"}
+
+_HORA = r"(?: (?:a las )?(?P<hora>[01]?\d|2[0-3]):(?P<minuto>[0-5]\d))?"
+
+_RE_DIA_RELATIVO = re.compile(rf"(?P<dia>hoy|ma[ñn]ana){_HORA}", re.IGNORECASE)
+_RE_DIA_SEMANA = re.compile(rf"(?:el )?(?P<fecha>(?P<semana>lunes|martes|mi[eé]rcoles|jueves|viernes|s[aá]bado|domingo){_HORA})", re.IGNORECASE)
+_RE_DIA_MES = re.compile(rf"(?:el )?(?P<fecha>(?P<d>\d{{1,2}})/(?P<m>\d{{1,2}})(?:/(?P<anio>\d{{4}}))?{_HORA})", re.IGNORECASE)
+_RE_DENTRO_DE = re.compile(r"en (?P<n>\d{1,4}|una?) (?P<unidad>minuto|hora|d[ií]a|semana)s?", re.IGNORECASE)
+
+
+def _hora(encontrado: re.Match) -> Optional[Tuple[int, int]]:
+    if encontrado.group("hora") is None:
+        return None
+    return int(encontrado.group("hora")), int(encontrado.group("minuto"))
+
+def _dia_relativo(encontrado: re.Match, base: datetime) -> datetime:
+    fecha = base + timedelta(days=0 if encontrado.group("dia").lower() == "hoy" else 1)
+    hora = _hora(encontrado)
+    return fecha.replace(hour=hora[0], minute=hora[1], second=0, microsecond=0) if hora else fecha
+
+def _dia_semana(encontrado: re.Match, tz, base: datetime) -> datetime:
+    # Con PREFER_DATES_FROM='future' el mismo día de la semana que hoy es el de la semana que viene.
+    dias = (_DIAS_SEMANA[encontrado.group("semana").lower()] - base.weekday()) % 7 or 7
+    hora = _hora(encontrado) or (0, 0)
+    dia = base.date() + timedelta(days=dias)
+    return tz.localize(datetime(dia.year, dia.month, dia.day, *hora))
+
+def _dia_mes(encontrado: re.Match, tz, base: datetime) -> Optional[datetime]:
+    dia, mes = int(encontrado.group("d")), int(encontrado.group("m"))
+    if dia <= 12 and dia != mes:
+        return None  # "1/3" es ambiguo y dateparser lo lee como mes/día: que decida él.
+    hora = _hora(encontrado) or (0, 0)
+    try:
+        if encontrado.group("anio"):
+            return tz.localize(datetime(int(encontrado.group("anio")), mes, dia, *hora))
+        fecha = datetime(base.year, mes, dia, *hora)
+        if fecha <= base.astimezone(pytz.utc).replace(tzinfo=None):
+            fecha = fecha.replace(year=base.year + 1)
+    except ValueError:
+        return None  # 31/02, o un 29/02 que cae en un año no bisiesto.
+    return tz.localize(fecha)
+
+def _dentro_de(encontrado: re.Match, base: datetime) -> datetime:
+    numero = encontrado.group("n").lower()
+    cantidad = 1 if numero in ("un", "una") else int(numero)
+    return base + timedelta(**{_UNIDADES[encontrado.group("unidad").lower()]: cantidad})
+
+
+def buscar_fecha(texto: str, tz, base: datetime) -> Optional[Tuple[str, datetime]]:
+    """
+    Reconoce las formas de fecha más habituales sin pasar por dateparser.
+
+    Args:
+        texto: La parte de la fecha, ya pasada por `normalizar_hora` (ej: "el lunes a las 9:00").
+        tz: Zona horaria del usuario (pytz).
+        base: La RELATIVE_BASE, 'aware' en la zona del usuario.
+
+    Returns:
+        tuple: (texto de la fecha, fecha 'aware'), como el primer resultado de `search_dates`,
+               o None si el texto no tiene una forma conocida.
+    """
+    encontrado = _RE_DIA_RELATIVO.fullmatch(texto)
+    if encontrado:
+        return texto, _dia_relativo(encontrado, base)
+    encontrado = _RE_DENTRO_DE.fullmatch(texto)
+    if encontrado:
+        return texto, _dentro_de(encontrado, base)
+    encontrado = _RE_DIA_SEMANA.fullmatch(texto)
+    if encontrado:
+        return encontrado.group("fecha"), _dia_semana(encontrado, tz, base)
+    encontrado = _RE_DIA_MES.fullmatch(texto)
+    if encontrado:
+        fecha = _dia_mes(encontrado, tz, base)
+        return (encontrado.group("fecha"), fecha) if fecha else None
+    return None
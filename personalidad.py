@@ -33,7 +33,10 @@ TEXTOS: Dict[str, List[str]] = {
         "➕ *AÑADIR RECORDATORIOS*\n"
         "Usa el comando /recordar con el formato `fecha * texto`. Por ejemplo:\n"
         "`/recordar mañana a las 15:00 * Comprar ingredientes para la poción multijugos`\n"
-        "Después, siempre te preguntaré si quieres un **aviso previo**.\n\n"
+        "Si se repite, dímelo y te lo recordaré siempre: `/recordar cada lunes a las 9 * Clase de Pociones`\n"
+        "Después, siempre te preguntaré si quieres un **aviso previo**.\n"
+        "¿Tienes una lista? Pégala entera en el mismo mensaje, un recordatorio por línea, y los apunto todos de golpe. "
+        "A esos no te pregunto por el aviso previo: te aviso a la hora de cada uno.\n\n"
 
         "📜 *GESTIONAR TUS LISTAS*\n"
         "El comando /lista abre tu centro de mandos interactivo. Desde ahí, podrás:\n"
@@ -94,7 +97,8 @@ TEXTOS: Dict[str, List[str]] = {
         "❌ /cancelar – Para que dejes de hacer lo que estabas haciendo."
     ],
     "ayuda_admin": [
-        "\n\n⚠️ /reset – ¡Ni se te ocurra tocar esto si no sabes lo que haces!",
+        "\n\n⚠️ /reset – ¡Ni se te ocurra tocar esto si no sabes lo que haces!"
+        "\n📊 /metricas – Las consultas más lentas y los contadores del bot.",
     ],
     "lista_vacia": [
         "📭 ¿No tienes nada pendiente? ¡Increíble! Debes haber usado un giratiempo. O eso, o no estás haciendo suficientes cosas importantes. ¡No te acomodes!",
@@ -114,7 +118,19 @@ TEXTOS: Dict[str, List[str]] = {
         "📝 ¡Apuntado! *#{id} - {texto} ({fecha})*. Más te vale que lo hagas, criatura.",
         "📝 De acuerdo. *#{id} - {texto} ({fecha})*. A ver si esta vez no se te pasa.",
     ],
-    
+    "recordar_lote_guardados": [
+        "📝 ¡Toma lista! Te he apuntado {n} recordatorio(s) de golpe. Ojo: a diferencia de cuando me das uno suelto, "
+        "a estos te aviso a su hora sin preguntarte nada, y sin aviso previo, que no tengo todo el día:",
+        "📝 {n} recordatorio(s) apuntado(s) de una tacada. Ojo: a diferencia de uno suelto, te aviso a la hora de cada uno "
+        "aunque no me pidas aviso previo. Si quieres alguno, ya me lo dirás con /editar:",
+    ],
+    "recordar_lote_errores": [
+        "⚠️ Y estas líneas no hay quien las entienda (recuerda: fecha * texto):",
+    ],
+    "recordar_lote_demasiado_largo": [
+        "👵 ¡Criatura, que esto no es la lista de la compra de Hogwarts! Como mucho {max} líneas por mensaje.",
+    ],
+
     # -------------------------------------------------------------------------
     # --- Flujo 4: Edición de Recordatorios (/editar)
     # -------------------------------------------------------------------------
@@ -179,6 +195,10 @@ TEXTOS: Dict[str, List[str]] = {
         "👵⏰ ¡Es la hora de tu deber! Tienes que: *{texto}*",
         "👵⏰ ¡Espabila! Ya es la hora de: *{texto}*. Luego no digas que no te avisé.",
     ],
+    "avisos_agrupados": [
+        "👵⏰ ¡Todo a la vez, criatura! Ya es la hora de estas {n} cosas:",
+        "👵⏰ ¡Espabila, que se te juntan! Te tocan {n} tareas ahora mismo:",
+    ],
     "aviso_previo": [
         "👵⚠️ ¡Atención! Dentro de {tiempo} tienes que hacer esto: *{texto}*. ¡Prepárate!",
         "👵⚠️ Que no se te olvide, en {tiempo} te toca: *{texto}*. ¡Ve acabando lo que sea que estés haciendo!",
@@ -187,6 +207,10 @@ TEXTOS: Dict[str, List[str]] = {
         "👵 ¡Buenos días, criatura! Más te vale no holgazanear, que para hoy tienes estas tareas:",
         "👵 ¡Arriba, gandul! El sol ya ha salido y estas son tus obligaciones para hoy:",
     ],
+    "avisos_mientras_fuera": [
+        "👵💤 ¡Ay, criatura! Me he echado una cabezadita y se me han pasado estos avisos:",
+        "👵💤 Mientras estaba fuera se me quedaron estos avisos en el tintero. ¡Que no se te escapen!",
+    ],
     
     # -------------------------------------------------------------------------
     # --- Flujo 7: Operaciones y Confirmaciones
@@ -201,6 +225,7 @@ TEXTOS: Dict[str, List[str]] = {
     # --- Flujo 8: Errores y Casos Límite
     # -------------------------------------------------------------------------
     "error_formato": ["❗ ¡Así no, criatura! El formato es `fecha` `*` `texto`. ¡Concéntrate!"],
+    "error_parseo_lento": ["⏳ ¡Ay, criatura, que esa fecha se me atraganta! Dímela de otra forma más sencilla, anda."],
     "error_no_id": ["⚠️ ¡Desastre! No he encontrado ningún recordatorio tuyo con esos números."],
     "error_aviso_invalido": ["⚠️ ¿Qué formato de tiempo es ese? Usa algo que entienda, como `2h`, `1d` o `30m`."],
     "error_nivel_invalido": ["⚠️ ¡Ese número no vale, criatura! Elige uno del 0 al 3."],
@@ -226,6 +251,8 @@ TEXTOS: Dict[str, List[str]] = {
     "reset_confirmado": ["🪄✨ ¡Hmph! Hecho. Todo borrado. Espero que sepas lo que has hecho."],
     "reset_cancelado": ["❌ ¡Uff! Operación cancelada. Por un momento pensé que habías perdido la cabeza."],
     "reset_denegado": ["⛔ ¡Quieto ahí! Este es un comando de la abuela. ¡Tú no puedes usarlo!"],
+    "metricas_denegado": ["⛔ Las cuentas de la casa solo las lleva la abuela. ¡Fuera de aquí!"],
+    "metricas_vacias": ["📊 Todavía no hay nada que medir. Dale un rato al bot y vuelve a preguntar."],
 
     # -------------------------------------------------------------------------
     # --- Flujo 10: Cancelación Genérica
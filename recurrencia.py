@@ -0,0 +1,159 @@
+# recurrencia.py
+"""
+Reglas de Recurrencia de los Recordatorios.
+
+Un recordatorio recurrente es UNA sola fila: 'fecha_hora' es su próxima
+ocurrencia y la columna 'recurrencia' guarda una regla compacta que dice cómo
+se repite. La hora del día no forma parte de la regla: es la hora local de
+'fecha_hora' en la zona horaria del recordatorio, y se mantiene aunque cambie
+el horario de verano.
+
+Formato de las reglas:
+- 'D'        Cada día.
+- 'S:0,3'    Cada semana, los días indicados (0 = lunes ... 6 = domingo).
+- 'M:15'     Cada mes, el día indicado (en los meses más cortos, el último día).
+
+Solo se programa la próxima ocurrencia; la siguiente se calcula al dispararse
+(`siguiente_ocurrencia`). Las que vienen después se generan bajo demanda, sin
+guardarlas en ningún sitio (`ocurrencias`), p. ej. para enseñarlas en /lista.
+"""
+
+import calendar
+import re
+from datetime import date, datetime, timedelta
+from typing import Iterator, Optional, Tuple
+
+import pytz
+
+# Nombres de los días tal y como se escriben (con o sin tilde, en singular o plural) y su número.
+_DIAS = {
+    "lunes": 0, "martes": 1, "miercoles": 2, "miércoles": 2, "jueves": 3,
+    "viernes": 4, "sabado": 5, "sábado": 5, "domingo": 6,
+}
+_NOMBRES_DIAS = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+
+_DIA = r"(?:lunes|martes|mi[eé]rcoles|jueves|viernes|s[aá]bados?|domingos?)"
+
+# Frases reconocidas, de la más específica a la más general. 'S' y 'M' sin días se concretan con la fecha.
+_PATRONES: list[tuple[re.Pattern, Optional[str]]] = [
+    (re.compile(r"\b(?:cada\s+d[ií]a\s+laborable|(?:todos\s+)?los\s+d[ií]as\s+laborables|entre\s+semana|de\s+lunes\s+a\s+viernes)\b", re.IGNORECASE), "S:0,1,2,3,4"),
+    (re.compile(r"\b(?:cada\s+fin\s+de\s+semana|(?:todos\s+)?los\s+fines\s+de\s+semana)\b", re.IGNORECASE), "S:5,6"),
+    (re.compile(rf"\b(?:cada|todos\s+los|todas\s+las)\s+{_DIA}(?:\s*(?:,|\by\b)\s*{_DIA})*", re.IGNORECASE), None),
+    (re.compile(r"\b(?:cada\s+d[ií]a|todos\s+los\s+d[ií]as|diariamente|a\s+diario)\b", re.IGNORECASE), "D"),
+    (re.compile(r"\b(?:cada\s+semana|todas\s+las\s+semanas|semanalmente)\b", re.IGNORECASE), "S"),
+    (re.compile(r"\b(?:cada\s+mes|todos\s+los\s+meses|mensualmente)\b", re.IGNORECASE), "M"),
+]
+
+
+# =============================================================================
+# PARSEO Y DESCRIPCIÓN DE REGLAS
+# =============================================================================
+
+def _numero_dia(nombre: str) -> int:
+    nombre = nombre.lower()
+    return _DIAS[nombre] if nombre in _DIAS else _DIAS[nombre[:-1]]  # 'sábados' -> 'sábado'
+
+def extraer_regla(texto: str) -> Tuple[Optional[str], str]:
+    """
+    Busca en la parte de la fecha una frase de repetición ("cada lunes", "todos los días"...).
+
+    Returns:
+        tuple: (regla o None, texto sin la frase). Las reglas 'S' y 'M' pueden quedar sin días:
+               se completan con `concretar` una vez se conoce la fecha de la primera ocurrencia.
+    """
+    for patron, regla in _PATRONES:
+        encontrado = patron.search(texto)
+        if not encontrado:
+            continue
+        if regla is None:
+            nombres = re.findall(_DIA, encontrado.group(0), re.IGNORECASE)
+            dias = sorted({_numero_dia(nombre) for nombre in nombres})
+            regla = "S:" + ",".join(map(str, dias))
+        restante = texto[:encontrado.start()] + texto[encontrado.end():]
+        return regla, re.sub(r"\s+", " ", restante).strip()
+    return None, texto
+
+def concretar(regla: str, fecha_local: datetime) -> str:
+    """Completa 'cada semana' y 'cada mes' con el día de la semana o del mes de la primera ocurrencia."""
+    if regla == "S":
+        return f"S:{fecha_local.weekday()}"
+    if regla == "M":
+        return f"M:{fecha_local.day}"
+    return regla
+
+def describir(regla: str) -> str:
+    """Texto para el usuario: 'cada día', 'cada lunes y jueves', 'de lunes a viernes', 'cada mes (día 15)'."""
+    tipo, _, valor = regla.partition(":")
+    if tipo == "D":
+        return "cada día"
+    if tipo == "M":
+        return f"cada mes (día {valor})"
+    dias = [int(d) for d in valor.split(",")]
+    if dias == [0, 1, 2, 3, 4]:
+        return "de lunes a viernes"
+    if dias == [5, 6]:
+        return "cada fin de semana"
+    nombres = [_NOMBRES_DIAS[d] for d in dias]
+    return "cada " + (nombres[0] if len(nombres) == 1 else ", ".join(nombres[:-1]) + " y " + nombres[-1])
+
+
+# =============================================================================
+# CÁLCULO DE OCURRENCIAS
+# =============================================================================
+
+def _dia_del_mes(anio: int, mes: int, dia: int) -> date:
+    return date(anio, mes, min(dia, calendar.monthrange(anio, mes)[1]))
+
+def _encaja(regla: str, dia: date) -> bool:
+    tipo, _, valor = regla.partition(":")
+    if tipo == "D":
+        return True
+    if tipo == "S":
+        return dia.weekday() in {int(d) for d in valor.split(",")}
+    return dia == _dia_del_mes(dia.year, dia.month, int(valor))
+
+def _dias(regla: str, desde: date) -> Iterator[date]:
+    """Genera (sin fin) los días a partir de 'desde', incluido, en los que toca la regla."""
+    tipo, _, valor = regla.partition(":")
+    if tipo == "M":
+        anio, mes = desde.year, desde.month
+        while True:
+            dia = _dia_del_mes(anio, mes, int(valor))
+            if dia >= desde:
+                yield dia
+            anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    dia = desde
+    while True:
+        if _encaja(regla, dia):
+            yield dia
+        dia += timedelta(days=1)
+
+def _zona(tz_str: Optional[str]):
+    try:
+        return pytz.timezone(tz_str or "UTC")
+    except pytz.UnknownTimeZoneError:
+        return pytz.utc
+
+def ocurrencias(regla: str, fecha: datetime, tz_str: Optional[str]) -> Iterator[datetime]:
+    """
+    Genera, de forma perezosa y sin fin, las ocurrencias (en UTC) posteriores a 'fecha',
+    a la misma hora local que ella en la zona 'tz_str'.
+    """
+    tz = _zona(tz_str)
+    local = fecha.astimezone(tz)
+    hora = local.time().replace(tzinfo=None)
+    for dia in _dias(regla, local.date() + timedelta(days=1)):
+        # normalize() resuelve las horas que no existen el día del cambio al horario de verano.
+        yield tz.normalize(tz.localize(datetime.combine(dia, hora))).astimezone(pytz.utc)
+
+def siguiente_ocurrencia(regla: str, fecha: datetime, tz_str: Optional[str], despues_de: Optional[datetime] = None) -> datetime:
+    """La primera ocurrencia posterior a 'fecha' y, si se indica, también a 'despues_de' (p. ej., ahora)."""
+    for ocurrencia in ocurrencias(regla, fecha, tz_str):
+        if despues_de is None or ocurrencia > despues_de:
+            return ocurrencia
+
+def primera_ocurrencia(regla: str, fecha: datetime, tz_str: Optional[str], ahora: datetime) -> datetime:
+    """Al crear el recordatorio: 'fecha' si ya encaja con la regla y es futura; si no, la siguiente que sí."""
+    if fecha > ahora and _encaja(regla, fecha.astimezone(_zona(tz_str)).date()):
+        return fecha
+    return siguiente_ocurrencia(regla, fecha, tz_str, despues_de=ahora)
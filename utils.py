@@ -10,7 +10,11 @@ múltiples handlers para realizar tareas comunes, como:
 - Funciones genéricas para la gestión de conversaciones.
 """
 
+import asyncio
 import re
+import threading
+from collections import OrderedDict
+from itertools import islice
 from math import ceil
 from datetime import datetime, timedelta
 from typing import Tuple, List, Optional
@@ -21,11 +25,26 @@ from dateparser.search import search_dates
 from telegram import Update, ReplyKeyboardRemove, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 
-from db import get_config, get_recordatorios
+import metricas
+import parseo_procesos
+import parseo_rapido
+import recurrencia
+from config import PARSEO_CACHE_MAX
+from db_async import get_config, get_recordatorios
 from personalidad import get_text
 
 # --- CONSTANTES ---
 ITEMS_PER_PAGE = 10  # Nº de recordatorios a mostrar por página en las listas interactivas.
+OCURRENCIAS_EN_LISTA = 3  # Nº de próximas repeticiones que se enseñan bajo un recordatorio recurrente.
+
+# --- Caché de los resultados de dateparser ---
+# (fragmento de fecha normalizado, zona, RELATIVE_BASE truncada al minuto) -> (texto_fecha, desfase, sigue_a_la_base, tzinfo),
+# o None si dateparser no encontró ninguna fecha. No se guarda la fecha en sí sino su desfase respecto a la base:
+# "en 2 horas" se mide desde la base exacta y "mañana a las 9" desde el minuto, así un acierto segundos
+# después da lo mismo que volver a llamar a dateparser. Es una LRU acotada (OrderedDict), como la de la configuración.
+_cache_fechas: "OrderedDict[tuple[str, str, datetime], Optional[tuple]]" = OrderedDict()
+_cache_fechas_lock = threading.Lock()
+_NO_CACHEADO = object()
 
 
 # =============================================================================
@@ -60,43 +79,125 @@ def limpiar_texto_sin_fecha(texto: str, texto_fecha: str) -> str:
         return re.sub(r'\s+', ' ', texto_limpio).strip()
     return texto
 
-def parsear_recordatorio(texto_entrada: str, user_timezone: str = 'UTC') -> Tuple[Optional[str], Optional[datetime], Optional[str]]:
+def ajustes_dateparser(user_timezone: str, relative_base: datetime) -> dict:
+    """Configuración de dateparser para que entienda el contexto del usuario."""
+    return {
+        # 'future': prefiere fechas futuras (ej: "sábado" será el próximo sábado, no el pasado).
+        'PREFER_DATES_FROM': 'future',
+        # 'TIMEZONE': le dice a dateparser en qué zona horaria está pensando el usuario.
+        'TIMEZONE': user_timezone,
+        # 'RELATIVE_BASE': la fecha de referencia para términos como "mañana" o "en 2 horas".
+        'RELATIVE_BASE': relative_base,
+        # RETURN... True: Obliga a dateparser a devolver un objeto 'aware' en la TZ del usuario.
+        'RETURN_AS_TIMEZONE_AWARE': True
+    }
+
+def _clave_cache_fechas(parte_fecha: str, settings: dict) -> tuple:
+    return parte_fecha, settings['TIMEZONE'], settings['RELATIVE_BASE'].replace(second=0, microsecond=0)
+
+def _fechas_sin_dateparser(parte_fecha: str, user_tz_obj, settings: dict):
     """
-    Parsea una cadena de texto para extraer un recordatorio y una fecha.
-    
+    Prueba la vía rápida (parseo_rapido.py) con las formas más habituales y después la caché de resultados.
+    Devuelve lo mismo que `search_dates`, o _NO_CACHEADO si hay que preguntar a dateparser.
+    """
+    encontrada = parseo_rapido.buscar_fecha(parte_fecha, user_tz_obj, settings['RELATIVE_BASE'])
+    if encontrada:
+        metricas.incrementar("parseo.rapido")
+        return [encontrada]
+    fechas = _leer_cache_fechas(_clave_cache_fechas(parte_fecha, settings), settings['RELATIVE_BASE'])
+    metricas.incrementar("parseo.cache.fallos" if fechas is _NO_CACHEADO else "parseo.cache.aciertos")
+    return fechas
+
+def _buscar_fechas(parte_fecha: str, user_tz_obj, settings: dict) -> Optional[list]:
+    """Como `search_dates`, pero solo se paga la llamada a dateparser si ni la vía rápida ni la caché lo resuelven."""
+    fechas = _fechas_sin_dateparser(parte_fecha, user_tz_obj, settings)
+    if fechas is _NO_CACHEADO:
+        metricas.incrementar("parseo.dateparser")
+        fechas = search_dates(parte_fecha, languages=['es'], settings=settings)
+        _guardar_cache_fechas(_clave_cache_fechas(parte_fecha, settings), settings['RELATIVE_BASE'], fechas)
+    return fechas
+
+async def _buscar_fechas_async(parte_fecha: str, user_tz_obj, settings: dict) -> Optional[list]:
+    """Como `_buscar_fechas`, pero dateparser se ejecuta en el pool de procesos (parseo_procesos.py) si está activo."""
+    fechas = _fechas_sin_dateparser(parte_fecha, user_tz_obj, settings)
+    if fechas is _NO_CACHEADO:
+        metricas.incrementar("parseo.dateparser")
+        fechas = await parseo_procesos.buscar(parte_fecha, settings)
+        _guardar_cache_fechas(_clave_cache_fechas(parte_fecha, settings), settings['RELATIVE_BASE'], fechas)
+    return fechas
+
+def _leer_cache_fechas(clave: tuple, base: datetime):
+    """Devuelve lo que daría `search_dates` (solo su primera fecha) a partir de la caché, o _NO_CACHEADO."""
+    with _cache_fechas_lock:
+        if clave not in _cache_fechas:
+            return _NO_CACHEADO
+        _cache_fechas.move_to_end(clave)
+        entrada = _cache_fechas[clave]
+    if entrada is None:
+        return None
+    texto_fecha, desfase, sigue_a_la_base, tzinfo = entrada
+    origen = base if sigue_a_la_base else base.replace(second=0, microsecond=0)
+    return [(texto_fecha, (origen.replace(tzinfo=None) + desfase).replace(tzinfo=tzinfo))]
+
+def _guardar_cache_fechas(clave: tuple, base: datetime, fechas: Optional[list]):
+    """Guarda el resultado de `search_dates` como desfase respecto a la base, expulsando el menos usado si hace falta."""
+    if PARSEO_CACHE_MAX <= 0:
+        return
+    entrada = None
+    if fechas:
+        texto_fecha, fecha = fechas[0]
+        if base.microsecond == 0:
+            return  # Con la base en un segundo exacto no se distingue "en 2 horas" de "a las 9": mejor no cachear.
+        # Si la fecha conserva los microsegundos de la base es relativa a ella ("en 2 horas", "mañana"); si no, al minuto.
+        sigue_a_la_base = fecha.microsecond == base.microsecond
+        origen = base if sigue_a_la_base else base.replace(second=0, microsecond=0)
+        entrada = (texto_fecha, fecha.replace(tzinfo=None) - origen.replace(tzinfo=None), sigue_a_la_base, fecha.tzinfo)
+    with _cache_fechas_lock:
+        _cache_fechas[clave] = entrada
+        _cache_fechas.move_to_end(clave)
+        while len(_cache_fechas) > PARSEO_CACHE_MAX:
+            _cache_fechas.popitem(last=False)
+
+def _quitar_hoy(fechas: Optional[list]) -> list:
+    # Tras "cada lunes" suele quedar solo la hora ("a las 9:00"), que dateparser no reconoce sin un día delante:
+    # se vuelve a buscar con "hoy " delante, y ese "hoy" no forma parte de lo que escribió el usuario.
+    return [(texto_fecha.removeprefix("hoy "), fecha) for texto_fecha, fecha in fechas or []]
+
+def _preparar_parseo(texto_entrada: str, user_timezone: str, ahora: Optional[datetime]) -> Optional[tuple]:
+    """
+    Primera mitad del parseo: separa la fecha del texto y quita la repetición.
+    'ahora' (aware; por defecto, el momento actual) es la base para "mañana", "en 2 horas"...
+
     Returns:
-        Una tupla con (texto_formateado, fecha_utc, mensaje_de_error).
-        Si tiene éxito, el mensaje de error es None.
+        tuple: (parte_fecha, parte_texto, regla, user_tz_obj, settings de dateparser), o None si falta el '*'.
     """
     if "*" not in texto_entrada:
-        return None, None, get_text("error_formato")
+        return None
         
     parte_fecha, parte_texto = texto_entrada.split("*", 1)
-    parte_fecha = normalizar_hora(parte_fecha.strip())
+    # La repetición se quita antes de llamar a dateparser: lo que queda es la hora (y fecha) de la primera vez.
+    regla, parte_fecha = recurrencia.extraer_regla(parte_fecha.strip())
+    parte_fecha = normalizar_hora(parte_fecha)
     
     try:
         user_tz_obj = pytz.timezone(user_timezone)
     except pytz.UnknownTimeZoneError:
         user_tz_obj = pytz.utc
     
-    # Configuramos dateparser para que entienda el contexto del usuario.
-    settings = {
-        # 'future': prefiere fechas futuras (ej: "sábado" será el próximo sábado, no el pasado).
-        'PREFER_DATES_FROM': 'future',
-        # 'TIMEZONE': le dice a dateparser en qué zona horaria está pensando el usuario.
-        'TIMEZONE': user_timezone,
-        # 'RELATIVE_BASE': la fecha de referencia para términos como "mañana" o "en 2 horas".
-        'RELATIVE_BASE': datetime.now(user_tz_obj),
-        # RETURN... True: Obliga a dateparser a devolver un objeto 'aware' en la TZ del usuario.
-        'RETURN_AS_TIMEZONE_AWARE': True
-    }
-    
-    fechas = search_dates(parte_fecha, languages=['es'], settings=settings)
-    
+    base = (ahora or datetime.now(pytz.utc)).astimezone(user_tz_obj)
+    return parte_fecha, parte_texto, regla, user_tz_obj, ajustes_dateparser(user_timezone, base)
+
+def _terminar_parseo(
+    fechas: Optional[list], parte_fecha: str, parte_texto: str, regla: Optional[str], user_tz_obj, ahora: datetime
+) -> Tuple[Optional[str], Optional[datetime], Optional[str], Optional[str]]:
+    """Segunda mitad del parseo: con la fecha encontrada, calcula la primera ocurrencia y limpia el texto."""
     if fechas:
         texto_fecha, fecha_procesada = fechas[0]
         fecha_aware = user_tz_obj.localize(fecha_procesada) if fecha_procesada.tzinfo is None else fecha_procesada
         fecha_utc = fecha_aware.astimezone(pytz.utc)
+        if regla:
+            regla = recurrencia.concretar(regla, fecha_aware)
+            fecha_utc = recurrencia.primera_ocurrencia(regla, fecha_utc, user_tz_obj.zone, ahora)
 
         texto_final = (limpiar_texto_sin_fecha(parte_fecha, texto_fecha) + " " + parte_texto.strip()).strip()
         
@@ -106,9 +207,53 @@ def parsear_recordatorio(texto_entrada: str, user_timezone: str = 'UTC') -> Tupl
         else:
             texto_formateado = ""
 
-        return texto_formateado, fecha_utc, None
+        return texto_formateado, fecha_utc, regla, None
     else:
-        return None, None, get_text("error_formato")
+        return None, None, None, get_text("error_formato")
+
+def parsear_recordatorio(
+    texto_entrada: str, user_timezone: str = 'UTC', ahora: Optional[datetime] = None
+) -> Tuple[Optional[str], Optional[datetime], Optional[str], Optional[str]]:
+    """
+    Parsea una cadena de texto para extraer un recordatorio, una fecha y, si se repite, su regla.
+    Con una repetición ("cada lunes a las 9", "todos los días a las 8"...) la fecha es la primera ocurrencia.
+    Las fechas relativas se calculan desde 'ahora' (aware; por defecto, el momento actual).
+    
+    Returns:
+        Una tupla con (texto_formateado, fecha_utc, regla_de_recurrencia, mensaje_de_error).
+        La regla es None si el recordatorio no se repite. Si tiene éxito, el mensaje de error es None.
+    """
+    preparado = _preparar_parseo(texto_entrada, user_timezone, ahora)
+    if preparado is None:
+        return None, None, None, get_text("error_formato")
+    parte_fecha, parte_texto, regla, user_tz_obj, settings = preparado
+
+    fechas = _buscar_fechas(parte_fecha, user_tz_obj, settings) if parte_fecha else None
+    if not fechas and regla and parte_fecha:
+        fechas = _quitar_hoy(_buscar_fechas("hoy " + parte_fecha, user_tz_obj, settings))
+    return _terminar_parseo(fechas, parte_fecha, parte_texto, regla, user_tz_obj, settings['RELATIVE_BASE'])
+
+async def parsear_recordatorio_async(
+    texto_entrada: str, user_timezone: str = 'UTC', ahora: Optional[datetime] = None
+) -> Tuple[Optional[str], Optional[datetime], Optional[str], Optional[str]]:
+    """
+    Como `parsear_recordatorio`, para los handlers: si hay pool de procesos (PARSEO_PROCESOS), dateparser
+    se ejecuta fuera del bucle de eventos. Si tarda más de PARSEO_TIMEOUT_SEGUNDOS se devuelve un error amable.
+    """
+    preparado = _preparar_parseo(texto_entrada, user_timezone, ahora)
+    if preparado is None:
+        return None, None, None, get_text("error_formato")
+    parte_fecha, parte_texto, regla, user_tz_obj, settings = preparado
+
+    try:
+        fechas = await _buscar_fechas_async(parte_fecha, user_tz_obj, settings) if parte_fecha else None
+        if not fechas and regla and parte_fecha:
+            fechas = _quitar_hoy(await _buscar_fechas_async("hoy " + parte_fecha, user_tz_obj, settings))
+    except asyncio.TimeoutError:
+        print(f"⏳ dateparser no ha terminado a tiempo con: {parte_fecha!r}")
+        metricas.incrementar("parseo.timeouts")
+        return None, None, None, get_text("error_parseo_lento")
+    return _terminar_parseo(fechas, parte_fecha, parte_texto, regla, user_tz_obj, settings['RELATIVE_BASE'])
 
 def parsear_tiempo_a_minutos(valor: str) -> Optional[int]:
     """Convierte cadenas de tiempo (ej: '2h', '1d', '30m') a minutos."""
@@ -151,7 +296,7 @@ def convertir_utc_a_local(fecha_utc: datetime, user_timezone_str: str) -> dateti
 
 def _formatear_linea_individual(chat_id: int, recordatorio: tuple, user_tz_global: str) -> str:
     """Formatea una única línea de la lista de recordatorios, incluyendo la info del aviso."""
-    _, user_id, _, texto, fecha_utc, estado, aviso_previo, timezone_recordatorio = recordatorio
+    _, user_id, _, texto, fecha_utc, estado, aviso_previo, timezone_recordatorio, regla = recordatorio
     lineas = []
     fecha_local = None
 
@@ -173,20 +318,26 @@ def _formatear_linea_individual(chat_id: int, recordatorio: tuple, user_tz_globa
     if estado == 0 and fecha_local and fecha_local > now_aware and aviso_previo and aviso_previo > 0:
         fecha_aviso_local = fecha_local - timedelta(minutes=aviso_previo)
         lineas.append(f"  └─ 🔔 Aviso a las: {fecha_aviso_local.strftime('%d %b, %H:%M')}")
+
+    if regla and estado == 0 and fecha_utc:
+        # Las siguientes repeticiones no se guardan en ningún sitio: se calculan solo para enseñarlas.
+        proximas = islice(recurrencia.ocurrencias(regla, fecha_utc, tz_para_mostrar), OCURRENCIAS_EN_LISTA)
+        fechas_str = ", ".join(convertir_utc_a_local(f, tz_para_mostrar).strftime("%d %b") for f in proximas)
+        lineas.append(f"  └─ 🔁 {recurrencia.describir(regla).capitalize()} · luego: {fechas_str}")
         
     return "\n".join(lineas)
 
-def construir_mensaje_lista_completa(chat_id: int, recordatorios: List) -> str:
+def construir_mensaje_lista_completa(chat_id: int, recordatorios: List, user_tz: str = 'UTC') -> str:
     """
     Toma una lista de recordatorios y la convierte en un único bloque de texto.
     Cada recordatorio se formatea individualmente.
+    La zona horaria del usuario la aporta quien llama, que ya la ha leído de forma asíncrona.
     """
     if not recordatorios:
         # La función que llama a esta debe manejar los títulos.
         # Esta solo devuelve el mensaje de "lista vacía" si no hay nada que formatear.
         return get_text("lista_vacia")
 
-    user_tz = get_config(chat_id, "user_timezone") or 'UTC'
     # Usa una "list comprehension" para aplicar el formateo a cada recordatorio de la lista.
     lineas = [_formatear_linea_individual(chat_id, r, user_tz) for r in recordatorios]
     return "\n".join(lineas)
@@ -196,16 +347,65 @@ def construir_mensaje_lista_completa(chat_id: int, recordatorios: List) -> str:
 # SECCIÓN 3: COMPONENTES DE UI REUTILIZABLES
 # =============================================================================
 
+_DIGITOS_BASE36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+def _a_base36(numero: int) -> str:
+    """Codifica un entero en base 36 (más corto que en decimal, para no pasar de los 64 bytes del callback_data)."""
+    if numero < 0:
+        return "-" + _a_base36(-numero)
+    digitos = ""
+    while True:
+        numero, resto = divmod(numero, 36)
+        digitos = _DIGITOS_BASE36[resto] + digitos
+        if numero == 0:
+            return digitos
+
+def codificar_cursor_lista(direccion: str, recordatorio: tuple) -> str:
+    """
+    Codifica la fila frontera de una página como cursor para el callback_data de los botones << y >>.
+    Formato: '<dirección><fecha en µs desde epoch, base36>.<id, base36>'. Una fecha nula se escribe '~'.
+    """
+    rid, fecha_utc = recordatorio[0], recordatorio[4]
+    if fecha_utc is None:
+        fecha_str = "~"
+    else:
+        delta = fecha_utc.astimezone(pytz.utc) - datetime(1970, 1, 1, tzinfo=pytz.utc)
+        fecha_str = _a_base36((delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds)
+    return f"{direccion}{fecha_str}.{_a_base36(rid)}"
+
+def decodificar_cursor_lista(cursor: Optional[str]) -> Optional[Tuple[str, Optional[datetime], int]]:
+    """Inverso de codificar_cursor_lista. Devuelve None si el cursor no existe o está mal formado."""
+    if not cursor or cursor[0] not in ("n", "p") or "." not in cursor:
+        return None
+    try:
+        fecha_str, rid_str = cursor[1:].split(".", 1)
+        fecha = None
+        if fecha_str != "~":
+            fecha = datetime(1970, 1, 1, tzinfo=pytz.utc) + timedelta(microseconds=int(fecha_str, 36))
+        return cursor[0], fecha, int(rid_str, 36)
+    except ValueError:
+        return None
+
 async def enviar_lista_interactiva(
     update: Update, context: ContextTypes.DEFAULT_TYPE, context_key: str,
     titulos: dict, page: int = 1, filtro: str = "futuro",
-    mostrar_boton_cancelar: bool = False
+    mostrar_boton_cancelar: bool = False, cursor: Optional[str] = None
 ):
     """
     Función universal para generar y enviar una lista interactiva paginada.
+
+    La primera página se pide sin cursor. Las demás se piden con el cursor (keyset) que
+    llevan los botones << y >>, así cada cambio de página es una única consulta indexada.
     """
     chat_id = update.effective_chat.id
-    recordatorios_pagina, total_items = get_recordatorios(chat_id, filtro=filtro, page=page, items_per_page=ITEMS_PER_PAGE)
+    cursor_lista = decodificar_cursor_lista(cursor)
+    recordatorios_pagina, total_items = await get_recordatorios(
+        chat_id, filtro=filtro, page=page, items_per_page=ITEMS_PER_PAGE, cursor=cursor_lista
+    )
+    if total_items == 0 and page > 1:
+        # La página pedida se ha quedado vacía (p. ej. se han borrado recordatorios): volvemos a la primera.
+        page = 1
+        recordatorios_pagina, total_items = await get_recordatorios(chat_id, filtro=filtro, page=1, items_per_page=ITEMS_PER_PAGE)
 
     # --- MENSAJES PARA LISTAS VACÍAS ---
     if total_items == 0:
@@ -223,7 +423,8 @@ async def enviar_lista_interactiva(
         if total_pages > 1:
             titulo += f" (Pág. {page}/{total_pages})"
         titulo += "\n\n"
-        cuerpo_lista = construir_mensaje_lista_completa(chat_id, recordatorios_pagina)
+        user_tz = await get_config(chat_id, "user_timezone") or 'UTC'
+        cuerpo_lista = construir_mensaje_lista_completa(chat_id, recordatorios_pagina, user_tz)
         mensaje = titulo + cuerpo_lista
     
     # --- CONSTRUCCIÓN DEL TECLADO DINÁMICO ---
@@ -255,15 +456,17 @@ async def enviar_lista_interactiva(
     # --- Fila 2: Paginación (<< y >>) ---
     if total_items > ITEMS_PER_PAGE:
         paginacion_row = []
-        # Botón Izquierdo: Anterior o placeholder
+        # Botón Izquierdo: Anterior o placeholder (a la página 1 se vuelve sin cursor)
         if page > 1:
-            paginacion_row.append(InlineKeyboardButton("<<", callback_data=f"list_page:{page - 1}:{filtro}{callback_sufijo_base}"))
+            cursor_anterior = "" if page - 1 == 1 else ":" + codificar_cursor_lista("p", recordatorios_pagina[0])
+            paginacion_row.append(InlineKeyboardButton("<<", callback_data=f"list_page:{page - 1}:{filtro}{callback_sufijo_base}{cursor_anterior}"))
         else:
             paginacion_row.append(InlineKeyboardButton(" ", callback_data="placeholder"))
         
         # Botón Derecho: Siguiente o placeholder
         if page < total_pages:
-            paginacion_row.append(InlineKeyboardButton(">>", callback_data=f"list_page:{page + 1}:{filtro}{callback_sufijo_base}"))
+            cursor_siguiente = ":" + codificar_cursor_lista("n", recordatorios_pagina[-1])
+            paginacion_row.append(InlineKeyboardButton(">>", callback_data=f"list_page:{page + 1}:{filtro}{callback_sufijo_base}{cursor_siguiente}"))
         else:
             paginacion_row.append(InlineKeyboardButton(" ", callback_data="placeholder"))
         keyboard_rows.append(paginacion_row)